@@ -0,0 +1,427 @@
+#include <algorithm>
+#include <cfloat>
+#include <cmath>
+#include <thread>
+
+#include "common.hpp"
+#include "util.hpp"
+
+static glm::vec3 closest_on_triangle(const glm::vec3 &p, const glm::vec3 &a, const glm::vec3 &b, const glm::vec3 &c, glm::vec2 &bary)
+{
+	// Real-Time Collision Detection (Ericson), section 5.1.5
+	glm::vec3 ab = b - a;
+	glm::vec3 ac = c - a;
+	glm::vec3 ap = p - a;
+
+	float d1 = glm::dot(ab, ap);
+	float d2 = glm::dot(ac, ap);
+	if (d1 <= 0.0f && d2 <= 0.0f) {
+		bary = { 0.0f, 0.0f };
+		return a;
+	}
+
+	glm::vec3 bp = p - b;
+	float d3 = glm::dot(ab, bp);
+	float d4 = glm::dot(ac, bp);
+	if (d3 >= 0.0f && d4 <= d3) {
+		bary = { 1.0f, 0.0f };
+		return b;
+	}
+
+	float vc = d1 * d4 - d3 * d2;
+	if (vc <= 0.0f && d1 >= 0.0f && d3 <= 0.0f) {
+		float v = d1 / (d1 - d3);
+		bary = { v, 0.0f };
+		return a + v * ab;
+	}
+
+	glm::vec3 cp = p - c;
+	float d5 = glm::dot(ab, cp);
+	float d6 = glm::dot(ac, cp);
+	if (d6 >= 0.0f && d5 <= d6) {
+		bary = { 0.0f, 1.0f };
+		return c;
+	}
+
+	float vb = d5 * d2 - d1 * d6;
+	if (vb <= 0.0f && d2 >= 0.0f && d6 <= 0.0f) {
+		float w = d2 / (d2 - d6);
+		bary = { 0.0f, w };
+		return a + w * ac;
+	}
+
+	float va = d3 * d6 - d5 * d4;
+	if (va <= 0.0f && (d4 - d3) >= 0.0f && (d5 - d6) >= 0.0f) {
+		float w = (d4 - d3) / ((d4 - d3) + (d5 - d6));
+		bary = { 1.0f - w, w };
+		return b + w * (c - b);
+	}
+
+	float denom = 1.0f / (va + vb + vc);
+	float v = vb * denom;
+	float w = vc * denom;
+	bary = { v, w };
+	return a + ab * v + ac * w;
+}
+
+static float box_distance(const glm::vec3 &p, const glm::vec3 &lower, const glm::vec3 &upper)
+{
+	glm::vec3 d = glm::max(glm::max(lower - p, p - upper), glm::vec3(0.0f));
+	return glm::dot(d, d);
+}
+
+static bool box_intersect(const glm::vec3 &origin, const glm::vec3 &inverse, const glm::vec3 &lower, const glm::vec3 &upper, float tmax, float &tnear)
+{
+	glm::vec3 t0 = (lower - origin) * inverse;
+	glm::vec3 t1 = (upper - origin) * inverse;
+	glm::vec3 tmin = glm::min(t0, t1);
+	glm::vec3 tmx = glm::max(t0, t1);
+
+	tnear = std::max(std::max(tmin.x, tmin.y), std::max(tmin.z, 0.0f));
+	float tfar = std::min(std::min(tmx.x, tmx.y), std::min(tmx.z, tmax));
+	return tnear <= tfar;
+}
+
+bvh::bvh(const torch::Tensor &torch_vertices, const torch::Tensor &torch_triangles)
+{
+	assert(torch_vertices.dim() == 2 && torch_vertices.size(1) == 3);
+	assert(torch_vertices.dtype() == torch::kFloat32);
+
+	assert(torch_triangles.dim() == 2 && torch_triangles.size(1) == 3);
+	assert(torch_triangles.dtype() == torch::kInt32);
+
+	torch::Tensor cv = torch_vertices.cpu().contiguous();
+	torch::Tensor cf = torch_triangles.cpu().contiguous();
+
+	const glm::vec3 *vertices_ptr = (const glm::vec3 *) cv.data_ptr <float> ();
+	const glm::ivec3 *triangles_ptr = (const glm::ivec3 *) cf.data_ptr <int32_t> ();
+
+	vertices.assign(vertices_ptr, vertices_ptr + cv.size(0));
+	triangles.assign(triangles_ptr, triangles_ptr + cf.size(0));
+
+	build();
+}
+
+bvh::bvh(const geometry &g) : vertices(g.vertices), triangles(g.triangles)
+{
+	build();
+}
+
+void bvh::build()
+{
+	size_t count = triangles.size();
+
+	lowers.resize(count);
+	uppers.resize(count);
+	centroids.resize(count);
+	parallel_for(count, [&](size_t i) {
+		const glm::ivec3 &t = triangles[i];
+		lowers[i] = glm::min(vertices[t.x], glm::min(vertices[t.y], vertices[t.z]));
+		uppers[i] = glm::max(vertices[t.x], glm::max(vertices[t.y], vertices[t.z]));
+		centroids[i] = (vertices[t.x] + vertices[t.y] + vertices[t.z]) / 3.0f;
+	});
+
+	indices.resize(count);
+	for (size_t i = 0; i < count; i++)
+		indices[i] = i;
+
+	// Independent subtrees are built concurrently near the root, then spliced together
+	int32_t depth = 0;
+	for (size_t threads = std::thread::hardware_concurrency(); threads > 1; threads >>= 1)
+		depth++;
+
+	nodes.clear();
+	build_range(0, count, depth, nodes);
+}
+
+int32_t bvh::build_range(int32_t start, int32_t end, int32_t parallel_depth, std::vector <node> &out)
+{
+	constexpr int32_t BINS = 16;
+	constexpr int32_t LEAF = 4;
+
+	node n;
+	n.lower = glm::vec3(FLT_MAX);
+	n.upper = glm::vec3(-FLT_MAX);
+
+	glm::vec3 clower(FLT_MAX);
+	glm::vec3 cupper(-FLT_MAX);
+	for (int32_t i = start; i < end; i++) {
+		int32_t p = indices[i];
+		n.lower = glm::min(n.lower, lowers[p]);
+		n.upper = glm::max(n.upper, uppers[p]);
+		clower = glm::min(clower, centroids[p]);
+		cupper = glm::max(cupper, centroids[p]);
+	}
+
+	auto leaf = [&]() {
+		n.start = start;
+		n.count = end - start;
+		out.push_back(n);
+		return int32_t(out.size() - 1);
+	};
+
+	glm::vec3 extent = cupper - clower;
+	int32_t axis = (extent.x > extent.y) ? ((extent.x > extent.z) ? 0 : 2) : ((extent.y > extent.z) ? 1 : 2);
+	if (end - start <= LEAF || extent[axis] <= 0.0f)
+		return leaf();
+
+	// Binned surface area heuristic along the widest centroid axis
+	struct bin {
+		glm::vec3 lower = glm::vec3(FLT_MAX);
+		glm::vec3 upper = glm::vec3(-FLT_MAX);
+		int32_t count = 0;
+	} bins[BINS];
+
+	auto area = [](const glm::vec3 &lower, const glm::vec3 &upper) {
+		glm::vec3 d = glm::max(upper - lower, glm::vec3(0.0f));
+		return d.x * d.y + d.y * d.z + d.z * d.x;
+	};
+
+	auto index_of = [&](int32_t p) {
+		int32_t b = BINS * (centroids[p][axis] - clower[axis]) / extent[axis];
+		return std::min(b, BINS - 1);
+	};
+
+	for (int32_t i = start; i < end; i++) {
+		int32_t p = indices[i];
+		bin &b = bins[index_of(p)];
+		b.lower = glm::min(b.lower, lowers[p]);
+		b.upper = glm::max(b.upper, uppers[p]);
+		b.count++;
+	}
+
+	float right_costs[BINS];
+	glm::vec3 lower(FLT_MAX);
+	glm::vec3 upper(-FLT_MAX);
+	int32_t right_count = 0;
+	for (int32_t b = BINS - 1; b > 0; b--) {
+		lower = glm::min(lower, bins[b].lower);
+		upper = glm::max(upper, bins[b].upper);
+		right_count += bins[b].count;
+		right_costs[b] = right_count * area(lower, upper);
+	}
+
+	float best = FLT_MAX;
+	int32_t split = -1;
+
+	lower = glm::vec3(FLT_MAX);
+	upper = glm::vec3(-FLT_MAX);
+	int32_t left_count = 0;
+	for (int32_t b = 0; b < BINS - 1; b++) {
+		lower = glm::min(lower, bins[b].lower);
+		upper = glm::max(upper, bins[b].upper);
+		left_count += bins[b].count;
+
+		float cost = left_count * area(lower, upper) + right_costs[b + 1];
+		if (left_count > 0 && left_count < end - start && cost < best) {
+			best = cost;
+			split = b;
+		}
+	}
+
+	if (split < 0 || best >= (end - start) * area(n.lower, n.upper))
+		return leaf();
+
+	int32_t *middle = std::partition(indices.data() + start, indices.data() + end, [&](int32_t p) {
+		return index_of(p) <= split;
+	});
+
+	int32_t mid = middle - indices.data();
+
+	int32_t index = out.size();
+	out.push_back(n);
+
+	int32_t left;
+	int32_t right;
+	if (parallel_depth > 0 && end - start > (1 << 14)) {
+		// Left subtree is built concurrently into its own array, then spliced in
+		std::vector <node> subtree;
+		std::thread worker([&]() { build_range(start, mid, parallel_depth - 1, subtree); });
+		right = build_range(mid, end, parallel_depth - 1, out);
+		worker.join();
+
+		left = out.size();
+		for (node m : subtree) {
+			if (m.count == 0) {
+				m.left += left;
+				m.right += left;
+			}
+
+			out.push_back(m);
+		}
+	} else {
+		left = build_range(start, mid, 0, out);
+		right = build_range(mid, end, 0, out);
+	}
+
+	out[index].left = left;
+	out[index].right = right;
+
+	return index;
+}
+
+std::tuple <torch::Tensor, torch::Tensor, torch::Tensor> bvh::closest(const torch::Tensor &points) const
+{
+	assert(points.dim() == 2 && points.size(1) == 3);
+	assert(points.dtype() == torch::kFloat32);
+
+	torch::Tensor cp = points.cpu().contiguous();
+	const glm::vec3 *points_ptr = (const glm::vec3 *) cp.data_ptr <float> ();
+
+	int64_t count = cp.size(0);
+
+	torch::Tensor distances = torch::zeros({ count }, torch::kFloat32);
+	torch::Tensor faces = torch::full({ count }, -1, torch::kInt32);
+	torch::Tensor closest = torch::zeros({ count, 3 }, torch::kFloat32);
+
+	float *distances_ptr = distances.data_ptr <float> ();
+	int32_t *faces_ptr = faces.data_ptr <int32_t> ();
+	glm::vec3 *closest_ptr = (glm::vec3 *) closest.data_ptr <float> ();
+
+	parallel_for(count, [&](size_t i) {
+		const glm::vec3 &p = points_ptr[i];
+
+		float best = FLT_MAX;
+		int32_t face = -1;
+		glm::vec3 point(0.0f);
+
+		std::vector <int32_t> stack;
+		stack.reserve(64);
+		stack.push_back(0);
+
+		while (!stack.empty()) {
+			const node &n = nodes[stack.back()];
+			stack.pop_back();
+			if (box_distance(p, n.lower, n.upper) >= best)
+				continue;
+
+			if (n.count > 0) {
+				for (int32_t k = n.start; k < n.start + n.count; k++) {
+					const glm::ivec3 &t = triangles[indices[k]];
+
+					glm::vec2 bary;
+					glm::vec3 q = closest_on_triangle(p, vertices[t.x], vertices[t.y], vertices[t.z], bary);
+
+					float d = glm::dot(q - p, q - p);
+					if (d < best) {
+						best = d;
+						face = indices[k];
+						point = q;
+					}
+				}
+
+				continue;
+			}
+
+			// Nearer child is visited first
+			float dl = box_distance(p, nodes[n.left].lower, nodes[n.left].upper);
+			float dr = box_distance(p, nodes[n.right].lower, nodes[n.right].upper);
+			if (dl < dr) {
+				stack.push_back(n.right);
+				stack.push_back(n.left);
+			} else {
+				stack.push_back(n.left);
+				stack.push_back(n.right);
+			}
+		}
+
+		distances_ptr[i] = std::sqrt(best);
+		faces_ptr[i] = face;
+		closest_ptr[i] = point;
+	}, 256);
+
+	return std::make_tuple(distances.to(points.device()), faces.to(points.device()), closest.to(points.device()));
+}
+
+std::tuple <torch::Tensor, torch::Tensor, torch::Tensor> bvh::intersect(const torch::Tensor &origins, const torch::Tensor &directions, float tmax) const
+{
+	assert(origins.dim() == 2 && origins.size(1) == 3);
+	assert(origins.dtype() == torch::kFloat32);
+
+	assert(directions.dim() == 2 && directions.size(1) == 3);
+	assert(directions.dtype() == torch::kFloat32);
+	assert(directions.size(0) == origins.size(0));
+
+	torch::Tensor co = origins.cpu().contiguous();
+	torch::Tensor cd = directions.cpu().contiguous();
+	const glm::vec3 *origins_ptr = (const glm::vec3 *) co.data_ptr <float> ();
+	const glm::vec3 *directions_ptr = (const glm::vec3 *) cd.data_ptr <float> ();
+
+	int64_t count = co.size(0);
+
+	torch::Tensor times = torch::full({ count }, INFINITY, torch::kFloat32);
+	torch::Tensor faces = torch::full({ count }, -1, torch::kInt32);
+	torch::Tensor barycentrics = torch::zeros({ count, 2 }, torch::kFloat32);
+
+	float *times_ptr = times.data_ptr <float> ();
+	int32_t *faces_ptr = faces.data_ptr <int32_t> ();
+	glm::vec2 *barycentrics_ptr = (glm::vec2 *) barycentrics.data_ptr <float> ();
+
+	parallel_for(count, [&](size_t i) {
+		const glm::vec3 &o = origins_ptr[i];
+		const glm::vec3 &d = directions_ptr[i];
+		glm::vec3 inverse = 1.0f / d;
+
+		float best = tmax;
+		int32_t face = -1;
+		glm::vec2 bary(0.0f);
+
+		std::vector <int32_t> stack;
+		stack.reserve(64);
+		stack.push_back(0);
+
+		while (!stack.empty()) {
+			const node &n = nodes[stack.back()];
+			stack.pop_back();
+
+			float tnear;
+			if (!box_intersect(o, inverse, n.lower, n.upper, best, tnear))
+				continue;
+
+			if (n.count > 0) {
+				// Möller-Trumbore, for either facing
+				for (int32_t k = n.start; k < n.start + n.count; k++) {
+					const glm::ivec3 &t = triangles[indices[k]];
+					glm::vec3 e1 = vertices[t.y] - vertices[t.x];
+					glm::vec3 e2 = vertices[t.z] - vertices[t.x];
+
+					glm::vec3 pv = glm::cross(d, e2);
+					float det = glm::dot(e1, pv);
+					if (std::abs(det) < 1e-12f)
+						continue;
+
+					float inv = 1.0f / det;
+					glm::vec3 tv = o - vertices[t.x];
+					float u = glm::dot(tv, pv) * inv;
+					if (u < 0.0f || u > 1.0f)
+						continue;
+
+					glm::vec3 qv = glm::cross(tv, e1);
+					float v = glm::dot(d, qv) * inv;
+					if (v < 0.0f || u + v > 1.0f)
+						continue;
+
+					float s = glm::dot(e2, qv) * inv;
+					if (s > 0.0f && s < best) {
+						best = s;
+						face = indices[k];
+						bary = { u, v };
+					}
+				}
+
+				continue;
+			}
+
+			stack.push_back(n.left);
+			stack.push_back(n.right);
+		}
+
+		if (face >= 0) {
+			times_ptr[i] = best;
+			faces_ptr[i] = face;
+			barycentrics_ptr[i] = bary;
+		}
+	}, 256);
+
+	return std::make_tuple(times.to(origins.device()), faces.to(origins.device()), barycentrics.to(origins.device()));
+}
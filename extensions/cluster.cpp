@@ -1,148 +1,219 @@
 #include <algorithm>
+#include <cfloat>
 #include <cmath>
-#include <iostream>
-#include <set>
-#include <unordered_map>
+#include <queue>
 
 #include "common.hpp"
+#include "util.hpp"
+
+// Face adjacency (across shared edges) in compressed sparse row form
+struct dual_csr {
+	std::vector <int32_t> offsets;
+	std::vector <int32_t> neighbors;
+
+	dual_csr(const std::vector <glm::ivec3> &triangles) {
+		std::vector <std::pair <uint64_t, int32_t>> edges;
+		edges.reserve(3 * triangles.size());
+		for (size_t i = 0; i < triangles.size(); i++) {
+			for (int32_t k = 0; k < 3; k++) {
+				uint32_t a = triangles[i][k];
+				uint32_t b = triangles[i][(k + 1) % 3];
+				if (a > b)
+					std::swap(a, b);
+
+				edges.emplace_back((uint64_t(a) << 32) | b, i);
+			}
+		}
 
-// Chartifying geometry into N clusters
-static std::vector <std::unordered_set <int32_t>> cluster_once(const geometry &g, const geometry::dual_graph &dgraph, const std::vector <int32_t> &seeds, const std::string &metric)
-{
-	std::unordered_map <int32_t, int32_t> face_to_cluster;
-	std::vector <std::unordered_set <int32_t>> clusters;
-	std::vector <glm::vec3> cluster_normals;
+		std::sort(edges.begin(), edges.end());
+
+		// Faces sharing an edge are all adjacent to each other
+		auto runs = [&](auto &&visit) {
+			size_t start = 0;
+			while (start < edges.size()) {
+				size_t end = start + 1;
+				while (end < edges.size() && edges[end].first == edges[start].first)
+					end++;
+
+				for (size_t i = start; i < end; i++) {
+					for (size_t j = start; j < end; j++) {
+						if (i != j)
+							visit(edges[i].second, edges[j].second);
+					}
+				}
 
-	// Initialize the clusters
-	for (int32_t s : seeds) {
-		assert(s < g.triangles.size());
+				start = end;
+			}
+		};
 
-		face_to_cluster[s] = clusters.size();
-		clusters.push_back(std::unordered_set <int32_t> { s });
-		cluster_normals.push_back(g.face_normal(s));
+		offsets.resize(triangles.size() + 1, 0);
+		runs([&](int32_t f, int32_t) { offsets[f + 1]++; });
+
+		for (size_t i = 0; i < triangles.size(); i++)
+			offsets[i + 1] += offsets[i];
+
+		std::vector <int32_t> fill(offsets.begin(), offsets.end() - 1);
+
+		neighbors.resize(offsets.back());
+		runs([&](int32_t f, int32_t g) { neighbors[fill[f]++] = g; });
 	}
+};
+
+// Multi-source Dijkstra over the dual graph, growing one chart per seed
+static void cluster_once(const std::vector <glm::vec3> &centroids,
+		const std::vector <glm::vec3> &normals,
+		const dual_csr &dual,
+		const std::vector <int32_t> &seeds,
+		bool flat,
+		std::vector <int32_t> &labels)
+{
+	using entry = std::pair <float, int32_t>;
 
-	// Costs
-	std::vector <float> costs;
-	costs.resize(g.triangles.size(), FLT_MAX);
+	size_t count = centroids.size();
 
-	// Comparator for the map
-	auto compare = [&](const size_t &a, const size_t &b) {
-		// Cost, then index
-		return (costs[a] < costs[b]) || ((std::abs(costs[a] - costs[b]) < 1e-6f) && (a < b));
-	};
+	std::vector <float> costs(count, FLT_MAX);
+	std::vector <uint8_t> done(count, 0);
+	std::vector <uint8_t> seeded(count, 0);
+	std::vector <glm::vec3> cluster_normals(seeds.size());
+	std::vector <float> sizes(seeds.size(), 0.0f);
 
-	// Initialize the queue (set)
-	std::set <int32_t, decltype(compare)> queue(compare);
-	for (size_t i = 0; i < g.triangles.size(); i++) {
-		if (std::find(seeds.begin(), seeds.end(), i) != seeds.end())
-			costs[i] = 0.0f;
+	labels.assign(count, -1);
 
-		queue.insert(i);
-	}
+	std::priority_queue <entry, std::vector <entry>, std::greater <entry>> queue;
+	for (size_t i = 0; i < seeds.size(); i++) {
+		int32_t s = seeds[i];
+		assert(s >= 0 && s < (int32_t) count);
 
-	// Grow the charts
-	while (queue.size() > 0) {
-		int32_t face = *queue.begin();
-		queue.erase(queue.begin());
+		// Repeated seeds leave their earlier charts empty
+		if (seeded[s])
+			sizes[labels[s]] = 0.0f;
 
-		if (std::isinf(costs[face]))
-			break;
+		seeded[s] = 1;
+		labels[s] = i;
+		costs[s] = 0.0f;
+		sizes[i] = 1.0f;
+		cluster_normals[i] = normals[s];
+		queue.emplace(0.0f, s);
+	}
 
-		// clear line
-		// TODO: progress bar instead...
-		int32_t ci = face_to_cluster[face];
-		glm::vec3 cn = cluster_normals[ci];
+	while (!queue.empty()) {
+		auto [cost, face] = queue.top();
+		queue.pop();
 
-//		printf("\033[K\rRemaining: %zu; current is %d with %f (index = %d)", queue.size(), face, costs[face], ci);
+		// Stale entries from earlier relaxations
+		if (done[face] || cost > costs[face])
+			continue;
 
-		for (int32_t neighbor : dgraph.at(face)) {
-			glm::vec3 nn = g.face_normal(neighbor);
-			float dc     = glm::length(g.centroid(face) - g.centroid(neighbor));
-			float dn     = 1 - glm::dot(cn, nn);
-			float new_cost = costs[face] + ((metric == "flat") ? dn * dc : dc);
+		done[face] = 1;
 
-			if (queue.count(neighbor) && new_cost < costs[neighbor]) {
-				queue.erase(neighbor);
+		int32_t ci = labels[face];
+		glm::vec3 cn = cluster_normals[ci];
 
-				float size = clusters[ci].size();
-				glm::vec3 new_normal = (cn * size + nn)/(size + 1.0f);
+		for (int32_t j = dual.offsets[face]; j < dual.offsets[face + 1]; j++) {
+			int32_t neighbor = dual.neighbors[j];
+			if (done[neighbor])
+				continue;
 
-				cluster_normals[ci] = new_normal;
-				costs[neighbor] = new_cost;
+			const glm::vec3 &nn = normals[neighbor];
+			float dc       = glm::length(centroids[face] - centroids[neighbor]);
+			float dn       = 1 - glm::dot(cn, nn);
+			float new_cost = costs[face] + (flat ? dn * dc : dc);
 
-				if (face_to_cluster.count(neighbor)) {
-					int32_t old = face_to_cluster[neighbor];
-					clusters[old].erase(neighbor);
-				}
+			if (new_cost < costs[neighbor]) {
+				cluster_normals[ci] = (cn * sizes[ci] + nn)/(sizes[ci] + 1.0f);
 
-				face_to_cluster[neighbor] = ci;
-				clusters[ci].insert(neighbor);
+				if (labels[neighbor] >= 0)
+					sizes[labels[neighbor]] -= 1.0f;
 
-				queue.insert(neighbor);
+				labels[neighbor] = ci;
+				sizes[ci] += 1.0f;
+
+				costs[neighbor] = new_cost;
+				queue.emplace(new_cost, neighbor);
 			}
 		}
 	}
+}
+
+// Groups face indices by label; unreached faces (label -1) are left out
+static void bucket(const std::vector <int32_t> &labels, size_t clusters, std::vector <int32_t> &offsets, std::vector <int32_t> &indices)
+{
+	offsets.assign(clusters + 1, 0);
+	for (int32_t l : labels) {
+		if (l >= 0)
+			offsets[l + 1]++;
+	}
+
+	for (size_t i = 0; i < clusters; i++)
+		offsets[i + 1] += offsets[i];
 
-	return clusters;
+	std::vector <int32_t> fill(offsets.begin(), offsets.end() - 1);
+
+	indices.resize(offsets.back());
+	for (size_t f = 0; f < labels.size(); f++) {
+		if (labels[f] >= 0)
+			indices[fill[labels[f]]++] = f;
+	}
 }
 
-std::vector <std::vector <int32_t>> cluster_geometry(const geometry &g, const std::vector <int32_t> &seeds, int32_t iterations, const std::string &metric)
+std::tuple <torch::Tensor, torch::Tensor, torch::Tensor> cluster_geometry(const geometry &g, const std::vector <int32_t> &seeds, int32_t iterations, const std::string &metric)
 {
 	assert(metric == "uniform" || metric == "flat");
 
-	// Make the dual graph
-	auto egraph = g.make_edge_graph();
-	auto dgraph = g.make_dual_graph(egraph);
+	size_t count = g.triangles.size();
+
+	std::vector <glm::vec3> centroids(count);
+	std::vector <glm::vec3> normals(count);
+	parallel_for(count, [&](size_t i) {
+		const glm::ivec3 &t = g.triangles[i];
+		glm::vec3 n = glm::cross(g.vertices[t.y] - g.vertices[t.x], g.vertices[t.z] - g.vertices[t.x]);
+		float length = glm::length(n);
+
+		centroids[i] = g.centroid(i);
+		normals[i] = (length > 0.0f) ? n/length : glm::vec3(0.0f);
+	});
 
-	std::vector <std::unordered_set <int32_t>> clusters;
+	dual_csr dual(g.triangles);
+
+	std::vector <int32_t> labels;
+	std::vector <int32_t> offsets;
+	std::vector <int32_t> indices;
 	std::vector <int32_t> next_seeds = seeds;
 
 	for (int32_t i = 0; i < iterations; i++) {
-		clusters = cluster_once(g, dgraph, next_seeds, metric);
+		cluster_once(centroids, normals, dual, next_seeds, metric == "flat", labels);
+		bucket(labels, next_seeds.size(), offsets, indices);
 		if (i == iterations - 1)
 			break;
 
-		// Find the central faces for each cluster,
-		// i.e. the face closest to the centroid
-		std::vector <glm::vec3> centroids;
-		for (const auto &c : clusters) {
-			glm::vec3 centroid(0.0f);
-			float wsum = 0.0f;
-			for (int32_t f : c) {
-				float w = 1.0f; // g.area(f);
-				centroid += g.centroid(f) * w;
-				wsum += w;
-			}
+		// Lloyd step: reseed each cluster at the face closest to its centroid
+		parallel_for(next_seeds.size(), [&](size_t j) {
+			int32_t start = offsets[j];
+			int32_t end = offsets[j + 1];
+			if (start == end)
+				return;
 
-			centroid /= wsum;
-			centroids.push_back(centroid);
-		}
+			glm::vec3 centroid(0.0f);
+			for (int32_t k = start; k < end; k++)
+				centroid += centroids[indices[k]];
 
-		// For each cluster, find the closest face
-		next_seeds.clear();
-		for (size_t j = 0; j < clusters.size(); j++) {
-			const auto &c = clusters[j];
-			const auto &centroid = centroids[j];
+			centroid /= float(end - start);
 
 			float min_dist = FLT_MAX;
-			int32_t min_face = -1;
-
-			for (int32_t f : c) {
-				float dist = glm::length(centroid - g.centroid(f));
+			for (int32_t k = start; k < end; k++) {
+				float dist = glm::length(centroid - centroids[indices[k]]);
 				if (dist < min_dist) {
 					min_dist = dist;
-					min_face = f;
+					next_seeds[j] = indices[k];
 				}
 			}
-
-			next_seeds.push_back(min_face);
-		}
+		}, 64);
 	}
 
-	std::vector <std::vector <int32_t>> clusters_linear;
-	for (const auto &c : clusters)
-		clusters_linear.emplace_back(c.begin(), c.end());
-
-	return clusters_linear;
+	return std::make_tuple
+	(
+		torch::from_blob(labels.data(), { (long) labels.size() }, torch::kInt32).clone(),
+		torch::from_blob(offsets.data(), { (long) offsets.size() }, torch::kInt32).clone(),
+		torch::from_blob(indices.data(), { (long) indices.size() }, torch::kInt32).clone()
+	);
 }
@@ -11,6 +11,7 @@
 struct Graph {
 	std::unordered_map <int32_t, std::unordered_set <int32_t>> graph;
 
+	std::vector <int32_t> host;
 	int32_t *device = nullptr;
 	int32_t count = 0;
 	int32_t bound = 0;
@@ -25,7 +26,8 @@ struct Graph {
 	torch::Tensor smooth(const torch::Tensor &, float) const;
 };
 
-std::vector <std::vector <int32_t>> cluster_geometry
+// Surface clustering, returning face labels and the clusters in CSR form
+std::tuple <torch::Tensor, torch::Tensor, torch::Tensor> cluster_geometry
 (const geometry &, const std::vector <int32_t> &, int32_t, const std::string &);
 
 // Patch parametrization (multichart geometry images)
@@ -40,6 +42,67 @@ std::vector <torch::Tensor> parametrize_parallel
 // TODO: refactor
 torch::Tensor triangulate_shorted(const torch::Tensor &, size_t, size_t);
 
+// Bilinear lookups into per-patch feature textures, on CPU or CUDA tensors
+torch::Tensor ngf_texture_fetch_forward(const torch::Tensor &, const torch::Tensor &, const torch::Tensor &);
+torch::Tensor ngf_texture_fetch_backward(const torch::Tensor &, const torch::Tensor &, const torch::Tensor &, int32_t, int32_t);
+
+// Quadric decimation and quad-dominant remeshing
+std::tuple <torch::Tensor, torch::Tensor> decimate(const torch::Tensor &, const torch::Tensor &, int64_t);
+std::tuple <torch::Tensor, torch::Tensor> quadrangulate(const torch::Tensor &, const torch::Tensor &);
+
+struct progressive_mesh {
+	struct collapse {
+		int32_t v0; // Kept
+		int32_t v1; // Removed
+		glm::vec3 position;
+	};
+
+	std::vector <glm::vec3> positions;
+	std::vector <glm::ivec3> triangles;
+	std::vector <collapse> collapses;
+	std::vector <int64_t> face_counts; // Per level, i.e. after each collapse
+	int64_t vertex_count;
+
+	progressive_mesh(const torch::Tensor &, const torch::Tensor &);
+
+	int64_t size(int64_t) const;
+
+	std::tuple <torch::Tensor, torch::Tensor> extract(int64_t) const;
+	std::tuple <torch::Tensor, torch::Tensor> extract_faces(int64_t) const;
+	std::tuple <torch::Tensor, torch::Tensor> extract_bytes(int64_t) const;
+};
+
+// Bounding volume hierarchy over triangles, for closest point and ray queries
+struct bvh {
+	struct node {
+		glm::vec3 lower;
+		glm::vec3 upper;
+		int32_t left = 0;
+		int32_t right = 0;
+		int32_t start = 0;
+		int32_t count = 0; // Leaves have a nonzero count
+	};
+
+	std::vector <glm::vec3> vertices;
+	std::vector <glm::ivec3> triangles;
+
+	std::vector <glm::vec3> lowers;
+	std::vector <glm::vec3> uppers;
+	std::vector <glm::vec3> centroids;
+
+	std::vector <int32_t> indices;
+	std::vector <node> nodes;
+
+	bvh(const torch::Tensor &, const torch::Tensor &);
+	bvh(const geometry &);
+
+	void build();
+	int32_t build_range(int32_t, int32_t, int32_t, std::vector <node> &);
+
+	std::tuple <torch::Tensor, torch::Tensor, torch::Tensor> closest(const torch::Tensor &) const;
+	std::tuple <torch::Tensor, torch::Tensor, torch::Tensor> intersect(const torch::Tensor &, const torch::Tensor &, float) const;
+};
+
 // Loading a mesh
 std::tuple <torch::Tensor, torch::Tensor, torch::Tensor, torch::Tensor>
 load_mesh(const std::string &);
@@ -7,6 +7,8 @@
 #include <glm/glm.hpp>
 #include <glm/gtx/hash.hpp>
 
+#include "weld.hpp"
+
 struct ordered_pair {
 	int32_t a, b;
 
@@ -131,32 +133,20 @@ struct geometry {
 		memcpy(triangles.data(), triangles_ptr, sizeof(glm::ivec3) * triangles.size());
 	}
 
-	geometry deduplicate() const {
-		std::unordered_map <glm::vec3, int32_t> existing;
+	// Welds vertices at equal positions (or within the same cell of a grid with the given spacing)
+	geometry deduplicate(float epsilon = 0.0f) const {
+		const int32_t *indices = (const int32_t *) triangles.data();
+		std::vector <weld_key> keys = weld_sort(vertices.data(), indices, 3 * triangles.size(), epsilon);
 
 		geometry fixed;
-
-		auto add_uniquely = [&](int32_t i) -> int32_t {
-			glm::vec3 v = vertices[i];
-			if (existing.find(v) == existing.end()) {
-				int32_t csize = fixed.vertices.size();
-				fixed.vertices.push_back(v);
-				fixed.normals.push_back(normals[i]);
-
-				existing[v] = csize;
-				return csize;
-			}
-
-			return existing[v];
-		};
-
-		for (const glm::ivec3 &t : triangles) {
-			fixed.triangles.push_back(glm::ivec3 {
-				add_uniquely(t.x),
-				add_uniquely(t.y),
-				add_uniquely(t.z)
-			});
-		}
+		fixed.vertices.resize(weld_count(keys));
+		fixed.normals.resize(fixed.vertices.size());
+		fixed.triangles.resize(triangles.size());
+
+		weld_label(keys, (int32_t *) fixed.triangles.data(), [&](int32_t v, size_t c) {
+			fixed.vertices[v] = vertices[indices[c]];
+			fixed.normals[v] = normals[indices[c]];
+		});
 
 		return fixed;
 	}
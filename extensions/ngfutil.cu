@@ -251,7 +251,7 @@ remapper generate_remapper(const torch::Tensor &complexes,
 	return remapper(remap);
 }
 
-std::tuple <torch::Tensor, torch::Tensor> deduplicate(const torch::Tensor &vertices, const torch::Tensor &triangles)
+std::tuple <torch::Tensor, torch::Tensor> deduplicate(const torch::Tensor &vertices, const torch::Tensor &triangles, float epsilon)
 {
 	assert(vertices.is_cpu());
 	assert(vertices.dtype() == torch::kFloat32);
@@ -261,277 +261,37 @@ std::tuple <torch::Tensor, torch::Tensor> deduplicate(const torch::Tensor &verti
 	assert(triangles.dtype() == torch::kInt32);
 	assert(triangles.dim() == 2 && triangles.size(1) == 3);
 
-	const float *vertices_raw = vertices.data_ptr <float> ();
-	const int32_t *indices_raw = triangles.data_ptr <int32_t> ();
+	torch::Tensor cvertices = vertices.contiguous();
+	torch::Tensor ctriangles = triangles.contiguous();
 
-	size_t vertex_count = vertices.size(0);
-	size_t index_count = triangles.numel();
+	const glm::vec3 *vertices_ptr = (const glm::vec3 *) cvertices.data_ptr <float> ();
+	const int32_t *indices_ptr = ctriangles.data_ptr <int32_t> ();
 
-	glm::vec3 *vertices_ptr = (glm::vec3 *) vertices_raw;
-
-	std::unordered_map <glm::vec3, int32_t> hashed;
-
-	std::vector <glm::vec3> new_vertices;
-	std::vector <int32_t> new_indices;
-
-	for (size_t i = 0; i < index_count; i++) {
-		int32_t vi = indices_raw[i];
-
-		glm::vec3 vertex = vertices_ptr[vi];
-		if (!hashed.count(vertex)) {
-			int32_t ni = new_vertices.size();
-			new_vertices.push_back(vertex);
-			hashed[vertex] = ni;
-
-		}
-
-		new_indices.push_back(hashed[vertex]);
-	}
+	std::vector <weld_key> keys = weld_sort(vertices_ptr, indices_ptr, ctriangles.numel(), epsilon);
 
 	auto options = torch::TensorOptions()
 		.dtype(torch::kFloat32)
 		.device(torch::kCPU, 0);
 
-	torch::Tensor tch_new_vertices = torch::zeros({ (long) new_vertices.size(), 3 }, options);
-	torch::Tensor tch_new_triangles = torch::zeros_like(triangles);
+	torch::Tensor tch_new_vertices = torch::empty({ (long) weld_count(keys), 3 }, options);
+	torch::Tensor tch_new_triangles = torch::empty_like(ctriangles);
 
-	float *new_vertices_raw = tch_new_vertices.data_ptr <float> ();
-	int32_t *new_indices_raw = tch_new_triangles.data_ptr <int32_t> ();
+	glm::vec3 *new_vertices_ptr = (glm::vec3 *) tch_new_vertices.data_ptr <float> ();
+	int32_t *new_indices_ptr = tch_new_triangles.data_ptr <int32_t> ();
 
-	std::memcpy(new_vertices_raw, new_vertices.data(), sizeof(glm::vec3) * new_vertices.size());
-	std::memcpy(new_indices_raw, new_indices.data(), sizeof(int32_t) * new_indices.size());
+	weld_label(keys, new_indices_ptr, [&](int32_t v, size_t c) {
+		new_vertices_ptr[v] = vertices_ptr[indices_ptr[c]];
+	});
 
 	return { tch_new_vertices, tch_new_triangles };
 }
 
-__forceinline__ __device__
-float3 operator+(float3 a, float3 b)
-{
-	return make_float3(a.x + b.x, a.y + b.y, a.z + b.z);
-}
-
-__forceinline__ __device__
-float3 operator*(float3 v, float k)
-{
-	return make_float3(k * v.x, k * v.y, k * v.z);
-}
-
-__forceinline__ __device__
-float3 operator*(float k, float3 v)
-{
-	return make_float3(k * v.x, k * v.y, k * v.z);
-}
-
-// TODO: pass the complex indices
-__global__
-void kernel_ngf_texture_fetch_forward
-(
-	const float3 *__restrict__ map,
-	const float *__restrict__ u,
-	const float *__restrict__ v,
-	float3 *__restrict__ result,
-	int32_t complexes,
-	int32_t resx,
-	int32_t resy,
-	int32_t rate
-)
-{
-	// NOTE: map is (complexes, res x, res y)
-	// uvs are (complexes, rate * rate)
-
-	int32_t tid = threadIdx.x + blockIdx.x * blockDim.x;
-	int32_t stride = blockDim.x * gridDim.x;
-
-	int32_t limit = complexes * rate * rate;
-	for (int32_t i = tid; i < limit; i += stride) {
-		float su = (resx - 1) * u[i];
-		float sv = (resy - 1) * v[i];
-
-		int32_t iu0 = floor(su);
-		int32_t iu1 = floor(su);
-
-		int32_t iv0 = ceil(sv);
-		int32_t iv1 = ceil(sv);
-
-		su -= iu0;
-		sv -= iv0;
-
-		int32_t ci = i / (rate * rate);
-
-		int32_t i0 = ci * resx * resy + iu0 * resx + iv0;
-		int32_t i1 = ci * resx * resy + iu1 * resx + iv0;
-		int32_t i2 = ci * resx * resy + iu0 * resx + iv1;
-		int32_t i3 = ci * resx * resy + iu1 * resx + iv1;
-
-		float3 f00 = map[i0] * (1 - su) * (1 - sv);
-		float3 f01 = map[i1] * su * (1 - sv);
-		float3 f10 = map[i2] * (1 - su) * sv;
-		float3 f11 = map[i3] * su * sv;
-
-		result[i] = f00 + f01 + f10 + f11;
-	}
-}
-
-__forceinline__ __device__
-float3 atomicAdd(float3 *addr, float3 val)
-{
-	float3 old;
-	old.x = atomicAdd(&addr->x, val.x);
-	old.y = atomicAdd(&addr->y, val.y);
-	old.z = atomicAdd(&addr->z, val.z);
-	return old;
-}
-
-__global__
-void kernel_ngf_texture_fetch_backward
-(
-	const float3 *__restrict__ grad_result,
-	const float *__restrict__ u,
-	const float *__restrict__ v,
-	float3 *__restrict__ dmap,
-	int32_t complexes,
-	int32_t resx,
-	int32_t resy,
-	int32_t rate
-)
-{
-	// NOTE: map is (complexes, res x, res y)
-	// uvs are (complexes, rate * rate)
-
-	int32_t tid = threadIdx.x + blockIdx.x * blockDim.x;
-	int32_t stride = blockDim.x * gridDim.x;
-
-	int32_t limit = complexes * rate * rate;
-	for (int32_t i = tid; i < limit; i += stride) {
-		float su = (resx - 1) * u[i];
-		float sv = (resy - 1) * v[i];
-
-		int32_t iu0 = floor(su);
-		int32_t iu1 = floor(su);
-
-		int32_t iv0 = ceil(sv);
-		int32_t iv1 = ceil(sv);
-
-		su -= iu0;
-		sv -= iv0;
-
-		int32_t ci = i / (rate * rate);
-		int32_t i0 = ci * resx * resy + iu0 * resx + iv0;
-		int32_t i1 = ci * resx * resy + iu1 * resx + iv0;
-		int32_t i2 = ci * resx * resy + iu0 * resx + iv1;
-		int32_t i3 = ci * resx * resy + iu1 * resx + iv1;
-
-		float3 d0 = (1 - su) * (1 - sv) * grad_result[i];
-		float3 d1 = su * (1 - sv) * grad_result[i];
-		float3 d2 = (1 - su) * sv * grad_result[i];
-		float3 d3 = su * sv * grad_result[i];
-
-		atomicAdd(&dmap[i0], d0);
-		atomicAdd(&dmap[i1], d1);
-		atomicAdd(&dmap[i2], d2);
-		atomicAdd(&dmap[i3], d3);
-
-//		dmap[i0] = (1 - su) * (1 - sv) * grad_result[i];
-//		dmap[i1] = su * (1 - sv) * grad_result[i];
-//		dmap[i2] = (1 - su) * sv * grad_result[i];
-//		dmap[i3] = su * sv * grad_result[i];
-	}
-}
-
-torch::Tensor ngf_texture_fetch_forward
-(
-	const torch::Tensor &map,
-	const torch::Tensor &u,
-	const torch::Tensor &v,
-	int32_t complexes,
-	int32_t resx,
-	int32_t resy,
-	int32_t rate
-)
-{
-	assert(map.is_cuda());
-	assert(u.is_cuda());
-	assert(v.is_cuda());
-
-	assert(map.dtype() == torch::kFloat32);
-	assert(u.dtype() == torch::kFloat32);
-	assert(v.dtype() == torch::kFloat32);
-
-	assert(map.dim() == 4);
-	assert(u.dim() == 2);
-	assert(v.dim() == 2);
-
-	auto options = torch::TensorOptions()
-		.dtype(torch::kFloat32)
-		.device(torch::kCUDA, 0);
-
-	torch::Tensor result = torch::zeros({ u.numel(), 3 }, options);
-
-	kernel_ngf_texture_fetch_forward <<< 64, 64 >>>
-	(
-		(float3 *) map.data_ptr <float> (),
-		u.data_ptr <float> (),
-		v.data_ptr <float> (),
-		(float3 *) result.mutable_data_ptr <float> (),
-		complexes,
-		resx, resy, rate
-	);
-
-	cudaDeviceSynchronize();
-
-	return result;
-}
-
-torch::Tensor ngf_texture_fetch_backward
-(
-	const torch::Tensor &d_color,
-	const torch::Tensor &u,
-	const torch::Tensor &v,
-	int32_t complexes,
-	int32_t resx,
-	int32_t resy,
-	int32_t rate
-)
-{
-	assert(d_color.is_cuda());
-	assert(u.is_cuda());
-	assert(v.is_cuda());
-
-	assert(d_color.dtype() == torch::kFloat32);
-	assert(u.dtype() == torch::kFloat32);
-	assert(v.dtype() == torch::kFloat32);
-
-	assert(d_color.dim() == 2);
-	assert(u.dim() == 2);
-	assert(v.dim() == 2);
-
-	auto options = torch::TensorOptions()
-		.dtype(torch::kFloat32)
-		.device(torch::kCUDA, 0);
-
-	torch::Tensor result = torch::zeros({ complexes, resx, resy, 3 }, options);
-
-	kernel_ngf_texture_fetch_backward <<< 64, 64 >>>
-	(
-		(float3 *) d_color.data_ptr <float> (),
-		u.data_ptr <float> (),
-		v.data_ptr <float> (),
-		(float3 *) result.mutable_data_ptr <float> (),
-		complexes,
-		resx, resy, rate
-	);
-
-	cudaDeviceSynchronize();
-
-	return result;
-}
-
 PYBIND11_MODULE(TORCH_EXTENSION_NAME, m)
 {
         py::class_ <geometry> (m, "geometry")
                 .def(py::init <const torch::Tensor &, const torch::Tensor &> ())
                 .def(py::init <const torch::Tensor &, const torch::Tensor &, const torch::Tensor &> ())
-		.def("deduplicate", &geometry::deduplicate)
+		.def("deduplicate", &geometry::deduplicate, py::arg("epsilon") = 0.0f)
 		.def("torched", &geometry::torched)
 		.def_readonly("vertices", &geometry::vertices)
 		.def_readonly("normals", &geometry::normals)
@@ -551,12 +311,34 @@ PYBIND11_MODULE(TORCH_EXTENSION_NAME, m)
 		.def("scatter", &remapper::scatter, "Scatter vertex data")
 		.def("scatter_device", &remapper::scatter_device, "Scatter vertex data");
 
+	py::class_ <bvh> (m, "bvh")
+		.def(py::init <const torch::Tensor &, const torch::Tensor &> ())
+		.def(py::init <const geometry &> ())
+		.def("closest", &bvh::closest, "Closest surface points: (distances, faces, points)")
+		.def("intersect", &bvh::intersect, "Nearest ray hits: (times, faces, barycentrics)",
+			py::arg("origins"), py::arg("directions"), py::arg("tmax") = INFINITY)
+		.def("__repr__", [](const bvh &b) {
+			return "bvh(triangles=" + std::to_string(b.triangles.size())
+				+ ", nodes=" + std::to_string(b.nodes.size()) + ")";
+		});
+
+	py::class_ <progressive_mesh> (m, "progressive_mesh")
+		.def(py::init <const torch::Tensor &, const torch::Tensor &> ())
+		.def("size", &progressive_mesh::size, "Size in bytes of a level of detail")
+		.def("extract", &progressive_mesh::extract, "Mesh after a number of collapses")
+		.def("extract_faces", &progressive_mesh::extract_faces, "Largest level of detail within a face count")
+		.def("extract_bytes", &progressive_mesh::extract_bytes, "Largest level of detail within a byte budget")
+		.def("__len__", [](const progressive_mesh &pm) { return pm.collapses.size() + 1; });
+
 	m.def("cluster_geometry", &cluster_geometry);
 	m.def("triangulate_shorted", &triangulate_shorted);
 	m.def("generate_remapper", &generate_remapper, "Generate remapper");
-	m.def("deduplicate", &deduplicate, "Deduplicate mesh vertices and reindex the mesh");
+	m.def("deduplicate", &deduplicate, "Deduplicate mesh vertices and reindex the mesh",
+		py::arg("vertices"), py::arg("triangles"), py::arg("epsilon") = 0.0f);
 	m.def("parametrize_chart", &parametrize, "Parametrize a chart with disk topology");
 	m.def("parametrize_multicharts", &parametrize_parallel, "Parametrize multiple charts with disk topology in parallel");
+	m.def("decimate", &decimate, "Simplify a triangle mesh to a target face count with quadric edge collapses");
+	m.def("quadrangulate", &quadrangulate, "Pair adjacent triangles into quadrilaterals");
 	m.def("load_mesh", &load_mesh);
 
 	m.def("ngf_texture_fetch_forward", &ngf_texture_fetch_forward);
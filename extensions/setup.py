@@ -2,11 +2,14 @@ from setuptools import setup
 from torch.utils.cpp_extension import BuildExtension, CUDAExtension
 
 sources = [
+    'bvh.cpp',
     'cluster.cpp',
     'mesh.cpp',
     'ngfutil.cu',
     'parametrize.cpp',
+    'simplify.cpp',
     'smoothing.cu',
+    'texture.cu',
     'triangulate.cu',
 ]
 
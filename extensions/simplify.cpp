@@ -0,0 +1,701 @@
+#include <algorithm>
+#include <cfloat>
+#include <cmath>
+#include <queue>
+
+#include <glm/glm.hpp>
+
+#include "common.hpp"
+#include "util.hpp"
+
+// Quadric error metric, stored as the upper triangle of a symmetric 4x4 matrix
+struct quadric {
+	double m[10] = { 0 };
+
+	static quadric plane(const glm::dvec3 &n, double d, double weight) {
+		quadric q;
+		q.m[0] = weight * n.x * n.x;
+		q.m[1] = weight * n.x * n.y;
+		q.m[2] = weight * n.x * n.z;
+		q.m[3] = weight * n.x * d;
+		q.m[4] = weight * n.y * n.y;
+		q.m[5] = weight * n.y * n.z;
+		q.m[6] = weight * n.y * d;
+		q.m[7] = weight * n.z * n.z;
+		q.m[8] = weight * n.z * d;
+		q.m[9] = weight * d * d;
+		return q;
+	}
+
+	quadric &operator+=(const quadric &other) {
+		for (int32_t i = 0; i < 10; i++)
+			m[i] += other.m[i];
+
+		return *this;
+	}
+
+	double error(const glm::dvec3 &v) const {
+		return m[0] * v.x * v.x + 2 * m[1] * v.x * v.y + 2 * m[2] * v.x * v.z + 2 * m[3] * v.x
+			+ m[4] * v.y * v.y + 2 * m[5] * v.y * v.z + 2 * m[6] * v.y
+			+ m[7] * v.z * v.z + 2 * m[8] * v.z
+			+ m[9];
+	}
+
+	// Position minimizing the error, if the system is well conditioned
+	bool minimizer(glm::dvec3 &v) const {
+		glm::dmat3 A {
+			m[0], m[1], m[2],
+			m[1], m[4], m[5],
+			m[2], m[5], m[7]
+		};
+
+		double trace = m[0] + m[4] + m[7];
+		double det = glm::determinant(A);
+		if (std::abs(det) <= 1e-9 * trace * trace * trace)
+			return false;
+
+		v = -(glm::inverse(A) * glm::dvec3 { m[3], m[6], m[8] });
+		return true;
+	}
+};
+
+static uint64_t edge_key(int32_t a, int32_t b)
+{
+	if (a > b)
+		std::swap(a, b);
+
+	return (uint64_t(a) << 32) | uint32_t(b);
+}
+
+// Quadric edge collapse simplification (Garland and Heckbert)
+struct simplifier {
+	struct candidate {
+		double cost;
+		int32_t v0;
+		int32_t v1;
+		uint32_t s0;
+		uint32_t s1;
+		glm::dvec3 position;
+
+		// Reversed for a min-heap
+		bool operator<(const candidate &other) const {
+			return cost > other.cost;
+		}
+	};
+
+	std::vector <glm::dvec3> positions;
+	std::vector <glm::ivec3> triangles;
+	std::vector <quadric> quadrics;
+	std::vector <std::vector <int32_t>> incidence; // vertices -> triangles
+	std::vector <uint32_t> versions;
+	std::vector <int32_t> parent;
+	std::vector <uint8_t> removed;
+
+	std::priority_queue <candidate> heap;
+
+	int64_t alive = 0;
+
+	simplifier(const torch::Tensor &vertices, const torch::Tensor &faces) {
+		assert(vertices.dim() == 2 && vertices.size(1) == 3);
+		assert(vertices.dtype() == torch::kFloat32);
+		assert(vertices.is_cpu());
+
+		assert(faces.dim() == 2 && faces.size(1) == 3);
+		assert(faces.dtype() == torch::kInt32);
+		assert(faces.is_cpu());
+
+		torch::Tensor cv = vertices.contiguous();
+		torch::Tensor cf = faces.contiguous();
+
+		const glm::vec3 *vertices_ptr = (const glm::vec3 *) cv.data_ptr <float> ();
+		const glm::ivec3 *faces_ptr = (const glm::ivec3 *) cf.data_ptr <int32_t> ();
+
+		positions.resize(cv.size(0));
+		triangles.assign(faces_ptr, faces_ptr + cf.size(0));
+
+		parallel_for(positions.size(), [&](size_t i) {
+			positions[i] = glm::dvec3(vertices_ptr[i]);
+		});
+
+		versions.resize(positions.size(), 0);
+		parent.resize(positions.size(), -1);
+		removed.resize(triangles.size(), 0);
+		alive = triangles.size();
+
+		incidence.resize(positions.size());
+		for (size_t i = 0; i < triangles.size(); i++) {
+			for (int32_t k = 0; k < 3; k++)
+				incidence[triangles[i][k]].push_back(i);
+		}
+
+		initialize_quadrics();
+		initialize_candidates();
+	}
+
+	void initialize_quadrics() {
+		// Area weighted plane of every triangle
+		std::vector <quadric> planes(triangles.size());
+		parallel_for(triangles.size(), [&](size_t i) {
+			const glm::ivec3 &t = triangles[i];
+			glm::dvec3 n = glm::cross(positions[t.y] - positions[t.x], positions[t.z] - positions[t.x]);
+
+			double length = glm::length(n);
+			if (length <= 0.0)
+				return;
+
+			n /= length;
+			planes[i] = quadric::plane(n, -glm::dot(n, positions[t.x]), 0.5 * length);
+		});
+
+		quadrics.resize(positions.size());
+		parallel_for(positions.size(), [&](size_t i) {
+			for (int32_t f : incidence[i])
+				quadrics[i] += planes[f];
+		});
+
+		// Boundaries are constrained by planes perpendicular to the surface
+		std::vector <std::pair <uint64_t, int32_t>> edges;
+		edges.reserve(3 * triangles.size());
+		for (size_t i = 0; i < triangles.size(); i++) {
+			for (int32_t k = 0; k < 3; k++)
+				edges.emplace_back(edge_key(triangles[i][k], triangles[i][(k + 1) % 3]), 3 * i + k);
+		}
+
+		std::sort(edges.begin(), edges.end());
+
+		for (size_t i = 0; i < edges.size(); i++) {
+			bool lonely = (i == 0 || edges[i - 1].first != edges[i].first)
+				&& (i + 1 == edges.size() || edges[i + 1].first != edges[i].first);
+
+			if (!lonely)
+				continue;
+
+			int32_t f = edges[i].second / 3;
+			int32_t k = edges[i].second % 3;
+
+			const glm::ivec3 &t = triangles[f];
+			glm::dvec3 a = positions[t[k]];
+			glm::dvec3 b = positions[t[(k + 1) % 3]];
+			glm::dvec3 c = positions[t[(k + 2) % 3]];
+
+			glm::dvec3 e = b - a;
+			glm::dvec3 n = glm::cross(e, glm::cross(e, c - a));
+
+			double length = glm::length(n);
+			if (length <= 0.0)
+				continue;
+
+			n /= length;
+
+			quadric q = quadric::plane(n, -glm::dot(n, a), 1e3 * glm::dot(e, e));
+			quadrics[t[k]] += q;
+			quadrics[t[(k + 1) % 3]] += q;
+		}
+	}
+
+	void initialize_candidates() {
+		std::vector <uint64_t> keys;
+		keys.reserve(3 * triangles.size());
+		for (const glm::ivec3 &t : triangles) {
+			keys.push_back(edge_key(t.x, t.y));
+			keys.push_back(edge_key(t.y, t.z));
+			keys.push_back(edge_key(t.z, t.x));
+		}
+
+		std::sort(keys.begin(), keys.end());
+		keys.erase(std::unique(keys.begin(), keys.end()), keys.end());
+
+		std::vector <candidate> candidates(keys.size());
+		parallel_for(keys.size(), [&](size_t i) {
+			candidates[i] = evaluate(keys[i] >> 32, keys[i] & 0xFFFFFFFF);
+		});
+
+		heap = std::priority_queue <candidate> (std::less <candidate> (), std::move(candidates));
+	}
+
+	candidate evaluate(int32_t v0, int32_t v1) const {
+		quadric q = quadrics[v0];
+		q += quadrics[v1];
+
+		const glm::dvec3 &p0 = positions[v0];
+		const glm::dvec3 &p1 = positions[v1];
+
+		candidate c { DBL_MAX, v0, v1, versions[v0], versions[v1], p0 };
+
+		// Optimal placement, unless it strays far from the edge
+		glm::dvec3 p;
+		if (q.minimizer(p) && glm::length(p - 0.5 * (p0 + p1)) <= glm::length(p1 - p0)) {
+			c.cost = q.error(p);
+			c.position = p;
+		}
+
+		for (const glm::dvec3 &alternative : { p0, p1, 0.5 * (p0 + p1) }) {
+			double cost = q.error(alternative);
+			if (cost < c.cost) {
+				c.cost = cost;
+				c.position = alternative;
+			}
+		}
+
+		return c;
+	}
+
+	std::vector <int32_t> neighbors(int32_t v) const {
+		std::vector <int32_t> result;
+		for (int32_t f : incidence[v]) {
+			if (removed[f])
+				continue;
+
+			for (int32_t k = 0; k < 3; k++) {
+				if (triangles[f][k] != v)
+					result.push_back(triangles[f][k]);
+			}
+		}
+
+		std::sort(result.begin(), result.end());
+		result.erase(std::unique(result.begin(), result.end()), result.end());
+		return result;
+	}
+
+	bool valid(const candidate &c) const {
+		// Link condition; more shared neighbors would pinch the surface
+		std::vector <int32_t> n0 = neighbors(c.v0);
+		std::vector <int32_t> n1 = neighbors(c.v1);
+
+		std::vector <int32_t> shared;
+		std::set_intersection(n0.begin(), n0.end(), n1.begin(), n1.end(), std::back_inserter(shared));
+
+		int32_t faces = 0;
+		for (int32_t f : incidence[c.v0]) {
+			const glm::ivec3 &t = triangles[f];
+			faces += !removed[f] && (t.x == c.v1 || t.y == c.v1 || t.z == c.v1);
+		}
+
+		if ((int32_t) shared.size() > faces)
+			return false;
+
+		// Reject collapses which fold triangles over
+		for (int32_t v : { c.v0, c.v1 }) {
+			for (int32_t f : incidence[v]) {
+				if (removed[f])
+					continue;
+
+				const glm::ivec3 &t = triangles[f];
+				if ((t.x == c.v0 || t.y == c.v0 || t.z == c.v0) && (t.x == c.v1 || t.y == c.v1 || t.z == c.v1))
+					continue;
+
+				glm::dvec3 p[3] = { positions[t.x], positions[t.y], positions[t.z] };
+				glm::dvec3 before = glm::cross(p[1] - p[0], p[2] - p[0]);
+
+				for (int32_t k = 0; k < 3; k++) {
+					if (t[k] == v)
+						p[k] = c.position;
+				}
+
+				glm::dvec3 after = glm::cross(p[1] - p[0], p[2] - p[0]);
+				if (glm::dot(before, after) <= 0.2 * glm::length(before) * glm::length(after))
+					return false;
+			}
+		}
+
+		return true;
+	}
+
+	// Merges v1 into v0, returning the number of removed triangles
+	int32_t collapse(const candidate &c) {
+		int32_t v0 = c.v0;
+		int32_t v1 = c.v1;
+
+		int32_t count = 0;
+		for (int32_t f : incidence[v1]) {
+			if (removed[f])
+				continue;
+
+			glm::ivec3 &t = triangles[f];
+			if (t.x == v0 || t.y == v0 || t.z == v0) {
+				removed[f] = 1;
+				count++;
+				continue;
+			}
+
+			for (int32_t k = 0; k < 3; k++) {
+				if (t[k] == v1)
+					t[k] = v0;
+			}
+		}
+
+		alive -= count;
+
+		positions[v0] = c.position;
+		quadrics[v0] += quadrics[v1];
+		parent[v1] = v0;
+		versions[v0]++;
+		versions[v1]++;
+
+		std::vector <int32_t> merged;
+		merged.reserve(incidence[v0].size() + incidence[v1].size());
+		for (int32_t v : { v0, v1 }) {
+			for (int32_t f : incidence[v]) {
+				if (!removed[f])
+					merged.push_back(f);
+			}
+		}
+
+		std::sort(merged.begin(), merged.end());
+		merged.erase(std::unique(merged.begin(), merged.end()), merged.end());
+
+		incidence[v0] = std::move(merged);
+		incidence[v1].clear();
+		incidence[v1].shrink_to_fit();
+
+		for (int32_t n : neighbors(v0))
+			heap.push(evaluate(v0, n));
+
+		return count;
+	}
+
+	template <typename F>
+	void run(int64_t target, const F &record) {
+		while (alive > target && !heap.empty()) {
+			candidate c = heap.top();
+			heap.pop();
+
+			// Stale entries refer to vertices which have since moved
+			if (parent[c.v0] >= 0 || parent[c.v1] >= 0)
+				continue;
+			if (versions[c.v0] != c.s0 || versions[c.v1] != c.s1)
+				continue;
+			if (!valid(c))
+				continue;
+
+			record(c, collapse(c));
+		}
+	}
+
+	std::tuple <torch::Tensor, torch::Tensor> compact() const {
+		std::vector <int32_t> indices(positions.size(), -1);
+		std::vector <glm::vec3> new_vertices;
+		std::vector <glm::ivec3> new_triangles;
+
+		for (size_t i = 0; i < triangles.size(); i++) {
+			if (removed[i])
+				continue;
+
+			glm::ivec3 t = triangles[i];
+			for (int32_t k = 0; k < 3; k++) {
+				if (indices[t[k]] < 0) {
+					indices[t[k]] = new_vertices.size();
+					new_vertices.push_back(glm::vec3(positions[t[k]]));
+				}
+
+				t[k] = indices[t[k]];
+			}
+
+			new_triangles.push_back(t);
+		}
+
+		return std::make_tuple
+		(
+			vector_to_tensor <glm::vec3, torch::kFloat32, 3> (new_vertices),
+			vector_to_tensor <glm::ivec3, torch::kInt32, 3> (new_triangles)
+		);
+	}
+};
+
+std::tuple <torch::Tensor, torch::Tensor> decimate(const torch::Tensor &vertices, const torch::Tensor &faces, int64_t target)
+{
+	simplifier s(vertices, faces);
+	s.run(target, [](const simplifier::candidate &, int32_t) {});
+	return s.compact();
+}
+
+// Pairing adjacent triangles into quadrilaterals
+struct pairing {
+	int32_t f0;
+	int32_t f1;
+	glm::ivec4 quad;
+	float score;
+};
+
+static bool pair_triangles(const std::vector <glm::vec3> &vertices, const glm::ivec3 &t0, const glm::ivec3 &t1, int32_t k, pairing &p)
+{
+	// Shared edge runs x -> y in the first triangle and y -> x in the second
+	int32_t x = t0[k];
+	int32_t y = t0[(k + 1) % 3];
+	int32_t z = t0[(k + 2) % 3];
+
+	int32_t w = -1;
+	for (int32_t j = 0; j < 3; j++) {
+		if (t1[j] == y && t1[(j + 1) % 3] == x)
+			w = t1[(j + 2) % 3];
+	}
+
+	// Inconsistently oriented neighbors
+	if (w < 0)
+		return false;
+
+	glm::vec3 n0 = glm::cross(vertices[y] - vertices[x], vertices[z] - vertices[x]);
+	glm::vec3 n1 = glm::cross(vertices[x] - vertices[y], vertices[w] - vertices[y]);
+	if (glm::length(n0) <= 0.0f || glm::length(n1) <= 0.0f)
+		return false;
+
+	n0 = glm::normalize(n0);
+	n1 = glm::normalize(n1);
+
+	float planarity = 1.0f - glm::dot(n0, n1);
+	if (planarity > 0.5f)
+		return false;
+
+	// Deviation of the corners from right angles, rejecting concave quads
+	glm::ivec4 quad { x, w, y, z };
+	glm::vec3 normal = n0 + n1;
+
+	float deviation = 0.0f;
+	for (int32_t i = 0; i < 4; i++) {
+		glm::vec3 a = vertices[quad[(i + 3) % 4]] - vertices[quad[i]];
+		glm::vec3 b = vertices[quad[(i + 1) % 4]] - vertices[quad[i]];
+		if (glm::dot(glm::cross(b, a), normal) <= 0.0f)
+			return false;
+
+		deviation += std::abs(glm::dot(glm::normalize(a), glm::normalize(b)));
+	}
+
+	p.quad = quad;
+	p.score = deviation + planarity;
+	return true;
+}
+
+std::tuple <torch::Tensor, torch::Tensor> quadrangulate(const torch::Tensor &vertices, const torch::Tensor &faces)
+{
+	assert(vertices.dim() == 2 && vertices.size(1) == 3);
+	assert(vertices.dtype() == torch::kFloat32);
+	assert(vertices.is_cpu());
+
+	assert(faces.dim() == 2 && faces.size(1) == 3);
+	assert(faces.dtype() == torch::kInt32);
+	assert(faces.is_cpu());
+
+	torch::Tensor cv = vertices.contiguous();
+	torch::Tensor cf = faces.contiguous();
+
+	const glm::vec3 *vertices_ptr = (const glm::vec3 *) cv.data_ptr <float> ();
+	const glm::ivec3 *faces_ptr = (const glm::ivec3 *) cf.data_ptr <int32_t> ();
+
+	std::vector <glm::vec3> V(vertices_ptr, vertices_ptr + cv.size(0));
+	std::vector <glm::ivec3> T(faces_ptr, faces_ptr + cf.size(0));
+
+	// Manifold interior edges are the pairing candidates
+	std::vector <std::pair <uint64_t, int32_t>> edges;
+	edges.reserve(3 * T.size());
+	for (size_t i = 0; i < T.size(); i++) {
+		for (int32_t k = 0; k < 3; k++)
+			edges.emplace_back(edge_key(T[i][k], T[i][(k + 1) % 3]), 3 * i + k);
+	}
+
+	std::sort(edges.begin(), edges.end());
+
+	std::vector <std::pair <int32_t, int32_t>> shared;
+	for (size_t i = 0; i + 1 < edges.size(); i++) {
+		if (edges[i].first != edges[i + 1].first)
+			continue;
+
+		bool manifold = (i + 2 == edges.size() || edges[i + 2].first != edges[i].first)
+			&& (i == 0 || edges[i - 1].first != edges[i].first);
+
+		if (manifold)
+			shared.emplace_back(edges[i].second, edges[i + 1].second);
+	}
+
+	std::vector <pairing> pairings(shared.size());
+	std::vector <uint8_t> viable(shared.size(), 0);
+	parallel_for(shared.size(), [&](size_t i) {
+		int32_t f0 = shared[i].first / 3;
+		int32_t f1 = shared[i].second / 3;
+
+		pairings[i].f0 = f0;
+		pairings[i].f1 = f1;
+		viable[i] = pair_triangles(V, T[f0], T[f1], shared[i].first % 3, pairings[i]);
+	});
+
+	std::vector <int32_t> order;
+	for (size_t i = 0; i < shared.size(); i++) {
+		if (viable[i])
+			order.push_back(i);
+	}
+
+	std::sort(order.begin(), order.end(), [&](int32_t a, int32_t b) {
+		return pairings[a].score < pairings[b].score;
+	});
+
+	// Greedy matching, best shaped quads first
+	std::vector <int32_t> match(T.size(), -1);
+	for (int32_t i : order) {
+		const pairing &p = pairings[i];
+		if (match[p.f0] < 0 && match[p.f1] < 0) {
+			match[p.f0] = i;
+			match[p.f1] = i;
+		}
+	}
+
+	// Augmenting paths of length three: free - matched = matched - free
+	std::vector <std::vector <int32_t>> options(T.size());
+	for (int32_t i : order) {
+		options[pairings[i].f0].push_back(i);
+		options[pairings[i].f1].push_back(i);
+	}
+
+	auto other = [&](int32_t i, int32_t f) {
+		return pairings[i].f0 == f ? pairings[i].f1 : pairings[i].f0;
+	};
+
+	for (int32_t pass = 0; pass < 4; pass++) {
+		int32_t augmented = 0;
+		for (int32_t t = 0; t < (int32_t) T.size(); t++) {
+			if (match[t] >= 0)
+				continue;
+
+			for (int32_t i : options[t]) {
+				int32_t u = other(i, t);
+				if (match[u] < 0 || match[t] >= 0)
+					continue;
+
+				int32_t v = other(match[u], u);
+				for (int32_t j : options[v]) {
+					int32_t w = other(j, v);
+					if (w == u || w == t || match[w] >= 0)
+						continue;
+
+					match[t] = match[u] = i;
+					match[v] = match[w] = j;
+					augmented++;
+					break;
+				}
+			}
+		}
+
+		if (augmented == 0)
+			break;
+	}
+
+	std::vector <glm::ivec4> quads;
+	std::vector <glm::ivec3> remaining;
+	for (int32_t t = 0; t < (int32_t) T.size(); t++) {
+		if (match[t] < 0)
+			remaining.push_back(T[t]);
+		else if (pairings[match[t]].f0 == t)
+			quads.push_back(pairings[match[t]].quad);
+	}
+
+	return std::make_tuple
+	(
+		vector_to_tensor <glm::ivec4, torch::kInt32, 4> (quads),
+		vector_to_tensor <glm::ivec3, torch::kInt32, 3> (remaining)
+	);
+}
+
+// Progressive mesh: the full collapse sequence, so any level of detail can be replayed
+progressive_mesh::progressive_mesh(const torch::Tensor &vertices, const torch::Tensor &faces)
+{
+	simplifier s(vertices, faces);
+
+	positions.resize(s.positions.size());
+	for (size_t i = 0; i < positions.size(); i++)
+		positions[i] = glm::vec3(s.positions[i]);
+
+	triangles = s.triangles;
+
+	std::vector <uint8_t> referenced(positions.size(), 0);
+	for (const glm::ivec3 &t : triangles)
+		referenced[t.x] = referenced[t.y] = referenced[t.z] = 1;
+
+	vertex_count = std::count(referenced.begin(), referenced.end(), 1);
+	face_counts.push_back(triangles.size());
+
+	s.run(0, [&](const simplifier::candidate &c, int32_t removed) {
+		collapses.push_back({ c.v0, c.v1, glm::vec3(c.position) });
+		face_counts.push_back(face_counts.back() - removed);
+	});
+}
+
+int64_t progressive_mesh::size(int64_t level) const
+{
+	// Bytes for float32 positions and int32 indices
+	return 12 * (vertex_count - level) + 12 * face_counts[level];
+}
+
+std::tuple <torch::Tensor, torch::Tensor> progressive_mesh::extract(int64_t level) const
+{
+	level = std::clamp <int64_t> (level, 0, collapses.size());
+
+	std::vector <int32_t> parent(positions.size(), -1);
+	std::vector <glm::vec3> current = positions;
+	for (int64_t i = 0; i < level; i++) {
+		const collapse &c = collapses[i];
+		parent[c.v1] = c.v0;
+		current[c.v0] = c.position;
+	}
+
+	auto root = [&](int32_t v) {
+		int32_t r = v;
+		while (parent[r] >= 0)
+			r = parent[r];
+
+		// Path compression
+		while (parent[v] >= 0) {
+			int32_t next = parent[v];
+			parent[v] = r;
+			v = next;
+		}
+
+		return r;
+	};
+
+	std::vector <int32_t> indices(positions.size(), -1);
+	std::vector <glm::vec3> new_vertices;
+	std::vector <glm::ivec3> new_triangles;
+
+	for (const glm::ivec3 &t : triangles) {
+		glm::ivec3 r { root(t.x), root(t.y), root(t.z) };
+		if (r.x == r.y || r.y == r.z || r.z == r.x)
+			continue;
+
+		for (int32_t k = 0; k < 3; k++) {
+			if (indices[r[k]] < 0) {
+				indices[r[k]] = new_vertices.size();
+				new_vertices.push_back(current[r[k]]);
+			}
+
+			r[k] = indices[r[k]];
+		}
+
+		new_triangles.push_back(r);
+	}
+
+	return std::make_tuple
+	(
+		vector_to_tensor <glm::vec3, torch::kFloat32, 3> (new_vertices),
+		vector_to_tensor <glm::ivec3, torch::kInt32, 3> (new_triangles)
+	);
+}
+
+std::tuple <torch::Tensor, torch::Tensor> progressive_mesh::extract_faces(int64_t count) const
+{
+	// Face counts only decrease along the sequence
+	auto it = std::partition_point(face_counts.begin(), face_counts.end(), [&](int64_t c) { return c > count; });
+	return extract(std::min <int64_t> (it - face_counts.begin(), collapses.size()));
+}
+
+std::tuple <torch::Tensor, torch::Tensor> progressive_mesh::extract_bytes(int64_t bytes) const
+{
+	int64_t low = 0;
+	int64_t high = collapses.size();
+	while (low < high) {
+		int64_t mid = (low + high) / 2;
+		if (size(mid) > bytes)
+			low = mid + 1;
+		else
+			high = mid;
+	}
+
+	return extract(low);
+}
@@ -1,4 +1,5 @@
 #include "common.hpp"
+#include "util.hpp"
 
 // TODO: can make faster by avoided strided access, e.g. index per vertex per adjancency...
 __global__
@@ -22,7 +23,7 @@ void kernel_smooth
 
 		const int32_t *base = graph + i * bound;
 		int32_t k = 0;
-		while (base[k] >= 0) {
+		while (k < bound && base[k] >= 0) {
 			float3 v = vertices[base[k++]];
 			x += v.x;
 			y += v.y;
@@ -64,20 +65,24 @@ void Graph::allocate_device_graph()
 	for (auto &kv : graph)
 		bound = std::max(bound, (int32_t) kv.second.size());
 
-	// Allocate a device graph
+	// Padded adjacency, terminated by -1 when a vertex has fewer neighbors
 	int32_t graph_size = count * bound;
-	cudaMalloc(&device, graph_size * sizeof(int32_t));
 
-	std::vector <int32_t> host_graph(graph_size, -1);
+	host.assign(graph_size, -1);
 	for (size_t i = 0; i < count; i++) {
-		int32_t *base = host_graph.data() + i * bound;
+		int32_t *base = host.data() + i * bound;
 
 		size_t j = 0;
 		for (int32_t v : graph[i])
 			base[j++] = v;
 	}
 
-	cudaMemcpy(device, host_graph.data(), graph_size * sizeof(int32_t), cudaMemcpyHostToDevice);
+	// CPU only machines smooth with the host graph
+	if (!torch::cuda::is_available())
+		return;
+
+	cudaMalloc(&device, graph_size * sizeof(int32_t));
+	cudaMemcpy(device, host.data(), graph_size * sizeof(int32_t), cudaMemcpyHostToDevice);
 }
 
 void Graph::initialize_from_triangles(const torch::Tensor &triangles)
@@ -88,10 +93,11 @@ void Graph::initialize_from_triangles(const torch::Tensor &triangles)
 
 	int32_t triangle_count = triangles.size(0);
 
+	auto accessor = triangles.accessor <int32_t, 2> ();
 	for (uint32_t i = 0; i < triangle_count; i++) {
-		int32_t v0 = triangles[i][0].item().to <int32_t> ();
-		int32_t v1 = triangles[i][1].item().to <int32_t> ();
-		int32_t v2 = triangles[i][2].item().to <int32_t> ();
+		int32_t v0 = accessor[i][0];
+		int32_t v1 = accessor[i][1];
+		int32_t v2 = accessor[i][2];
 
 		graph[v0].insert(v1);
 		graph[v0].insert(v2);
@@ -114,11 +120,12 @@ void Graph::initialize_from_quadrilaterals(const torch::Tensor &quads)
 
 	int32_t quad_count = quads.size(0);
 
+	auto accessor = quads.accessor <int32_t, 2> ();
 	for (uint32_t i = 0; i < quad_count; i++) {
-		int32_t v0 = quads[i][0].item().to <int32_t> ();
-		int32_t v1 = quads[i][1].item().to <int32_t> ();
-		int32_t v2 = quads[i][2].item().to <int32_t> ();
-		int32_t v3 = quads[i][3].item().to <int32_t> ();
+		int32_t v0 = accessor[i][0];
+		int32_t v1 = accessor[i][1];
+		int32_t v2 = accessor[i][2];
+		int32_t v3 = accessor[i][3];
 
 		graph[v0].insert(v1);
 		graph[v0].insert(v3);
@@ -140,15 +147,35 @@ torch::Tensor Graph::smooth(const torch::Tensor &vertices, float factor) const
 {
 	assert(vertices.dim() == 2 && vertices.size(1) == 3);
 	assert(vertices.dtype() == torch::kFloat32);
-	assert(vertices.device().is_cuda());
 	assert(vertices.size(0) <= count);
 
 	torch::Tensor result = torch::zeros_like(vertices);
+
+	if (vertices.device().is_cpu()) {
+		const glm::vec3 *src = (const glm::vec3 *) vertices.data_ptr <float> ();
+		glm::vec3 *dst = (glm::vec3 *) result.data_ptr <float> ();
+
+		parallel_for(vertices.size(0), [&](size_t i) {
+			const int32_t *base = host.data() + i * bound;
+
+			glm::vec3 sum(0.0f);
+
+			int32_t k = 0;
+			while (k < bound && base[k] >= 0)
+				sum += src[base[k++]];
+
+			dst[i] = (k > 0) ? sum/float(k) : src[i];
+		});
+
+		return result;
+	}
+
+	assert(device);
 	kernel_smooth <<< 64, 64 >>>
 	(
 		(float3 *) vertices.data_ptr <float> (), device,
 		(float3 *) result.data_ptr <float> (),
-		count, bound, factor
+		vertices.size(0), bound, factor
 	);
 
 	cudaDeviceSynchronize();
@@ -0,0 +1,257 @@
+#include "common.hpp"
+#include "util.hpp"
+
+// Corners and weights of a bilinear lookup into a res x by res y grid, with uv clamped to the patch
+struct bilinear_footprint {
+	int32_t x0, x1;
+	int32_t y0, y1;
+	float fx, fy;
+};
+
+__forceinline__ __host__ __device__
+void bilinear_axis(float t, int32_t res, int32_t &i0, int32_t &i1, float &f)
+{
+	t = fminf(fmaxf(t, 0.0f), 1.0f) * (res - 1);
+
+	// The last cell is closed so that t = 1 lands on the last texel with full weight
+	int32_t last = res > 1 ? res - 2 : 0;
+	i0 = (int32_t) floorf(t);
+	i0 = i0 < last ? i0 : last;
+	i1 = res > 1 ? i0 + 1 : 0;
+	f = t - i0;
+}
+
+__forceinline__ __host__ __device__
+bilinear_footprint bilinear(float u, float v, int32_t resx, int32_t resy)
+{
+	bilinear_footprint fp;
+	bilinear_axis(u, resx, fp.x0, fp.x1, fp.fx);
+	bilinear_axis(v, resy, fp.y0, fp.y1, fp.fy);
+	return fp;
+}
+
+// NOTE: map is (complexes, res x, res y, channels), uvs are (complexes, samples)
+__forceinline__ __host__ __device__
+void texture_fetch_sample
+(
+	const float *__restrict__ map,
+	const float *__restrict__ u,
+	const float *__restrict__ v,
+	float *__restrict__ result,
+	int32_t samples,
+	int32_t resx,
+	int32_t resy,
+	int32_t channels,
+	int64_t i
+)
+{
+	int64_t ci = i / samples;
+	bilinear_footprint fp = bilinear(u[i], v[i], resx, resy);
+
+	const float *texels = map + ci * resx * resy * channels;
+	const float *t00 = texels + (fp.x0 * resy + fp.y0) * channels;
+	const float *t10 = texels + (fp.x1 * resy + fp.y0) * channels;
+	const float *t01 = texels + (fp.x0 * resy + fp.y1) * channels;
+	const float *t11 = texels + (fp.x1 * resy + fp.y1) * channels;
+
+	float w00 = (1 - fp.fx) * (1 - fp.fy);
+	float w10 = fp.fx * (1 - fp.fy);
+	float w01 = (1 - fp.fx) * fp.fy;
+	float w11 = fp.fx * fp.fy;
+
+	float *out = result + i * channels;
+	for (int32_t k = 0; k < channels; k++)
+		out[k] = w00 * t00[k] + w10 * t10[k] + w01 * t01[k] + w11 * t11[k];
+}
+
+// Accumulates the gradient of one channel of one patch over all of its samples, in sample order;
+// every texel is owned by exactly one thread, so no atomics are needed and the sums are deterministic
+__forceinline__ __host__ __device__
+void texture_fetch_gather
+(
+	const float *__restrict__ grad_result,
+	const float *__restrict__ u,
+	const float *__restrict__ v,
+	float *__restrict__ dmap,
+	int32_t samples,
+	int32_t resx,
+	int32_t resy,
+	int32_t channels,
+	int64_t ci,
+	int32_t k
+)
+{
+	float *texels = dmap + ci * resx * resy * channels + k;
+	for (int32_t s = 0; s < samples; s++) {
+		int64_t i = ci * samples + s;
+
+		bilinear_footprint fp = bilinear(u[i], v[i], resx, resy);
+		float g = grad_result[i * channels + k];
+
+		texels[(fp.x0 * resy + fp.y0) * channels] += (1 - fp.fx) * (1 - fp.fy) * g;
+		texels[(fp.x1 * resy + fp.y0) * channels] += fp.fx * (1 - fp.fy) * g;
+		texels[(fp.x0 * resy + fp.y1) * channels] += (1 - fp.fx) * fp.fy * g;
+		texels[(fp.x1 * resy + fp.y1) * channels] += fp.fx * fp.fy * g;
+	}
+}
+
+__global__
+void kernel_ngf_texture_fetch_forward
+(
+	const float *__restrict__ map,
+	const float *__restrict__ u,
+	const float *__restrict__ v,
+	float *__restrict__ result,
+	int64_t count,
+	int32_t samples,
+	int32_t resx,
+	int32_t resy,
+	int32_t channels
+)
+{
+	int64_t i = threadIdx.x + (int64_t) blockIdx.x * blockDim.x;
+	if (i < count)
+		texture_fetch_sample(map, u, v, result, samples, resx, resy, channels, i);
+}
+
+__global__
+void kernel_ngf_texture_fetch_backward
+(
+	const float *__restrict__ grad_result,
+	const float *__restrict__ u,
+	const float *__restrict__ v,
+	float *__restrict__ dmap,
+	int64_t complexes,
+	int32_t samples,
+	int32_t resx,
+	int32_t resy,
+	int32_t channels
+)
+{
+	// Channels are the fastest index so that neighbouring threads read the same uvs
+	int64_t i = threadIdx.x + (int64_t) blockIdx.x * blockDim.x;
+	if (i < complexes * channels)
+		texture_fetch_gather(grad_result, u, v, dmap, samples, resx, resy, channels, i / channels, i % channels);
+}
+
+static void texture_fetch_check(const torch::Tensor &u, const torch::Tensor &v)
+{
+	assert(u.dtype() == torch::kFloat32);
+	assert(v.dtype() == torch::kFloat32);
+
+	assert(u.dim() == 2);
+	assert(u.sizes() == v.sizes());
+	assert(u.device() == v.device());
+}
+
+torch::Tensor ngf_texture_fetch_forward(const torch::Tensor &map, const torch::Tensor &u, const torch::Tensor &v)
+{
+	texture_fetch_check(u, v);
+
+	assert(map.dtype() == torch::kFloat32);
+	assert(map.dim() == 4);
+	assert(map.size(0) == u.size(0));
+	assert(map.device() == u.device());
+
+	torch::Tensor cmap = map.contiguous();
+	torch::Tensor cu = u.contiguous();
+	torch::Tensor cv = v.contiguous();
+
+	int64_t count = u.numel();
+	int32_t samples = u.size(1);
+	int32_t resx = map.size(1);
+	int32_t resy = map.size(2);
+	int32_t channels = map.size(3);
+
+	auto options = torch::TensorOptions()
+		.dtype(torch::kFloat32)
+		.device(map.device());
+
+	torch::Tensor result = torch::empty({ count, channels }, options);
+	if (count == 0)
+		return result;
+
+	const float *map_ptr = cmap.data_ptr <float> ();
+	const float *u_ptr = cu.data_ptr <float> ();
+	const float *v_ptr = cv.data_ptr <float> ();
+	float *result_ptr = result.data_ptr <float> ();
+
+	if (map.device().is_cpu()) {
+		parallel_for(count, [&](size_t i) {
+			texture_fetch_sample(map_ptr, u_ptr, v_ptr, result_ptr, samples, resx, resy, channels, i);
+		});
+
+		return result;
+	}
+
+	int64_t threads = 256;
+	int64_t blocks = (count + threads - 1) / threads;
+
+	kernel_ngf_texture_fetch_forward <<< blocks, threads >>>
+	(
+		map_ptr, u_ptr, v_ptr, result_ptr,
+		count, samples,
+		resx, resy, channels
+	);
+
+	return result;
+}
+
+torch::Tensor ngf_texture_fetch_backward
+(
+	const torch::Tensor &grad_result,
+	const torch::Tensor &u,
+	const torch::Tensor &v,
+	int32_t resx,
+	int32_t resy
+)
+{
+	texture_fetch_check(u, v);
+
+	assert(grad_result.dtype() == torch::kFloat32);
+	assert(grad_result.dim() == 2);
+	assert(grad_result.size(0) == u.numel());
+	assert(grad_result.device() == u.device());
+
+	torch::Tensor cgrad = grad_result.contiguous();
+	torch::Tensor cu = u.contiguous();
+	torch::Tensor cv = v.contiguous();
+
+	int64_t complexes = u.size(0);
+	int32_t samples = u.size(1);
+	int32_t channels = grad_result.size(1);
+
+	auto options = torch::TensorOptions()
+		.dtype(torch::kFloat32)
+		.device(grad_result.device());
+
+	torch::Tensor dmap = torch::zeros({ complexes, resx, resy, channels }, options);
+	if (complexes * channels == 0)
+		return dmap;
+
+	const float *grad_ptr = cgrad.data_ptr <float> ();
+	const float *u_ptr = cu.data_ptr <float> ();
+	const float *v_ptr = cv.data_ptr <float> ();
+	float *dmap_ptr = dmap.data_ptr <float> ();
+
+	if (grad_result.device().is_cpu()) {
+		parallel_for(complexes, [&](size_t ci) {
+			for (int32_t k = 0; k < channels; k++)
+				texture_fetch_gather(grad_ptr, u_ptr, v_ptr, dmap_ptr, samples, resx, resy, channels, ci, k);
+		}, 16);
+
+		return dmap;
+	}
+
+	int64_t threads = 256;
+	int64_t blocks = (complexes * channels + threads - 1) / threads;
+
+	kernel_ngf_texture_fetch_backward <<< blocks, threads >>>
+	(
+		grad_ptr, u_ptr, v_ptr, dmap_ptr,
+		complexes, samples,
+		resx, resy, channels
+	);
+
+	return dmap;
+}
@@ -1,4 +1,5 @@
 #include "common.hpp"
+#include "util.hpp"
 
 __forceinline__ __device__
 float squared_length(const glm::vec3 &a)
@@ -12,18 +13,16 @@ float squared_distance(const glm::vec3 &a, const glm::vec3 &b)
 	return squared_length(a - b);
 }
 
-__global__
-void kernel_triangulate_shorted
+// Splits each quad of a patch along its shorter diagonal
+__forceinline__ __host__ __device__
+void triangulate_quad
 (
 	const glm::vec3 *__restrict__ vertices,
 	glm::ivec3 *__restrict__ triangles,
-	size_t sample_rate
+	size_t sample_rate,
+	size_t i, size_t j, size_t k
 )
 {
-	size_t i = blockIdx.x;
-	size_t j = threadIdx.x;
-	size_t k = threadIdx.y;
-
 	size_t offset = i * sample_rate * sample_rate;
 
 	size_t a = offset + j * sample_rate + k;
@@ -51,23 +50,44 @@ void kernel_triangulate_shorted
 	}
 }
 
+__global__
+void kernel_triangulate_shorted
+(
+	const glm::vec3 *__restrict__ vertices,
+	glm::ivec3 *__restrict__ triangles,
+	size_t sample_rate
+)
+{
+	triangulate_quad(vertices, triangles, sample_rate, blockIdx.x, threadIdx.x, threadIdx.y);
+}
+
 torch::Tensor triangulate_shorted(const torch::Tensor &vertices, size_t complex_count, size_t sample_rate)
 {
 	assert(vertices.dtype() == torch::kFloat32);
 	assert(vertices.dim() == 2 && vertices.size(1) == 3);
-	assert(vertices.is_cuda());
 
 	long triangle_count = 2 * complex_count * (sample_rate - 1) * (sample_rate - 1);
 
 	auto options = torch::TensorOptions()
 		.dtype(torch::kInt32)
-		.device(torch::kCUDA, 0);
+		.device(vertices.device());
 
 	torch::Tensor out = torch::zeros({ triangle_count, 3 }, options);
 
 	glm::vec3 *vertices_ptr = (glm::vec3 *) vertices.data_ptr <float> ();
 	glm::ivec3 *out_ptr = (glm::ivec3 *) out.data_ptr <int32_t> ();
 
+	if (vertices.device().is_cpu()) {
+		parallel_for(complex_count, [&](size_t i) {
+			for (size_t j = 0; j < sample_rate - 1; j++) {
+				for (size_t k = 0; k < sample_rate - 1; k++)
+					triangulate_quad(vertices_ptr, out_ptr, sample_rate, i, j, k);
+			}
+		}, 16);
+
+		return out;
+	}
+
 	dim3 block(sample_rate - 1, sample_rate - 1);
 	dim3 grid(complex_count);
 
@@ -1,5 +1,9 @@
 #pragma once
 
+#include <algorithm>
+#include <thread>
+#include <vector>
+
 #include <torch/extension.h>
 
 template <torch::DeviceType device, torch::ScalarType type, size_t components>
@@ -23,3 +27,68 @@ torch::Tensor vector_to_tensor(const std::vector <T> &data)
 
 	return tch;
 }
+
+// Split a range of indices into contiguous chunks, one per hardware thread
+template <typename F>
+void parallel_for(size_t size, const F &kernel, size_t grain = 1024)
+{
+	size_t threads = std::max(1u, std::thread::hardware_concurrency());
+	threads = std::min(threads, (size + grain - 1) / grain);
+
+	if (threads <= 1) {
+		for (size_t i = 0; i < size; i++)
+			kernel(i);
+
+		return;
+	}
+
+	size_t chunk = (size + threads - 1) / threads;
+
+	std::vector <std::thread> workers;
+	for (size_t t = 0; t < threads; t++) {
+		workers.emplace_back
+		(
+			[&, t]() {
+				size_t end = std::min(size, (t + 1) * chunk);
+				for (size_t i = t * chunk; i < end; i++)
+					kernel(i);
+			}
+		);
+	}
+
+	for (auto &worker : workers)
+		worker.join();
+}
+
+// Sorts contiguous chunks in parallel, then merges neighbouring runs pairwise, each round in parallel
+template <typename T, typename Compare>
+void parallel_sort(std::vector <T> &data, const Compare &compare, size_t grain = 1 << 16)
+{
+	size_t size = data.size();
+	size_t threads = std::max(1u, std::thread::hardware_concurrency());
+	threads = std::min(threads, (size + grain - 1) / grain);
+
+	if (threads <= 1) {
+		std::sort(data.begin(), data.end(), compare);
+		return;
+	}
+
+	size_t chunk = (size + threads - 1) / threads;
+
+	parallel_for(threads, [&](size_t t) {
+		size_t end = std::min(size, (t + 1) * chunk);
+		std::sort(data.begin() + t * chunk, data.begin() + end, compare);
+	}, 1);
+
+	for (size_t width = chunk; width < size; width *= 2) {
+		size_t pairs = (size + 2 * width - 1) / (2 * width);
+
+		parallel_for(pairs, [&](size_t p) {
+			size_t lower = p * 2 * width;
+			size_t middle = std::min(size, lower + width);
+			size_t upper = std::min(size, lower + 2 * width);
+			if (middle < upper)
+				std::inplace_merge(data.begin() + lower, data.begin() + middle, data.begin() + upper, compare);
+		}, 1);
+	}
+}
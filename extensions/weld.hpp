@@ -0,0 +1,99 @@
+#pragma once
+
+#include <cmath>
+#include <cstring>
+#include <vector>
+
+#include <glm/glm.hpp>
+
+#include "util.hpp"
+
+// Position key of a triangle corner; corners with equal positions are welded into one vertex
+struct weld_key {
+	int64_t x, y, z;
+	int64_t corner;
+
+	bool same(const weld_key &other) const {
+		return x == other.x && y == other.y && z == other.z;
+	}
+
+	// Ties are broken by corner so that each run starts with the first appearance
+	bool operator<(const weld_key &other) const {
+		if (x != other.x) return x < other.x;
+		if (y != other.y) return y < other.y;
+		if (z != other.z) return z < other.z;
+		return corner < other.corner;
+	}
+};
+
+inline int64_t weld_quantize(float x, float epsilon)
+{
+	// Without an epsilon positions must be equal, which for -0 and +0 differs from being bitwise equal
+	if (epsilon <= 0.0f) {
+		int32_t bits;
+		x += 0.0f;
+		std::memcpy(&bits, &x, sizeof(bits));
+		return bits;
+	}
+
+	// Grid cells of the epsilon; close positions on either side of a cell boundary stay apart
+	return (int64_t) std::floor((double) x / epsilon + 0.5);
+}
+
+// Keys of the corners indexed by a triangle list, sorted in parallel
+inline std::vector <weld_key> weld_sort(const glm::vec3 *vertices, const int32_t *indices, size_t count, float epsilon)
+{
+	std::vector <weld_key> keys(count);
+
+	parallel_for(count, [&](size_t i) {
+		const glm::vec3 &v = vertices[indices[i]];
+		keys[i] = weld_key {
+			weld_quantize(v.x, epsilon),
+			weld_quantize(v.y, epsilon),
+			weld_quantize(v.z, epsilon),
+			(int64_t) i
+		};
+	});
+
+	parallel_sort(keys, std::less <weld_key> ());
+
+	return keys;
+}
+
+inline size_t weld_count(const std::vector <weld_key> &keys)
+{
+	size_t count = 0;
+	for (size_t i = 0; i < keys.size(); i++)
+		count += (i == 0 || !keys[i].same(keys[i - 1]));
+
+	return count;
+}
+
+// Writes the welded vertex of every corner into labels, numbering vertices in order of first
+// appearance, and calls emit(vertex, corner) with the first corner of each welded vertex
+template <typename F>
+void weld_label(const std::vector <weld_key> &keys, int32_t *labels, const F &emit)
+{
+	assert(keys.size() < (size_t) INT32_MAX);
+
+	// Every corner first points to the first corner of its run...
+	int32_t first = 0;
+	for (size_t i = 0; i < keys.size(); i++) {
+		if (i == 0 || !keys[i].same(keys[i - 1]))
+			first = keys[i].corner;
+
+		labels[keys[i].corner] = first;
+	}
+
+	// ...which precedes it, so in corner order that first corner has already been numbered
+	int32_t vertex = 0;
+	for (size_t c = 0; c < keys.size(); c++) {
+		int32_t f = labels[c];
+		if (f == (int32_t) c) {
+			emit(vertex, c);
+			labels[c] = vertex++;
+		} else {
+			labels[c] = labels[f];
+		}
+	}
+}
@@ -1,4 +1,5 @@
 #include <cstdlib>
+#include <cstring>
 #include <iostream>
 #include <optional>
 #include <fstream>
@@ -36,6 +37,14 @@ struct alignas(16) TaskData {
 	float time;
 };
 
+// Network layout from the NGF binary header; legacy files are 64-wide, 4-layer leaky ReLU networks
+struct Architecture {
+	int32_t activation = 0; // 0: leaky ReLU, 1: sine (SIREN)
+	int32_t layers = 4;
+	int32_t hidden = 64;
+	float omega = 30.0f;
+};
+
 struct alignas(16) ShadingData {
 	alignas(16) glm::vec3 viewing;
 	alignas(16) glm::vec3 color;
@@ -187,7 +196,7 @@ struct Engine : littlevk::Skeleton {
 		ImPlot::CreateContext();
 	}
 
-	static Engine from(const vk::PhysicalDevice &phdev, const std::vector <const char *> &extensions, size_t fsize) {
+	static Engine from(const vk::PhysicalDevice &phdev, const std::vector <const char *> &extensions, size_t fsize, const Architecture &architecture) {
 		Engine engine;
 
 		engine.phdev = phdev;
@@ -296,7 +305,11 @@ struct Engine : littlevk::Skeleton {
 
 		const std::string entry = "main";
 		const littlevk::shader::Defines defines {
-			{ "FEATURE_SIZE", std::to_string(fsize) }
+			{ "FEATURE_SIZE", std::to_string(fsize) },
+			{ "ACTIVATION", std::to_string(architecture.activation) },
+			{ "LAYERS", std::to_string(architecture.layers) },
+			{ "HIDDEN", std::to_string(architecture.hidden) },
+			{ "OMEGA", std::to_string(architecture.omega) },
 		};
 
 		auto bundle = littlevk::ShaderStageBundle(engine.device, engine.dal)
@@ -440,8 +453,6 @@ int main(int argc, char *argv[])
 	std::string path_ngf = argv[1];
 
 	// Load the neural geometry field
-	constexpr int32_t LAYERS = 4;
-
 	struct Tensor {
 		std::vector <float> vec;
 		int32_t width;
@@ -456,17 +467,40 @@ int main(int argc, char *argv[])
 		uint32_t patch_count;
 		uint32_t feature_size;
 
-		std::array <Tensor, LAYERS> weights;
-		std::array <Tensor, LAYERS> biases;
+		Architecture architecture;
+		std::vector <Tensor> weights;
+		std::vector <Tensor> biases;
 	} ngf;
 
 	{
-		std::ifstream fin(path_ngf);
+		std::ifstream fin(path_ngf, std::ios::binary);
 		ulog_assert(fin.good(), "Bad ngf file %s\n", path_ngf.c_str());
 
+		// Versioned files start with a magic word, legacy files directly with the sizes
+		char magic[4];
+		fin.read(magic, sizeof(magic));
+
 		int32_t sizes[3];
-		fin.read(reinterpret_cast <char *> (sizes), sizeof(sizes));
+		if (std::memcmp(magic, "NGF1", 4) == 0) {
+			fin.read(reinterpret_cast <char *> (sizes), sizeof(sizes));
+
+			int32_t layout[3];
+			fin.read(reinterpret_cast <char *> (layout), sizeof(layout));
+			fin.read(reinterpret_cast <char *> (&ngf.architecture.omega), sizeof(float));
+
+			ngf.architecture.activation = layout[0];
+			ngf.architecture.layers = layout[1];
+			ngf.architecture.hidden = layout[2];
+		} else {
+			std::memcpy(&sizes[0], magic, sizeof(int32_t));
+			fin.read(reinterpret_cast <char *> (&sizes[1]), 2 * sizeof(int32_t));
+		}
+
 		ulog_info("ngf io", "%d patches, %d vertices, %d feature size\n", sizes[0], sizes[1], sizes[2]);
+		ulog_info("ngf io", "%d layers of width %d, activation %d\n",
+			ngf.architecture.layers, ngf.architecture.hidden, ngf.architecture.activation);
+
+		ulog_assert(ngf.architecture.layers >= 2, "ngf io", "Expected at least two layers\n");
 
 		std::vector <glm::ivec4> patches;
 		std::vector <glm::vec3> vertices;
@@ -478,7 +512,6 @@ int main(int argc, char *argv[])
 
 		ngf.patch_count = sizes[0];
 		ngf.feature_size = sizes[2];
-		// ulog_assert(ngf.feature_size == 20, "testbed", "Expected an NGF with feature size of 20.\n");
 
 		fin.read(reinterpret_cast <char *> (vertices.data()), vertices.size() * sizeof(glm::vec3));
 		fin.read(reinterpret_cast <char *> (features.data()), features.size() * sizeof(float));
@@ -486,8 +519,7 @@ int main(int argc, char *argv[])
 
 		ulog_info("ngf io", "read patches data\n");
 
-		std::array <Tensor, LAYERS> weights;
-		for (int32_t i = 0; i < LAYERS; i++) {
+		for (int32_t i = 0; i < ngf.architecture.layers; i++) {
 			int32_t sizes[2];
 			fin.read(reinterpret_cast <char *> (sizes), sizeof(sizes));
 			ulog_info("ngf io", "weight matrix with size %d x %d\n", sizes[0], sizes[1]);
@@ -498,11 +530,10 @@ int main(int argc, char *argv[])
 			w.vec.resize(sizes[0] * sizes[1]);
 			fin.read(reinterpret_cast <char *> (w.vec.data()), w.vec.size() * sizeof(float));
 
-			weights[i] = w;
+			ngf.weights.push_back(w);
 		}
 
-		std::array <Tensor, LAYERS> biases;
-		for (int32_t i = 0; i < LAYERS; i++) {
+		for (int32_t i = 0; i < ngf.architecture.layers; i++) {
 			int32_t size;
 			fin.read(reinterpret_cast <char *> (&size), sizeof(size));
 			ulog_info("ngf io", "bias vector with size %d\n", size);
@@ -513,13 +544,13 @@ int main(int argc, char *argv[])
 			w.vec.resize(size);
 			fin.read(reinterpret_cast <char *> (w.vec.data()), w.vec.size() * sizeof(float));
 
-			biases[i] = w;
+			ngf.biases.push_back(w);
 		}
 
+		ulog_assert(fin.good(), "ngf io", "Truncated ngf file %s\n", path_ngf.c_str());
+
 		ngf.patches = patches;
 		ngf.features = features;
-		ngf.weights = weights;
-		ngf.biases = biases;
 
 		// Need special care for vertices to align them properly
 		ngf.vertices.resize(vertices.size());
@@ -542,7 +573,7 @@ int main(int argc, char *argv[])
 	vk::PhysicalDevice phdev = littlevk::pick_physical_device(predicate);
 
 	// Initialization
-	Engine engine = Engine::from(phdev, extensions, ngf.feature_size);
+	Engine engine = Engine::from(phdev, extensions, ngf.feature_size, ngf.architecture);
 
 	engine.camera_transform.position = glm::vec3 { 0, 0, -2.3 };
 
@@ -555,11 +586,11 @@ int main(int argc, char *argv[])
 		vk::DescriptorSet dset;
 	} vk_ngf;
 
-	// Concatenate the neural network weights
+	// Concatenate the neural network weights, each layer as its weights followed by its biases
 	std::vector <float> network;
-	for (int32_t i = 0; i < LAYERS; i++) {
-		network.insert(network.begin(), ngf.weights[i].vec.begin(), ngf.weights[i].vec.end());
-		network.insert(network.begin(), ngf.biases[i].vec.begin(), ngf.biases[i].vec.end());
+	for (int32_t i = 0; i < ngf.architecture.layers; i++) {
+		network.insert(network.end(), ngf.weights[i].vec.begin(), ngf.weights[i].vec.end());
+		network.insert(network.end(), ngf.biases[i].vec.begin(), ngf.biases[i].vec.end());
 	}
 
 	std::tie(vk_ngf.vertices, vk_ngf.features, vk_ngf.patches, vk_ngf.network) = littlevk::linked_device_allocator(engine.device, engine.memory_properties, engine.dal)
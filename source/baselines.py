@@ -1,30 +1,18 @@
 import os
 import sys
 import json
+import torch
 import shutil
 import trimesh
+import ngfutil
 import argparse
-import fast_simplification
-
-from tqdm import trange
 
 from ngf import NGF
 
-def qslim_do(base, reduction):
-    vout, fout = fast_simplification.simplify(base.vertices, base.faces, reduction)
-    sizekb = (vout.nbytes + fout.nbytes) / 1024
-    return vout, fout, sizekb
-
-def qslim_search(base, sizekb):
-    small, large = 0.0005, 0.9995
-    for _ in trange(15, ncols=50, desc='QSlim', leave=False):
-        mid = (small + large) / 2
-        vout, fout, qsizekb = qslim_do(base, mid)
-        if qsizekb < sizekb:
-            large = mid
-        else:
-            small = mid
-    return vout, fout
+def qslim_search(progressive, sizekb):
+    # Largest level of detail of the progressive mesh within the budget
+    vout, fout = progressive.extract_bytes(int(sizekb * 1024))
+    return vout.numpy(), fout.numpy()
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -36,6 +24,10 @@ if __name__ == '__main__':
 
     reference = trimesh.load(args.reference)
 
+    vertices = torch.from_numpy(reference.vertices).float()
+    faces = torch.from_numpy(reference.faces).int()
+    progressive = ngfutil.progressive_mesh(vertices, faces)
+
     for file in args.pt:
         basename = os.path.basename(file)
         basename = basename.split('.')[0]
@@ -53,7 +45,7 @@ if __name__ == '__main__':
         m.export(local_ref)
 
         # QSlim
-        vout, fout = qslim_search(reference, sizekb)
+        vout, fout = qslim_search(progressive, sizekb)
         qslim_destination = basename + '-qslim.stl'
         qslim_sizekb = (vout.nbytes + fout.nbytes) / 1024
         
@@ -0,0 +1,261 @@
+import re
+import sys
+import json
+import time
+import math
+import torch
+import ngfutil
+import logging
+import argparse
+import platform
+import statistics
+
+from typing import Callable, Tuple
+
+from ngf import NGF, positional_encoding
+from util import make_cmap, quadify, separate
+
+
+def quad_sphere(patches: int) -> Tuple[torch.Tensor, torch.Tensor]:
+    # Cube with n x n quads per side, projected onto the unit sphere
+    n = max(1, round(math.sqrt(patches / 6)))
+
+    t = torch.linspace(-1, 1, n + 1)
+    u, v = torch.meshgrid(t, t, indexing='ij')
+    u, v = u.reshape(-1, 1), v.reshape(-1, 1)
+
+    i, j = torch.meshgrid(torch.arange(n), torch.arange(n), indexing='ij')
+    a = (i * (n + 1) + j).reshape(-1)
+    grid = torch.stack([ a, a + n + 1, a + n + 2, a + 1 ], dim=-1)
+
+    points, quads = [], []
+    for axis in range(3):
+        for sign in [ 1.0, -1.0 ]:
+            normal, t1, t2 = torch.zeros(3), torch.zeros(3), torch.zeros(3)
+            normal[axis] = sign
+            t1[(axis + 1) % 3] = 1.0
+            t2[(axis + 2) % 3] = sign
+
+            quads.append(grid + len(points) * (n + 1) ** 2)
+            points.append(normal + u * t1 + v * t2)
+
+    points, quads = torch.cat(points), torch.cat(quads)
+
+    # Weld the shared edges of the cube sides
+    keys = torch.round(points * n * 4).long()
+    keys, inverse = torch.unique(keys, dim=0, return_inverse=True)
+
+    welded = torch.zeros(keys.shape[0], 3)
+    welded[inverse] = points
+    welded = welded / welded.norm(dim=-1, keepdim=True)
+
+    return welded, inverse[quads].int()
+
+
+def quad_torus(patches: int, R: float = 0.7, r: float = 0.3) -> Tuple[torch.Tensor, torch.Tensor]:
+    n = max(3, round(math.sqrt(patches / 3)))
+    m = max(3, round(patches / n))
+
+    theta = 2 * math.pi * torch.arange(m) / m
+    phi = 2 * math.pi * torch.arange(n) / n
+    theta, phi = torch.meshgrid(theta, phi, indexing='ij')
+
+    points = torch.stack([
+        (R + r * phi.cos()) * theta.cos(),
+        (R + r * phi.cos()) * theta.sin(),
+        r * phi.sin()
+    ], dim=-1).reshape(-1, 3)
+
+    i, j = torch.meshgrid(torch.arange(m), torch.arange(n), indexing='ij')
+    i, j = i.reshape(-1), j.reshape(-1)
+    ip, jp = (i + 1) % m, (j + 1) % n
+
+    quads = torch.stack([ i * n + j, ip * n + j, ip * n + jp, i * n + jp ], dim=-1)
+
+    return points, quads.int()
+
+
+SHAPES = {
+    'sphere': quad_sphere,
+    'torus': quad_torus,
+}
+
+
+def synthetic_ngf(shape: str, patches: int, features: int, device: str) -> NGF:
+    points, complexes = SHAPES[shape](patches)
+
+    points = points.to(device).requires_grad_(True)
+    features = (0.01 * torch.randn(points.shape[0], features, device=device)).requires_grad_(True)
+
+    return NGF(points, features, complexes.to(device), 8, False, True)
+
+
+def synchronize(device: str) -> None:
+    if device.startswith('cuda'):
+        torch.cuda.synchronize()
+
+
+def measure(function: Callable, device: str, repeats: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        function()
+
+    times = []
+    for _ in range(repeats):
+        synchronize(device)
+        start = time.perf_counter()
+        function()
+        synchronize(device)
+        times.append(1000 * (time.perf_counter() - start))
+
+    return {
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'min': min(times),
+        'std': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'repeats': repeats,
+    }
+
+
+class Workload:
+    # Intermediate products of one (shape, patches, rate, features) configuration, built lazily
+    def __init__(self, shape: str, patches: int, rate: int, features: int, device: str):
+        self.ngf = synthetic_ngf(shape, patches, features, device)
+        self.rate = rate
+        self.device = device
+
+        with torch.no_grad():
+            self.uvs = self.ngf.sample_uniform(rate)
+            self.base = self.ngf.base(rate)
+            self.vertices = self.ngf.eval(*self.uvs)
+
+        self.count = self.ngf.complexes.shape[0]
+        self.cmap = make_cmap(self.ngf.complexes, self.ngf.points.detach(), self.base, rate)
+        self.remap = ngfutil.generate_remapper(self.ngf.complexes.cpu(), self.cmap, self.base.shape[0], rate)
+        self.quads = torch.from_numpy(quadify(self.count, rate)).int()
+        self.graph = ngfutil.Graph(self.remap.remap(self.quads), self.base.shape[0])
+
+        faces = ngfutil.triangulate_shorted(self.vertices, self.count, rate)
+        self.faces = self.remap.remap(faces.cpu()).to(device)
+
+
+def eval_backward(w: Workload):
+    w.ngf.eval(*w.uvs).square().mean().backward()
+
+
+# Benchmarks, and whether they depend on the feature size
+BENCHMARKS = {
+    'NGF.eval':             (True,  lambda w: w.ngf.eval(*w.uvs)),
+    'NGF.eval+backward':    (True,  eval_backward),
+    'NGF.interpolate':      (True,  lambda w: NGF.interpolate(w.ngf.features, w.ngf.complexes, *w.uvs)),
+    'positional_encoding':  (True,  lambda w: positional_encoding(w.base, [ w.base ], w.ngf.fflevels)),
+    'make_cmap':            (False, lambda w: make_cmap(w.ngf.complexes, w.ngf.points.detach(), w.base, w.rate)),
+    'quadify':              (False, lambda w: quadify(w.count, w.rate)),
+    'generate_remapper':    (False, lambda w: ngfutil.generate_remapper(w.ngf.complexes.cpu(), w.cmap, w.base.shape[0], w.rate)),
+    'Graph':                (False, lambda w: ngfutil.Graph(w.remap.remap(w.quads), w.base.shape[0])),
+    'Graph.smooth':         (False, lambda w: w.graph.smooth(w.vertices, 1.0)),
+    'triangulate_shorted':  (False, lambda w: ngfutil.triangulate_shorted(w.vertices, w.count, w.rate)),
+    'separate':             (False, lambda w: separate(w.vertices, w.faces)),
+}
+
+
+def key(result: dict) -> str:
+    return f"{result['name']}/{result['shape']}/p{result['patches']}/r{result['rate']}/f{result['features']}"
+
+
+def run(args) -> dict:
+    pattern = re.compile(args.filter)
+
+    results = []
+    for shape in args.shapes:
+        for patches in args.patches:
+            for rate in args.rates:
+                for i, features in enumerate(args.features):
+                    torch.manual_seed(0)
+                    w = Workload(shape, patches, rate, features, args.device)
+
+                    for name, (featured, function) in BENCHMARKS.items():
+                        if not pattern.search(name) or (not featured and i > 0):
+                            continue
+
+                        result = {
+                            'name': name,
+                            'shape': shape,
+                            'patches': w.count,
+                            'rate': rate,
+                            'features': features if featured else None,
+                            **measure(lambda: function(w), args.device, args.repeats, args.warmup),
+                        }
+
+                        print(f'{key(result):<56} {result["median"]:10.3f} ms')
+                        results.append(result)
+
+    return {
+        'device': args.device,
+        'torch': torch.__version__,
+        'platform': platform.platform(),
+        'threads': torch.get_num_threads(),
+        'results': results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> int:
+    # Medians slower than the baseline by more than the threshold are regressions
+    reference = { key(r): r for r in baseline['results'] }
+
+    regressions = 0
+    print(f'{"benchmark":<56} {"before":>10} {"after":>10} {"change":>8}')
+    for r in current['results']:
+        k = key(r)
+        if k not in reference:
+            print(f'{k:<56} {"-":>10} {r["median"]:10.3f}      new')
+            continue
+
+        before, after = reference[k]['median'], r['median']
+        change = after / max(before, 1e-9) - 1
+
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        elif change < -threshold:
+            flag = '  improved'
+
+        print(f'{k:<56} {before:10.3f} {after:10.3f} {100 * change:+7.1f}%{flag}')
+
+    if baseline.get('device') != current.get('device'):
+        print(f'warning: comparing {baseline.get("device")} against {current.get("device")} results')
+
+    print(f'{regressions} regression(s) beyond {100 * threshold:.0f}%')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--device', type=str, default='cuda' if torch.cuda.is_available() else 'cpu', help='Device to benchmark on')
+    parser.add_argument('--shapes', type=str, nargs='+', default=list(SHAPES.keys()), choices=list(SHAPES.keys()), help='Synthetic base meshes')
+    parser.add_argument('--patches', type=int, nargs='+', default=[100, 400, 1600], help='Approximate patch counts')
+    parser.add_argument('--rates', type=int, nargs='+', default=[4, 8, 16], help='Sampling rates')
+    parser.add_argument('--features', type=int, nargs='+', default=[8, 20, 32], help='Feature sizes')
+    parser.add_argument('--filter', type=str, default='', help='Regular expression selecting benchmarks')
+    parser.add_argument('--repeats', type=int, default=10, help='Timed repetitions per benchmark')
+    parser.add_argument('--warmup', type=int, default=2, help='Untimed repetitions per benchmark')
+    parser.add_argument('--output', type=str, default=None, help='JSON file for the results')
+    parser.add_argument('--compare', type=str, nargs='+', default=None, help='Baseline JSON to compare a new run against, or two result files')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative slowdown counted as a regression')
+
+    args = parser.parse_args(sys.argv[1:])
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.compare and len(args.compare) == 2:
+        baseline, current = [ json.load(open(path)) for path in args.compare ]
+    else:
+        current = run(args)
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump(current, file, indent=4)
+
+        baseline = json.load(open(args.compare[0])) if args.compare else None
+
+    if baseline is not None:
+        sys.exit(1 if compare(baseline, current, args.threshold) > 0 else 0)
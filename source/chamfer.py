@@ -107,9 +107,7 @@ if __name__ == '__main__':
         import matplotlib.pyplot as plt
         import seaborn as sns
 
-        from kaolin.metrics.pointcloud import chamfer_distance
-        from kaolin.metrics.trianglemesh import point_to_mesh_distance
-        from kaolin.metrics.trianglemesh import average_edge_length
+        from util import chamfer_distance, sample_mesh, average_edge_length
 
         sns.set_theme()
 
@@ -118,14 +116,15 @@ if __name__ == '__main__':
 
         losses = { 'chamfer': [], 'time': [] }
 
-        target_face_vertices = target.vertices[target.faces]
+        # Area weighted samples rather than the (density biased) target vertices
+        target_samples = sample_mesh(target, 1_000_000)
 
         opt = torch.optim.Adam(list(ngf.mlp.parameters()) + [ ngf.points, ngf.features ], lr=1e-3)
         for rate in [ 4, 8, 16 ]:
             uvs = ngf.sampler(rate)
-            V = ngf.eval(*uvs).detach().unsqueeze(0)
+            V = ngf.eval(*uvs).detach()
             F = ngf_faces(rate)
-            edge = average_edge_length(V, F).mean().item()
+            edge = average_edge_length(V, F.long()).item()
 
             base = ngf.base(rate)
             cmap = make_cmap(ngf.complexes, ngf.points.detach(), base, rate)
@@ -139,7 +138,7 @@ if __name__ == '__main__':
                 indices = optext.triangulate_shorted(ngf_vertices, ngf.complexes.shape[0], rate)
                 faces = remap.remap_device(indices)
 
-                chamfer_loss = chamfer_distance(ngf_vertices.unsqueeze(0), target.vertices.unsqueeze(0))
+                chamfer_loss = chamfer_distance(ngf_vertices, target_samples)
 
                 uvs = ngf.sample_uniform(rate)
                 V = ngf.eval(*uvs)
@@ -1,12 +1,13 @@
 import os
 import torch
 import optext
+import ngfutil
 import argparse
 import numpy as np
 
 from ngf import load_ngf
 from mesh import Mesh, mesh_from, load_mesh
-from util import make_cmap, arrange_views, lookat
+from util import make_cmap, arrange_views, lookat, surface_metrics, ResultStore
 from render import Renderer
 
 def mesh_size(V, F):
@@ -15,28 +16,96 @@ def mesh_size(V, F):
     return vertices_size + faces_size
 
 # TODO: also util function...
-def construct_renderer():
-    import imageio.v2 as imageio
-    path = os.path.join(os.path.dirname(__file__), '../images/environment.hdr')
-    path = os.path.abspath(path)
-    environment = imageio.imread(path, format='HDR')
-    environment = torch.tensor(environment, dtype=torch.float32, device='cuda')
-    alpha       = torch.ones((*environment.shape[:2], 1), dtype=torch.float32, device='cuda')
-    environment = torch.cat((environment, alpha), dim=-1)
-    return Renderer(width=1280, height=720, fov=45.0, near=0.1, far=1000.0, envmap=environment)
+def construct_renderer(backend='cuda', device=None):
+    # The renderer loads the environment map itself, on its own device
+    return Renderer(width=1280, height=720, fov=45.0, near=0.1, far=1000.0, backend=backend, device=device)
 
 class Evaluator:
     CAMERAS = 100
+    BATCH = 25
+    CACHE = None
+    STORE = os.path.join('evals', 'results')
+    BACKEND = 'cuda'
+    DEVICE = 'cuda'
+
+    def __init__(self, reference, cache=None, backend=None, device=None):
+        # Everything is evaluated on the renderer's device, so that CPU only machines can use the torch backend
+        self.renderer = construct_renderer(backend or Evaluator.BACKEND, device or Evaluator.DEVICE)
+        self.device = self.renderer.device
+
+        if reference.vertices.device != torch.device(self.device):
+            reference = mesh_from(reference.vertices.to(self.device), reference.faces.to(self.device))
 
-    def __init__(self, reference):
         self.reference = reference
         self.ref_size = mesh_size(reference.vertices, reference.faces)
         print('ref_size =', self.ref_size)
-        self.views = arrange_views(reference, Evaluator.CAMERAS)
+        self.views = arrange_views(reference, Evaluator.CAMERAS)[0]
         print('views:', self.views.shape)
-        self.renderer = construct_renderer()
         self.preview = True
 
+        # Reference images are rendered once per camera set, and optionally spilled to disk
+        self.cache = cache or Evaluator.CACHE
+        self.references = {}
+        if self.cache is not None:
+            os.makedirs(self.cache, exist_ok=True)
+
+    def digest(self, kind, views):
+        import hashlib
+
+        h = hashlib.sha1(kind.encode())
+        h.update(views.cpu().numpy().tobytes())
+        h.update(self.reference.vertices.cpu().numpy().tobytes())
+        h.update(self.reference.faces.cpu().numpy().tobytes())
+        return h.hexdigest()[:16]
+
+    def cached(self, key, kind, views, render):
+        # Renders of the reference from the given views, held on the host or memory mapped from the cache
+        if key in self.references:
+            return self.references[key]
+
+        path = None
+        if self.cache is not None:
+            path = os.path.join(self.cache, f'{key}-{self.digest(kind, views)}.npy')
+
+        if path is not None and os.path.exists(path):
+            images = torch.from_numpy(np.load(path, mmap_mode='r'))
+        else:
+            images = []
+            for batch_views in torch.split(views, Evaluator.BATCH):
+                images.append(render(self.reference, batch_views).cpu())
+
+            images = torch.cat(images)
+            if path is not None:
+                np.save(path, images.numpy())
+                images = torch.from_numpy(np.load(path, mmap_mode='r'))
+
+        self.references[key] = images
+        return images
+
+    def reference_images(self, kind, render):
+        return self.cached(kind, kind, self.views, render)
+
+    def compare(self, kind, mesh, render, render_mesh=None):
+        references = self.reference_images(kind, render)
+        render_mesh = render_mesh or render
+
+        # Mean absolute error over every pixel of every view
+        total, count = 0.0, 0
+        for start in range(0, self.views.shape[0], Evaluator.BATCH):
+            batch_views = self.views[start : start + Evaluator.BATCH]
+            ref_imgs = references[start : start + Evaluator.BATCH].to(batch_views.device)
+            mesh_imgs = render_mesh(mesh, batch_views)
+
+            total += torch.sum(torch.abs(ref_imgs - mesh_imgs)).item()
+            count += mesh_imgs.numel()
+
+        return total / count
+
+    def tagged(self, kind, tag, render):
+        camera = self.get_view(tag).unsqueeze(0)
+        images = self.cached(f'{kind}-{tag}', kind, camera, render)
+        return images[0].to(camera.device)
+
     # TODO: util function
     def postprocess(self, f):
         f = torch.log(torch.clamp(f, min=0, max=65535) + 1)
@@ -44,86 +113,53 @@ class Evaluator:
 
     def get_view(self, tag):
         predef = {
-                'xyz'       : torch.tensor([ 2, 0, 1 ], device='cuda').float(),
-                'einstein'  : torch.tensor([ 0, 0, 3.5 ], device='cuda').float(),
-                'skull'     : torch.tensor([ 0.5, 0, 2.5 ], device='cuda').float(),
-                # 'skull'     : torch.tensor([ -0.5, 0, 2.5 ], device='cuda').float(),
-                # 'skull'     : torch.tensor([ 2, 0, 2.5 ], device='cuda').float(),
-                'wreck'     : torch.tensor([ 0, 0, 2 ], device='cuda').float(),
-                'armadillo' : torch.tensor([ -1.8, 0, -2.8 ], device='cuda').float(),
-                'nefertiti' : torch.tensor([ 0, 0, -3.5 ], device='cuda').float(),
-                'lucy'      : torch.tensor([ 0, 0, -4.0 ], device='cuda').float(),
-                'dragon'    : torch.tensor([ 0, 0, 3.6 ], device='cuda').float(),
+                'xyz'       : torch.tensor([ 2, 0, 1 ], device=self.device).float(),
+                'einstein'  : torch.tensor([ 0, 0, 3.5 ], device=self.device).float(),
+                'skull'     : torch.tensor([ 0.5, 0, 2.5 ], device=self.device).float(),
+                # 'skull'     : torch.tensor([ -0.5, 0, 2.5 ], device=self.device).float(),
+                # 'skull'     : torch.tensor([ 2, 0, 2.5 ], device=self.device).float(),
+                'wreck'     : torch.tensor([ 0, 0, 2 ], device=self.device).float(),
+                'armadillo' : torch.tensor([ -1.8, 0, -2.8 ], device=self.device).float(),
+                'nefertiti' : torch.tensor([ 0, 0, -3.5 ], device=self.device).float(),
+                'lucy'      : torch.tensor([ 0, 0, -4.0 ], device=self.device).float(),
+                'dragon'    : torch.tensor([ 0, 0, 3.6 ], device=self.device).float(),
         }
 
-        eye    = torch.tensor([ 0, 0, 3 ], device='cuda').float()
-        up     = torch.tensor([ 0, 1, 0 ], device='cuda').float()
-        center = torch.tensor([ 0, 0, 0 ], device='cuda').float()
+        eye    = torch.tensor([ 0, 0, 3 ], device=self.device).float()
+        center = torch.tensor([ 0, 0, 0 ], device=self.device).float()
 
         if tag in predef:
             eye = predef[tag]
 
-        look = center - eye
-        if torch.dot(look, up).abs().item() > 1.0 - 1e-6:
-            up = torch.tensor([1, 0, 0], device='cuda').float()
-        if torch.dot(look, up).abs().item() > 1.0 - 1e-6:
-            up = torch.tensor([0, 0, 1], device='cuda').float()
-
-        right = torch.cross(look, up)
-        right /= right.norm()
-
-        up = torch.cross(look, right)
-        up /= up.norm()
-
-        look /= look.norm()
-
-        return torch.tensor([
-            [ right[0], up[0], look[0], eye[0] ],
-            [ right[1], up[1], look[1], eye[1] ],
-            [ right[2], up[2], look[2], eye[2] ],
-            [ 0, 0, 0, 1 ]
-        ], dtype=torch.float32, device='cuda').inverse()
+        return lookat(eye.unsqueeze(0), center.unsqueeze(0))[0]
 
     def eval_render(self, mesh, tag):
-        batch = 10
-        views = torch.split(self.views, batch)
-
-        errors = []
-        for batch_views in views:
-            ref_imgs = self.renderer.render_spherical_harmonics(self.reference.vertices, self.reference.normals, self.reference.faces, batch_views)
-            mesh_imgs = self.renderer.render_spherical_harmonics(mesh.vertices, mesh.normals, mesh.faces, batch_views)
+        render = lambda m, views: self.renderer.render_spherical_harmonics(m.vertices, m.normals, m.faces, views)
 
-            error = torch.mean(torch.abs(ref_imgs - mesh_imgs))
-            errors.append(error.item())
+        error = self.compare('render', mesh, render)
 
         camera = self.get_view(tag).unsqueeze(0)
-        ref_img = self.renderer.render_spherical_harmonics(self.reference.vertices, self.reference.normals, self.reference.faces, camera)[0]
-        mesh_img = self.renderer.render_spherical_harmonics(mesh.vertices, mesh.normals, mesh.faces, camera)[0]
+        ref_img = self.tagged('render', tag, render)
+        mesh_img = render(mesh, camera)[0]
 
-        return { 'error': np.mean(errors), 'ref': ref_img, 'mesh': mesh_img }
+        return { 'error': error, 'ref': ref_img, 'mesh': mesh_img }
 
     def eval_normals(self, mesh, tag, invert=False):
-        batch = 10
-        views = torch.split(self.views, batch)
+        render = lambda m, views: self.renderer.render_normals(m.vertices, m.normals, m.faces, views)
+        render_mesh = lambda m, views: self.renderer.render_normals(m.vertices, m.normals, m.faces, views, invert=invert)
 
-        errors = []
-        for batch_views in views:
-            ref_imgs = self.renderer.render_normals(self.reference.vertices, self.reference.normals, self.reference.faces, batch_views)
-            mesh_imgs = self.renderer.render_normals(mesh.vertices, mesh.normals, mesh.faces, batch_views, invert=invert)
-
-            error = torch.mean(torch.abs(ref_imgs - mesh_imgs))
-            errors.append(error.item())
+        # Only the candidate's normals are ever inverted
+        error = self.compare('normal', mesh, render, render_mesh)
 
         camera = self.get_view(tag).unsqueeze(0)
-        ref_img = self.renderer.render_normals(self.reference.vertices, self.reference.normals, self.reference.faces, camera)[0]
-        mesh_img = self.renderer.render_normals(mesh.vertices, mesh.normals, mesh.faces, camera, invert=invert)[0]
+        ref_img = self.tagged('normal', tag, render)
+        mesh_img = render_mesh(mesh, camera)[0]
 
-        return { 'error': np.mean(errors), 'ref': ref_img, 'mesh': mesh_img }
+        return { 'error': error, 'ref': ref_img, 'mesh': mesh_img }
 
     def eval_chamfer(self, mesh):
-        from kaolin.metrics.pointcloud import chamfer_distance
-        error = chamfer_distance(mesh.vertices.unsqueeze(0), self.reference.vertices.unsqueeze(0))
-        return { 'error': error.item() }
+        metrics = surface_metrics(mesh, self.reference)
+        return { 'error': metrics['chamfer'], 'hausdorff': metrics['hausdorff'] }
 
     def eval_metrics(self, mesh, tag=None, invert=False):
         render = self.eval_render(mesh, tag)
@@ -174,6 +210,11 @@ def ngf_size(ngf):
     size += ngf.complexes.numel() * ngf.complexes.element_size()
     return size
 
+def save_results(experiment, data):
+    # Scalars are queried by figure.py, images are only read when displayed
+    ResultStore(Evaluator.STORE).save(experiment, data)
+    print('saved', experiment, 'to', Evaluator.STORE)
+
 def scene_evaluations(reference, directory, alt=None):
     import re
     import sys
@@ -183,7 +224,7 @@ def scene_evaluations(reference, directory, alt=None):
     name = os.path.basename(directory)
     print('Evaluating scene', name)
 
-    ref, _ = load_mesh(reference)
+    ref, _ = load_mesh(reference, device=Evaluator.DEVICE)
     ref_size = mesh_size(ref.vertices, ref.faces)
     key = os.path.basename(directory)
     # pattern = re.compile('lod[1-4].pt$')
@@ -191,36 +232,19 @@ def scene_evaluations(reference, directory, alt=None):
 
     evaluator = Evaluator(ref)
 
-    qslim = os.path.join(os.path.dirname(__file__), os.path.pardir, 'build', 'simplify')
-    assert os.path.exists(qslim), 'Could not find simplification program %s' % qslim
+    # The collapse sequence is recorded once, and truncated for every size
+    progressive = ngfutil.progressive_mesh(ref.vertices.cpu(), ref.faces.int().cpu())
 
     os.makedirs('results/generated', exist_ok=True)
     qslim_result = 'results/generated/smashed.obj'
 
-    def qslim_exec(rate):
-        import subprocess
-
-        cmd = subprocess.list2cmdline([ qslim, args.reference, qslim_result, str(rate) ])
-        subprocess.call(cmd, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-        qslimmed, _ = load_mesh(qslim_result)
-        size = mesh_size(qslimmed.vertices, qslimmed.faces)
-
-        return size
-
     def qslim_search(size):
-        from tqdm import trange
+        import meshio
 
-        small, large = 0.001, 0.95
-        for _ in trange(15, ncols=100, desc='QSlim'):
-            mid = (small + large) / 2
-            qsize = qslim_exec(mid)
-            if qsize > size:
-                large = mid
-            else:
-                small = mid
+        V, F = progressive.extract_bytes(size)
+        meshio.Mesh(V.numpy(), [ ('triangle', F.numpy()) ]).write(qslim_result)
 
-        qslim_exec((small + large) / 2)
+        return mesh_from(V.to(evaluator.device), F.to(evaluator.device))
 
     evaluations = { 'reference' : {
             'size': mesh_size(ref.vertices, ref.faces),
@@ -237,7 +261,7 @@ def scene_evaluations(reference, directory, alt=None):
 
             print('Loading NGF from', file)
 
-            ngf = torch.load(path)
+            ngf = torch.load(path, map_location=Evaluator.DEVICE)
             ngf = load_ngf(ngf)
             size = ngf_size(ngf)
 
@@ -264,9 +288,7 @@ def scene_evaluations(reference, directory, alt=None):
     # QSlim and nvdiffmodeling at various sizes
     for size in sizes:
         # QSlim
-        qslim_search(size)
-
-        smashed, _ = load_mesh(qslim_result)
+        smashed = qslim_search(size)
 
         metrics = evaluator.eval_metrics(smashed, name)
         metrics['count'] = smashed.faces.shape[0]
@@ -306,7 +328,7 @@ def scene_evaluations(reference, directory, alt=None):
 
         subprocess.run(cmd.split())
 
-        nvdiff, _ = load_mesh(os.path.join('evals', 'nvdiffmodeling', name, 'mesh', 'mesh.obj'))
+        nvdiff, _ = load_mesh(os.path.join('evals', 'nvdiffmodeling', name, 'mesh', 'mesh.obj'), device=Evaluator.DEVICE)
 
         metrics = evaluator.eval_metrics(nvdiff, name)
         metrics['count'] = nvdiff.faces.shape[0]
@@ -315,8 +337,7 @@ def scene_evaluations(reference, directory, alt=None):
 
         evaluations.setdefault('nvdiffmodeling', []).append(metrics)
 
-    os.makedirs('evals', exist_ok=True)
-    torch.save(evaluations, os.path.join('evals', name + '.pt'))
+    save_results('scenes/' + name, evaluations)
 
 def ngf_mesh(ngf, rate=16, reduce=True) -> Mesh:
     with torch.no_grad():
@@ -362,17 +383,17 @@ def tessellation_evaluation(prefix):
                 scene = os.path.basename(root)
                 print('Processing scene', scene)
                 reference = os.path.join(rdir, 'meshes', scene, 'target.obj')
-                reference, _ = load_mesh(reference)
+                reference, _ = load_mesh(reference, device=Evaluator.DEVICE)
                 evaluator = Evaluator(reference)
 
-                ngf = torch.load(file)
+                ngf = torch.load(file, map_location=Evaluator.DEVICE)
                 ngf = load_ngf(ngf)
 
                 rm = eval_tessellations(evaluator, ngf, scene)
                 data[scene] = rm
 
     print(data)
-    torch.save(data, 'tessellation.pt')
+    save_results('tessellation', data)
 
     # import json
     # with open('tessellation.json', 'w') as f:
@@ -398,11 +419,11 @@ def feature_evaluation(prefix):
                 setup.setdefault(scene, {})
                 if 'evaluator' not in setup[scene]:
                     reference = os.path.join(rdir, 'meshes', scene, 'target.obj')
-                    reference, _ = load_mesh(reference)
+                    reference, _ = load_mesh(reference, device=Evaluator.DEVICE)
                     evaluator = Evaluator(reference)
                     setup[scene]['evaluator'] = evaluator
 
-                ngf = torch.load(file)
+                ngf = torch.load(file, map_location=Evaluator.DEVICE)
                 ngf = load_ngf(ngf)
 
                 features = ngf.features.shape[1]
@@ -444,7 +465,7 @@ def feature_evaluation(prefix):
                 'size'    : size
             }
 
-    torch.save(data, 'features.pt')
+    save_results('features', data)
 
 def multichart_evaluations():
     import re
@@ -466,7 +487,7 @@ def multichart_evaluations():
     data = { 'ngf': [], 'mcgim': [], 'neural-mcgim': [] }
 
     # Configure the evaluator
-    reference, _ = load_mesh('meshes/nefertiti/target.obj')
+    reference, _ = load_mesh('meshes/nefertiti/target.obj', device=Evaluator.DEVICE)
     evaluator = Evaluator(reference)
 
     # Find all ngf models
@@ -490,7 +511,7 @@ def multichart_evaluations():
 
                 file = os.path.join(root, file)
                 size = os.path.getsize(file)
-                ngf = torch.load(file)
+                ngf = torch.load(file, map_location=Evaluator.DEVICE)
                 ngf = load_ngf(ngf)
 
                 print('  > size', size // 1024, 'KB')
@@ -535,7 +556,7 @@ def multichart_evaluations():
             indices = np.array(indices)
             indices += k * sampling ** 2
 
-            total_indices.append(torch.from_numpy(indices).int().cuda())
+            total_indices.append(torch.from_numpy(indices).int().to(evaluator.device))
             total_vertices.append(gim)
 
         total_vertices = torch.cat(total_vertices)
@@ -551,7 +572,7 @@ def multichart_evaluations():
 
                 file = os.path.join(root, file)
                 size = os.path.getsize(file)
-                mcgim = torch.load(file)
+                mcgim = torch.load(file, map_location=Evaluator.DEVICE)
 
                 print('  > mcgim shape', mcgim.shape)
                 print('  > size', size // 1024, 'KB')
@@ -601,7 +622,7 @@ def multichart_evaluations():
             indices = np.array(indices)
             indices += k * sampling ** 2
 
-            total_indices.append(torch.from_numpy(indices).int().cuda())
+            total_indices.append(torch.from_numpy(indices).int().to(evaluator.device))
             total_vertices.append(gim)
 
         total_vertices = torch.cat(total_vertices)
@@ -617,7 +638,7 @@ def multichart_evaluations():
 
                 file = os.path.join(root, file)
                 size = os.path.getsize(file)
-                packet = torch.load(file)
+                packet = torch.load(file, map_location=Evaluator.DEVICE)
 
                 model = packet['model']
                 mcgim = model.evaluate(**packet)
@@ -659,7 +680,7 @@ def frequency_evaluation():
     import json
     import re
 
-    ref = load_mesh('meshes/armadillo/target.obj')[0]
+    ref = load_mesh('meshes/armadillo/target.obj', device=Evaluator.DEVICE)[0]
     evl = Evaluator(ref)
 
     data = {}
@@ -679,7 +700,7 @@ def frequency_evaluation():
     pattern = re.compile(r'.*f(\d+).pt')
     for file in glob.glob('results/frequencies/*.pt'):
         freqs = int(pattern.match(file).group(1))
-        ngf = torch.load(file)
+        ngf = torch.load(file, map_location=Evaluator.DEVICE)
         ngf = load_ngf(ngf)
         print('ngf', ngf)
 
@@ -706,7 +727,7 @@ def frequency_evaluation():
 
         # print('metrics', metrics.keys())
 
-    torch.save(data, 'frequencies.pt')
+    save_results('frequencies', data)
 
 def ngf_to_mesh(ngf, rate=16):
     with torch.no_grad():
@@ -723,7 +744,7 @@ def losses_evaluation(directory):
     import json
 
     # Evaluator
-    ref = load_mesh('meshes/igea/target.obj')[0]
+    ref = load_mesh('meshes/igea/target.obj', device=Evaluator.DEVICE)[0]
     evl = Evaluator(ref)
 
     # Looking for ordindary and chamfer
@@ -732,8 +753,8 @@ def losses_evaluation(directory):
     print('ordinary', ordinary)
     print('chamfer', chamfer)
 
-    ngf_ord = load_ngf(torch.load(ordinary))
-    ngf_chm = load_ngf(torch.load(chamfer))
+    ngf_ord = load_ngf(torch.load(ordinary, map_location=Evaluator.DEVICE))
+    ngf_chm = load_ngf(torch.load(chamfer, map_location=Evaluator.DEVICE))
 
     metrics_ord = evl.eval_metrics(ngf_to_mesh(ngf_ord))
     metrics_chm = evl.eval_metrics(ngf_to_mesh(ngf_chm))
@@ -758,18 +779,18 @@ def losses_evaluation(directory):
             'render:chm': metrics_chm['images']['normal:mesh'],
     }
 
-    torch.save(data, 'loss-eval.pt')
+    save_results('loss-eval', data)
 
 def ingp_evaluation():
     # Load all the files
     directory = os.path.abspath('evals/ingp')
 
-    ref, normalizer = load_mesh(os.path.join(directory, 'target.obj'))
-    ingp_t11 = load_mesh(os.path.join(directory, 'ingp-t11-f8.obj'))[0]
-    ingp_t12 = load_mesh(os.path.join(directory, 'ingp-t12-f4.obj'))[0]
-    ingp_t13 = load_mesh(os.path.join(directory, 'ingp-t13-f2.obj'))[0]
+    ref, normalizer = load_mesh(os.path.join(directory, 'target.obj'), device=Evaluator.DEVICE)
+    ingp_t11 = load_mesh(os.path.join(directory, 'ingp-t11-f8.obj'), device=Evaluator.DEVICE)[0]
+    ingp_t12 = load_mesh(os.path.join(directory, 'ingp-t12-f4.obj'), device=Evaluator.DEVICE)[0]
+    ingp_t13 = load_mesh(os.path.join(directory, 'ingp-t13-f2.obj'), device=Evaluator.DEVICE)[0]
 
-    ngf = load_ngf(torch.load(os.path.join(directory, 'primary.pt')))
+    ngf = load_ngf(torch.load(os.path.join(directory, 'primary.pt'), map_location=Evaluator.DEVICE))
     ngf_mesh = ngf_to_mesh(ngf)
 
     print('ref minmax', ref.vertices.min(0)[0], ref.vertices.max(0)[0])
@@ -808,24 +829,24 @@ def ingp_evaluation():
             }
     }
 
-    torch.save(data, 'ingp.pt')
+    save_results('ingp', data)
 
 def scroller_evaluation():
-    ref = load_mesh('meshes/wreck/target.obj')[0]
-    ngf = load_ngf(torch.load('results/wreck/experimental.pt'))
+    ref = load_mesh('meshes/wreck/target.obj', device=Evaluator.DEVICE)[0]
+    ngf = load_ngf(torch.load('results/wreck/experimental.pt', map_location=Evaluator.DEVICE))
     ngf_mesh = ngf_to_mesh(ngf)
 
     evl = Evaluator(ref)
     print('ref, ngf', ref.vertices.shape[0], ngf_mesh.vertices.shape[0])
 
-    return torch.save(evl.render_everything(ngf_mesh, 'wreck'), 'wreck-all.pt')
+    return save_results('wreck-all', evl.render_everything(ngf_mesh, 'wreck'))
 
 def teaser_evaluation():
-    ref    = load_mesh('evals/teaser/target.obj')[0]
-    qslim  = load_mesh('evals/teaser/qslim.obj')[0]
-    nvdiff = load_mesh('evals/teaser/nvdiff.obj')[0]
-    ingp   = load_mesh('evals/teaser/ingp.obj')[0]
-    ngf    = load_ngf(torch.load('evals/teaser/primary.pt'))
+    ref    = load_mesh('evals/teaser/target.obj', device=Evaluator.DEVICE)[0]
+    qslim  = load_mesh('evals/teaser/qslim.obj', device=Evaluator.DEVICE)[0]
+    nvdiff = load_mesh('evals/teaser/nvdiff.obj', device=Evaluator.DEVICE)[0]
+    ingp   = load_mesh('evals/teaser/ingp.obj', device=Evaluator.DEVICE)[0]
+    ngf    = load_ngf(torch.load('evals/teaser/primary.pt', map_location=Evaluator.DEVICE))
 
     def ngf_to_mesh(ngf, rate=16, reduce=True) -> Mesh:
         with torch.no_grad():
@@ -863,7 +884,7 @@ def teaser_evaluation():
         [0.880, 0.320, 0.530]
     ])
 
-    COLOR_WHEEL = torch.from_numpy(COLOR_WHEEL).cuda().float()
+    COLOR_WHEEL = torch.from_numpy(COLOR_WHEEL).to(evl.device).float()
 
     camera = evl.get_view('dragon').unsqueeze(0)
     pindex = torch.arange(ngf.complexes.shape[0]).repeat_interleave(450)
@@ -879,7 +900,7 @@ def teaser_evaluation():
     ingp_data   = evl.eval_metrics(ingp, 'dragon', invert=True)
     ngf_data    = evl.eval_metrics(ngf_mesh, 'dragon')
 
-    return torch.save({
+    return save_results('teaser', {
         'nrm:ref'    : ngf_data['images']['normal:ref'],
         'nrm:ngf'    : ngf_data['images']['normal:mesh'],
         'nrm:qslim'  : qslim_data['images']['normal:mesh'],
@@ -891,7 +912,7 @@ def teaser_evaluation():
         'chamfer:qslim'  : qslim_data['chamfer'],
         'chamfer:nvdiff' : nvdiff_data['chamfer'],
         'chamfer:ingp'   : ingp_data['chamfer'],
-    }, 'teaser.pt')
+    })
 
     # return torch.save(evl.render_everything(ngf_mesh, 'dragon'), 'teaser.pt')
 
@@ -908,8 +929,17 @@ if __name__ == '__main__':
     parser.add_argument('--ingp', action='store_true', help='perform INGP comparisons')
     parser.add_argument('--scroller', action='store_true', help='evaluating scoller images')
     parser.add_argument('--teaser', action='store_true', help='evaluating scoller images')
+    parser.add_argument('--cache', type=str, default=None, help='directory to spill reference renders to')
+    parser.add_argument('--store', type=str, default=Evaluator.STORE, help='directory of the results store')
+    parser.add_argument('--backend', type=str, default=Evaluator.BACKEND, choices=['cuda', 'torch'], help='rasterization backend')
+    parser.add_argument('--device', type=str, default=None, help='device to evaluate on (defaults to cuda for the cuda backend, cpu otherwise)')
     args = parser.parse_args()
 
+    Evaluator.CACHE = args.cache
+    Evaluator.STORE = args.store
+    Evaluator.BACKEND = args.backend
+    Evaluator.DEVICE = args.device or ('cuda' if args.backend == 'cuda' else 'cpu')
+
     if args.results:
         scene_evaluations(args.reference, args.results, args.alt)
     elif args.tess_prefix:
@@ -8,6 +8,7 @@ import simpleimageio as sio
 import torch
 
 from figuregen.util.image import Cropbox, relative_mse
+from util.results import ResultStore
 from figuregen.util.templates import CropComparison
 
 # TeX presents
@@ -1492,10 +1493,18 @@ def teaser(db):
 
     synthesize_tex(code, 'teaser.pdf', log=True)
 
+def open_results(path: str, experiment: str):
+    # Evaluations pickled before the results store are still readable
+    if path.endswith('.pt'):
+        return torch.load(path)
+
+    return ResultStore(path).view(experiment)
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--type', type=str, default='loss', help='Type of plot to generate')
-    parser.add_argument('--db', type=str, default='', help='Database to plot from')
+    parser.add_argument('--db', type=str, default=os.path.join('evals', 'results'), help='Results store (or legacy .pt file) to plot from')
+    parser.add_argument('--experiment', type=str, default=None, help='Experiment in the results store (defaults to the plot type)')
     parser.add_argument('--key', type=str, default='dpm', help='Key to plot from')
     parser.add_argument('--dir', type=str, default='.', help='Directory to plot from')
     parser.add_argument('--tick', type=int, default=5, help='Tick step for plots')
@@ -1503,49 +1512,68 @@ if __name__ == '__main__':
 
     args = parser.parse_args()
 
+    # Experiment names written by evaluate.py
+    EXPERIMENTS = {
+        'tessellation' : 'tessellation',
+        'features'     : 'features',
+        'frequencies'  : 'frequencies',
+        'losses'       : 'loss-eval',
+        'ingp'         : 'ingp',
+        'display'      : 'wreck-all',
+        'teaser'       : 'teaser',
+    }
+
+    experiment = args.experiment or EXPERIMENTS.get(args.type)
+
     if args.type == 'loss':
         loss_plot(args.dir)
     elif args.type == 'results':
-        db = torch.load(args.db)
-        name = os.path.basename(args.db)
+        name = os.path.basename(args.experiment or args.db)
         name = name.split('.')[0]
+        db = open_results(args.db, 'scenes/' + name)
         results_plot(name, db)
     elif args.type == 'table':
         dbs = {}
-        for root, directory, files in os.walk(args.dir):
-            if not root == os.path.basename(args.dir):
-                continue
+        if os.path.exists(os.path.join(args.db, 'results.db')):
+            store = ResultStore(args.db)
+            for experiment in store.experiments():
+                if experiment.startswith('scenes/'):
+                    dbs[os.path.basename(experiment).capitalize()] = store.view(experiment)
+        else:
+            for root, directory, files in os.walk(args.dir):
+                if not root == os.path.basename(args.dir):
+                    continue
 
-            for file in files:
-                if file.endswith('.pt'):
-                    db = torch.load(os.path.join(root, file))
-                    f = file.split('.')[0].capitalize()
-                    dbs[f] = db
+                for file in files:
+                    if file.endswith('.pt'):
+                        db = torch.load(os.path.join(root, file))
+                        f = file.split('.')[0].capitalize()
+                        dbs[f] = db
 
         table(dbs)
     elif args.type == 'tessellation':
-        db = torch.load(args.db)
+        db = open_results(args.db, experiment)
         tessellation(db)
     elif args.type == 'features':
-        db = torch.load(args.db)
+        db = open_results(args.db, experiment)
         features(db)
     elif args.type == 'multichart':
         db = json.load(open(args.db))
         mutlichart(db)
     elif args.type == 'frequencies':
-        db = torch.load(args.db)
+        db = open_results(args.db, experiment)
         frequencies(db)
     elif args.type == 'losses':
-        db = torch.load(args.db)
+        db = open_results(args.db, experiment)
         losses(db)
     elif args.type == 'ingp':
-        db = torch.load(args.db)
+        db = open_results(args.db, experiment)
         ingp(db)
     elif args.type == 'display':
-        db = torch.load(args.db)
+        db = open_results(args.db, experiment)
         display(db)
     elif args.type == 'teaser':
-        db = torch.load(args.db)
+        db = open_results(args.db, experiment)
         teaser(db)
     else:
         raise NotImplementedError
@@ -1,187 +1,173 @@
+import os
 import sys
+import json
 import tqdm
-import numpy as np
-import pprint
+import torch
 import argparse
 
-from torchmetrics.image import PeakSignalNoiseRatio
-from kaolin.metrics.pointcloud import chamfer_distance
-
 from util import *
-from ngf import NGF
 from render import Renderer
 
-if __name__ == '__main__':
-    VIEWLUT = {}
 
-    parser = argparse.ArgumentParser()
-    # parser.add_argument('--ref', type=int, default=0)
-    parser.add_argument('--meshes', type=str, nargs='+')
-    parser.add_argument('--cameras', type=int, default=200)
-    parser.add_argument('--key', type=str, choices=['lod', 'rate'])
+def parse_keys(path: str) -> dict:
+    # Configuration encoded in result names, e.g. armadillo-lod2000-f20-r16.pt
+    keys = {}
+    if 'lod' not in path:
+        return keys
 
-    args = parser.parse_args(sys.argv[1:])
+    basename = os.path.basename(path).split('.')[0]
+    for s in basename.split('-'):
+        if s.startswith('lod'):
+            keys['lod'] = int(s[3:])
+        if s.startswith('f'):
+            keys['feature'] = int(s[1:])
+        if s.startswith('r'):
+            keys['rate'] = int(s[1:])
 
-    meshes = []
-    keys = {}
+    return keys
 
-    print('MESHES')
-    for i, mesh in enumerate(args.meshes):
-        print(f'[{i:2d}]', mesh, end='')
 
+def load_normalized(path: str, device: str) -> Mesh:
+    # Trained results are already normalized, unlike references and baselines
+    normalizer = None
+    if 'lod' in path and 'qslim' not in path and 'nvdiffmodeling' not in path:
         normalizer = lambda x: x
-        # if input('normalize? [y/n] ') == 'y':
-        if 'lod' not in mesh or 'qslim' in mesh or 'nvdiffmodeling' in mesh:
-            print(' -- [normalized]')
-            normalizer = None
-        else:
-            print()
-
-        if 'lod' in mesh:
-            basename = os.path.basename(mesh)
-            basename = basename.split('.')[0]
-            splits = basename.split('-')
-            keys[mesh] = {}
-            for s in splits:
-                if s.startswith('lod'):
-                    keys[mesh]['lod'] = int(s[3:])
-                if s.startswith('f'):
-                    keys[mesh]['feature'] = int(s[1:])
-                if s.startswith('r'):
-                    keys[mesh]['rate'] = int(s[1:])
-
-        mesh, normalizer = load_mesh(mesh, normalizer)
-        meshes.append(mesh)
-
-    import polyscope as ps
-    ps.init()
-    for i, mesh in enumerate(meshes):
-        ps.register_surface_mesh(f'mesh{i}', mesh.vertices.cpu().numpy(), mesh.faces.cpu().numpy())
-    ps.show()
-
-    refi = int(input('\nWhich mesh is the reference? '))
-
-    reference = meshes[refi]
-    print('\nREFERENCE', args.meshes[refi])
-        
-    views = arrange_views(reference, args.cameras)[0]
-    print('\nGENERATED', args.cameras, 'CAMERAS')
-
-    renderer = Renderer(1920, 1080)
-    psnr = PeakSignalNoiseRatio().cuda()
-
-    shaded_metrics = {}
-    normal_metrics = {}
-    chamfer_metrics = {}
-
-    for view in tqdm.tqdm(views, ncols=50, leave=False):
-        # TODO: do not separate
-        normals = vertex_normals(reference.vertices, reference.faces)
-        shaded = renderer.shaded(reference.vertices, normals, reference.faces, view[None])[0]
-        normal = renderer.interpolate(reference.vertices, normals, reference.faces, view[None])[0]
-        assert not shaded.isnan().any()
-
-        # shaded = renderer.shaded(*separate(reference.vertices, reference.faces), view[None])[0]
-        # normal = renderer.interpolate(*separate(reference.vertices, reference.faces), view[None])[0]
-
-        # plt.imshow(shaded[0].cpu()/1000)
-        # plt.axis('off')
-        # plt.show()
-        #
-        # plt.imshow(normal[0].cpu() * 0.5 + 0.5)
-        # plt.axis('off')
-        # plt.show()
-
-        # fig, axs = plt.subplots(2, 1 + len(meshes))
-        # for ax in axs.flatten():
-        #     ax.axis('off')
-        #
-        # axs[0][0].imshow(normal.cpu() * 0.5 + 0.5)
-
-        for i, mesh in enumerate(meshes):
-            if i == refi:
-                continue
 
-            # mesh_shaded = renderer.shaded(*separate(mesh.vertices, mesh.faces), view[None])[0]
-            # mesh_normal = renderer.interpolate(*separate(mesh.vertices, mesh.faces), view[None])[0]
-            mesh_normals = vertex_normals(mesh.vertices, mesh.faces)
-            mesh_shaded = renderer.shaded(mesh.vertices, mesh_normals, mesh.faces, view[None])[0]
-            mesh_normal = renderer.interpolate(mesh.vertices, mesh_normals, mesh.faces, view[None])[0]
-            assert not mesh_shaded.isnan().any()
-
-            # axs[0][1 + i].set_title(args.meshes[i])
-            # axs[0][1 + i].imshow(mesh_normal.cpu() * 0.5 + 0.5)
-            # diffmag = (normal - mesh_normal).square().mean(dim=-1)
-            # c = axs[1][1 + i].imshow(diffmag.cpu())
-            # plt.colorbar(c)
-
-            error_shaded = (shaded - mesh_shaded).square().mean().item()
-            error_normal = (normal - mesh_normal).square().mean().item()
-            
-            shaded_metrics.setdefault(i, []).append(error_shaded)
-            normal_metrics.setdefault(i, []).append(error_normal)
-
-        # plt.show()
-        
-    for i, mesh in enumerate(meshes):
-        if i == refi:
-            continue
+    # Vertex normals are computed once here and reused for every view
+    mesh, _ = load_mesh(path, normalizer, device)
+    return mesh
 
-        chamfer = chamfer_distance(reference.vertices[None, ...], mesh.vertices[None, ...])
-        print('chamfer', chamfer.item())
 
-        chamfer_metrics[i] = chamfer.item()
+def tile_matrix(i: int, j: int, tiles: int, device) -> torch.Tensor:
+    # Maps the (i, j) tile of the clip space onto the full viewport
+    T = torch.eye(4, device=device)
+    T[0, 0] = T[1, 1] = tiles
+    T[0, 3] = tiles - 1 - 2 * i
+    T[1, 3] = tiles - 1 - 2 * j
+    return T
 
-    for i, mesh in enumerate(args.meshes):
-        if i == refi:
-            continue
 
-        shaded_metrics[mesh] = np.mean(shaded_metrics[i])
-        normal_metrics[mesh] = np.mean(normal_metrics[i])
-        chamfer_metrics[mesh] = chamfer_metrics[i]
+def render_tiled(renderer: Renderer, method: str, mesh: Mesh, views: torch.Tensor, tiles: int) -> torch.Tensor:
+    proj, res = renderer.proj, renderer.res
+    H, W = res
+
+    try:
+        rows = []
+        for j in range(tiles):
+            row = []
+            for i in range(tiles):
+                renderer.proj = tile_matrix(i, j, tiles, proj.device) @ proj
+                renderer.res = (H // tiles, W // tiles)
+                row.append(getattr(renderer, method)(mesh.vertices, mesh.normals, mesh.faces, views))
 
-        del shaded_metrics[i]
-        del normal_metrics[i]
-        del chamfer_metrics[i]
+            rows.append(torch.cat(row, dim=2))
+    finally:
+        renderer.proj, renderer.res = proj, res
 
-    print('\nGROUND TRUTH VIEWS EVALUATED (%d x %d)' % (1920, 1080))
+    return torch.cat(rows, dim=1)
 
-    for i, mesh in enumerate(args.meshes):
-        if i == refi:
+
+def choose_tiles(width: int, height: int, batch: int, budget: int) -> int:
+    # Fewest tiles (dividing the resolution) that keep each pass within the pixel budget
+    for tiles in range(1, min(width, height) + 1):
+        if width % tiles or height % tiles:
             continue
+        if batch * width * height <= budget * tiles * tiles:
+            return tiles
+
+    return 1
+
+
+def evaluate(reference: str,
+             meshes: list[str],
+             cameras: int = 200,
+             width: int = 1920,
+             height: int = 1080,
+             batch: int = 10,
+             budget: int = 1 << 24,
+             samples: int = 1_000_000,
+             backend: str = 'cuda') -> dict:
+    device = 'cuda' if backend == 'cuda' else 'cpu'
+
+    target = load_normalized(reference, device)
+    candidates = [ load_normalized(path, device) for path in meshes ]
+
+    views = arrange_views(target, cameras)[0]
+    renderer = Renderer(width, height, backend=backend, device=device)
+    tiles = choose_tiles(width, height, batch, budget)
+
+    totals = { path: { 'shaded': 0.0, 'normal': 0.0 } for path in meshes }
+    count = 0
+
+    # Every candidate is compared against each batch of reference views as it is rendered
+    for batch_views in tqdm.tqdm(views.split(batch), ncols=50, leave=False):
+        shaded = render_tiled(renderer, 'shaded', target, batch_views, tiles)
+        normal = render_tiled(renderer, 'interpolate', target, batch_views, tiles)
+        count += batch_views.shape[0]
+
+        for path, mesh in zip(meshes, candidates):
+            mesh_shaded = render_tiled(renderer, 'shaded', mesh, batch_views, tiles)
+            mesh_normal = render_tiled(renderer, 'interpolate', mesh, batch_views, tiles)
+
+            totals[path]['shaded'] += (shaded - mesh_shaded).square().mean(dim=(1, 2, 3)).sum().item()
+            totals[path]['normal'] += (normal - mesh_normal).square().mean(dim=(1, 2, 3)).sum().item()
+
+    results = {}
+    for path, mesh in zip(meshes, candidates):
+        results[path] = {
+            'shaded': totals[path]['shaded'] / count,
+            'normal': totals[path]['normal'] / count,
+            **surface_metrics(mesh, target, samples),
+            **parse_keys(path),
+        }
+
+    return {
+        'reference': os.path.abspath(reference),
+        'cameras': views.shape[0],
+        'resolution': [ width, height ],
+        'tiles': tiles,
+        'meshes': results,
+    }
 
-        print('\nMETRICS FOR', mesh)
-        print(' * SHADED   %.3e' % shaded_metrics[mesh])
-        print(' * NORMAL   %.3e' % normal_metrics[mesh])
-        print(' * CHAMFER  %.3e' % chamfer_metrics[mesh])
 
-    shaded_points = []
-    normal_points = []
-    chamfer_points = []
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reference', type=str, required=True, help='Reference mesh')
+    parser.add_argument('--meshes', type=str, nargs='+', required=True, help='Meshes to evaluate against the reference')
+    parser.add_argument('--cameras', type=int, default=200, help='Number of views to compare')
+    parser.add_argument('--resolution', type=int, nargs=2, default=[1920, 1080], help='Width and height of each view')
+    parser.add_argument('--batch', type=int, default=10, help='Views rendered at once')
+    parser.add_argument('--budget', type=int, default=1 << 24, help='Pixels per render pass before tiling')
+    parser.add_argument('--samples', type=int, default=1_000_000, help='Surface samples for distance metrics')
+    parser.add_argument('--key', type=str, choices=['lod', 'rate'], help='Also report metrics as (key, value) series')
+    parser.add_argument('--backend', type=str, default='cuda', choices=['cuda', 'torch'], help='Rasterization backend')
+    parser.add_argument('--output', type=str, default=None, help='JSON file for the results (default: stdout)')
 
-    for i, mesh in enumerate(args.meshes):
-        if i == refi:
-            continue
+    args = parser.parse_args(sys.argv[1:])
+
+    data = evaluate(args.reference,
+                    [ mesh for mesh in args.meshes if mesh != args.reference ],
+                    args.cameras,
+                    *args.resolution,
+                    args.batch,
+                    args.budget,
+                    args.samples,
+                    args.backend)
+
+    if args.key:
+        series = {}
+        for metrics in data['meshes'].values():
+            if args.key not in metrics:
+                continue
+
+            for name in [ 'shaded', 'normal', 'chamfer', 'hausdorff' ]:
+                series.setdefault(name, []).append((metrics[args.key], metrics[name]))
+
+        data['series'] = { name: sorted(points) for name, points in series.items() }
 
-        k = keys[mesh][args.key]
-        shaded_points.append((k, shaded_metrics[mesh]))
-        normal_points.append((k, normal_metrics[mesh]))
-        chamfer_points.append((k, chamfer_metrics[mesh]))
-
-    shaded_points = sorted(shaded_points, key=lambda v: v[0])
-    normal_points = sorted(normal_points, key=lambda v: v[0])
-    chamfer_points = sorted(chamfer_points, key=lambda v: v[0])
-
-    print('\nPLOTS')
-    
-    print('\nSHADED')
-    for p in shaded_points:
-        print('  (%4d, %.3e)' % p)
-    
-    print('\nNORMAL')
-    for p in normal_points:
-        print('  (%4d, %.3e)' % p)
-    
-    print('\nCHAMFER')
-    for p in chamfer_points:
-        print('  (%4d, %.3e)' % p)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(data, file, indent=4)
+    else:
+        json.dump(data, sys.stdout, indent=4)
+        print()
@@ -0,0 +1,113 @@
+import sys
+import json
+import torch
+import logging
+import argparse
+
+from ngf import NGF, BACKENDS, parse_architecture
+from benchmark import SHAPES, measure
+from texture_benchmark import displaced, fit
+
+
+def run(args) -> dict:
+    networks = [ parse_architecture(spec) for spec in args.networks ]
+
+    results = []
+    for shape in args.shapes:
+        torch.manual_seed(0)
+
+        points, complexes = SHAPES[shape](args.patches)
+        points, complexes = points.to(args.device), complexes.to(args.device)
+
+        for architecture in networks:
+            torch.manual_seed(0)
+
+            features = torch.zeros(points.shape[0], args.features, device=args.device, requires_grad=True)
+            ngf = NGF(points.clone().requires_grad_(True), features, complexes, 8, False, True, architecture=architecture)
+
+            targets = {}
+            for rate in [ args.rate, args.eval_rate ]:
+                with torch.no_grad():
+                    targets[rate] = displaced(ngf.base(rate), args.amplitude, args.frequency)
+
+            uvs = ngf.sample_uniform(args.eval_rate)
+
+            def forward():
+                with torch.no_grad():
+                    ngf.eval(*uvs)
+
+            timing = measure(forward, args.device, args.repeats, args.warmup)
+
+            result = {
+                'network': architecture,
+                'shape': shape,
+                'parameters': sum(p.numel() for p in ngf.mlp.parameters()),
+                'forward': timing['median'],
+                'samples/s': uvs[0].numel() / (timing['median'] / 1000),
+                **fit(ngf, targets, args.rate, args.eval_rate, args.iterations),
+            }
+
+            name = f'{architecture["backend"]}:{architecture["hidden"]}:{architecture["depth"]}'
+            print(f'{shape:<8} {name:<16} {result["parameters"]:8d} params {result["forward"]:8.3f} ms '
+                  f'{result["samples/s"]:12.3e}/s error {result["error"]:.3e}')
+
+            results.append(result)
+
+    return {
+        'device': args.device,
+        'torch': torch.__version__,
+        'results': results,
+    }
+
+
+def choose(results: list[dict], target: float) -> dict:
+    # Fastest network whose error meets the target on every shape
+    by_network = {}
+    for r in results:
+        key = json.dumps(r['network'], sort_keys=True)
+        entry = by_network.setdefault(key, { 'network': r['network'], 'forward': 0.0, 'error': 0.0 })
+        entry['forward'] += r['forward']
+        entry['error'] = max(entry['error'], r['error'])
+
+    feasible = [ e for e in by_network.values() if e['error'] <= target ]
+    if not feasible:
+        return None
+
+    return min(feasible, key=lambda e: e['forward'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--device', type=str, default='cuda' if torch.cuda.is_available() else 'cpu', help='Device to benchmark on')
+    parser.add_argument('--networks', type=str, nargs='+', default=list(BACKENDS.keys()), help='Networks as backend[:hidden[:depth]]')
+    parser.add_argument('--shapes', type=str, nargs='+', default=list(SHAPES.keys()), choices=list(SHAPES.keys()), help='Synthetic base meshes')
+    parser.add_argument('--patches', type=int, default=400, help='Approximate patch count')
+    parser.add_argument('--features', type=int, default=20, help='Feature vector size')
+    parser.add_argument('--rate', type=int, default=8, help='Training sampling rate')
+    parser.add_argument('--eval-rate', type=int, default=15, help='Sampling rate for throughput and the fitted error')
+    parser.add_argument('--iterations', type=int, default=1000, help='Fitting iterations')
+    parser.add_argument('--amplitude', type=float, default=0.05, help='Amplitude of the target displacement')
+    parser.add_argument('--frequency', type=float, default=12.0, help='Frequency of the target displacement')
+    parser.add_argument('--target', type=float, default=None, help='Error target for choosing a network')
+    parser.add_argument('--repeats', type=int, default=10, help='Timed repetitions')
+    parser.add_argument('--warmup', type=int, default=2, help='Untimed repetitions')
+    parser.add_argument('--output', type=str, default=None, help='JSON file for the results')
+
+    args = parser.parse_args(sys.argv[1:])
+
+    logging.basicConfig(level=logging.WARNING)
+
+    results = run(args)
+
+    if args.target is not None:
+        chosen = choose(results['results'], args.target)
+        results['chosen'] = chosen
+        if chosen is None:
+            print(f'no network meets the error target {args.target:.3e}')
+        else:
+            print(f'fastest network within {args.target:.3e}: {chosen["network"]} '
+                  f'({chosen["forward"]:.3f} ms, error {chosen["error"]:.3e})')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
@@ -8,39 +8,76 @@ import torch.nn as nn
 
 from typing import Callable
 
+from util.siren import SIREN
+from util.stream import stream_linear
+from util.texture import texture_fetch
+
 
 class MLP(nn.Module):
-    def __init__(self, ffin: int) -> None:
+    def __init__(self, ffin: int, hidden: int = 64, depth: int = 4) -> None:
         super(MLP, self).__init__()
 
-        self.layers = nn.Sequential(
-            nn.Linear(ffin, 64),
-            nn.LeakyReLU(),
-            nn.Linear(64, 64),
-            nn.LeakyReLU(),
-            nn.Linear(64, 64),
-            nn.LeakyReLU(),
-            nn.Linear(64, 3)
-        )
+        layers = [ nn.Linear(ffin, hidden), nn.LeakyReLU() ]
+        for _ in range(depth - 2):
+            layers += [ nn.Linear(hidden, hidden), nn.LeakyReLU() ]
+
+        layers.append(nn.Linear(hidden, 3))
+
+        self.layers = nn.Sequential(*layers)
 
     def forward(self, x):
         return self.layers(x)
 
+    def linears(self) -> list[nn.Linear]:
+        return [ layer for layer in self.layers if isinstance(layer, nn.Linear) ]
+
     def stream(self):
-        weights = [layer.weight.data.cpu() for layer in self.layers if isinstance(layer, nn.Linear)]
-        biases = [layer.bias.data.cpu() for layer in self.layers if isinstance(layer, nn.Linear)]
+        return stream_linear(self.linears())
+
+
+# Network backends with their default hyperparameters and activation code in binary headers
+BACKENDS = {
+    'mlp':    (MLP,   { 'hidden': 64, 'depth': 4 }, 0),
+    'narrow': (MLP,   { 'hidden': 32, 'depth': 3 }, 0),
+    'siren':  (SIREN, { 'hidden': 64, 'depth': 4 }, 1),
+}
+
+
+def resolve_architecture(architecture: dict = None) -> dict:
+    # Fills in the defaults of the chosen backend; checkpoints without an architecture used the default MLP
+    architecture = dict(architecture or {})
+    backend = architecture.setdefault('backend', 'mlp')
+    if backend not in BACKENDS:
+        raise ValueError(f'unknown network backend {backend!r}, expected one of {list(BACKENDS)}')
+
+    for k, v in BACKENDS[backend][1].items():
+        if architecture.get(k) is None:
+            architecture[k] = v
 
-        bytestream = b''
-        for w in weights:
-            bytestream += w.shape[0].to_bytes(4, 'little')
-            bytestream += w.shape[1].to_bytes(4, 'little')
-            bytestream += w.numpy().astype('float32').tobytes()
+    # Every network needs at least an input and an output layer
+    if architecture['depth'] < 2:
+        raise ValueError(f'network depth must be at least 2, got {architecture["depth"]}')
+    if architecture['hidden'] < 1:
+        raise ValueError(f'network hidden size must be at least 1, got {architecture["hidden"]}')
 
-        for b in biases:
-            bytestream += b.shape[0].to_bytes(4, 'little')
-            bytestream += b.numpy().astype('float32').tobytes()
+    return architecture
 
-        return bytestream
+
+def parse_architecture(spec: str) -> dict:
+    # Networks given as backend[:hidden[:depth]], e.g. mlp:48:3
+    parts = spec.split(':')
+    architecture = { 'backend': parts[0] }
+    if len(parts) > 1:
+        architecture['hidden'] = int(parts[1])
+    if len(parts) > 2:
+        architecture['depth'] = int(parts[2])
+
+    return resolve_architecture(architecture)
+
+
+def make_network(ffin: int, architecture: dict) -> nn.Module:
+    constructor, defaults, _ = BACKENDS[architecture['backend']]
+    return constructor(ffin, **{ k: architecture[k] for k in defaults })
 
 
 # Positional encoding
@@ -60,7 +97,8 @@ class NGF:
                  fflevels: int,
                  jittering: bool,
                  normals: bool,
-                 mlp=None) -> None:
+                 mlp=None,
+                 architecture: dict = None) -> None:
         self.points = points
         self.features = features
         self.complexes = complexes
@@ -69,7 +107,8 @@ class NGF:
         self.normals = normals
 
         self.ffin = self.features.shape[-1] + 3 * 2 * self.fflevels
-        self.mlp = MLP(self.ffin).cuda()
+        self.architecture = resolve_architecture(architecture)
+        self.mlp = make_network(self.ffin, self.architecture).to(self.points.device)
         if mlp is not None:
             self.mlp.load_state_dict(mlp.state_dict())
 
@@ -89,6 +128,7 @@ class NGF:
         logging.info(f'     FF levels:    {fflevels}')
         logging.info(f'     Jittering:    {jittering}')
         logging.info(f'     Normals:      {normals}')
+        logging.info(f'     Network:      {self.architecture}')
 
     # List of parameters
     def parameters(self):
@@ -128,8 +168,8 @@ class NGF:
         if rate in self.uv_cache:
             return self.uv_cache[rate]
 
-        U = torch.linspace(0.0, 1.0, steps=rate, device='cuda')
-        V = torch.linspace(0.0, 1.0, steps=rate, device='cuda')
+        U = torch.linspace(0.0, 1.0, steps=rate, device=self.points.device)
+        V = torch.linspace(0.0, 1.0, steps=rate, device=self.points.device)
         U, V = torch.meshgrid(U, V, indexing='ij')
 
         U, V = U.reshape(-1), V.reshape(-1)
@@ -153,8 +193,8 @@ class NGF:
 
         delta = 0.45/(rate - 1)
 
-        rtheta = 2 * np.pi * torch.rand(*U.shape, device='cuda')
-        rr = torch.rand(*U.shape, device='cuda').sqrt()
+        rtheta = 2 * np.pi * torch.rand(*U.shape, device=U.device)
+        rr = torch.rand(*U.shape, device=U.device).sqrt()
         ru = delta * rr * rtheta.cos() * UV_interior
         rv = delta * rr * rtheta.sin() * UV_interior
 
@@ -170,13 +210,24 @@ class NGF:
             'jittering': self.jittering,
             'normals': self.normals,
             'model': self.mlp,
+            'architecture': self.architecture,
         }, filename)
 
+    # Binary format version, written as a magic word before the sizes
+    MAGIC = b'NGF1'
+
     def stream(self):
         """Convert neural geometry field to byte stream"""
         sizes = [self.complexes.shape[0], self.points.shape[0], self.features.shape[-1]]
         size_bytes = np.array(sizes, dtype=np.int32).tobytes()
 
+        # The network layout follows: activation code, layer count, hidden width and the sine frequency
+        linears = self.mlp.linears()
+        activation = BACKENDS[self.architecture['backend']][2]
+        layout = [activation, len(linears), linears[0].out_features]
+        layout_bytes = np.array(layout, dtype=np.int32).tobytes()
+        layout_bytes += np.array([getattr(self.mlp, 'omega', 30.0)], dtype=np.float32).tobytes()
+
         with torch.no_grad():
             points_bytes = self.points.cpu().numpy().tobytes()
             features_bytes = self.features.cpu().numpy().tobytes()
@@ -184,10 +235,12 @@ class NGF:
 
         mlp_bytes = self.mlp.stream()
 
-        return size_bytes + points_bytes + features_bytes + complexes_bytes + mlp_bytes
+        return NGF.MAGIC + size_bytes + layout_bytes + points_bytes + features_bytes + complexes_bytes + mlp_bytes
 
     @staticmethod
-    def from_base(path: str, normalizer: Callable, features: int, config: dict = dict()) -> NGF:
+    def from_base(path: str, normalizer: Callable, features: int, config: dict = None) -> NGF:
+        config = dict() if config is None else config
+
         mesh = meshio.read(path)
         points = torch.from_numpy(mesh.points)
         complexes = torch.from_numpy(mesh.cells_dict['quad'])
@@ -202,15 +255,52 @@ class NGF:
         return NGF(points, features, complexes,
                    config.setdefault('fflevels', 8),
                    config.setdefault('jittering', True),
-                   config.setdefault('normals', True))
+                   config.setdefault('normals', True),
+                   architecture=config.get('architecture'))
 
     @staticmethod
     def from_pt(path: str) -> NGF:
         data = torch.load(path)
-        return NGF(data['points'],
-                   data['features'],
-                   data['complexes'],
-                   data['fflevels'],
-                   data['jittering'],
-                   data['normals'],
-                   mlp=data['model'])
+
+        # Per-patch texel grids are stored as (complexes, res x, res y, channels)
+        kind = TexturedNGF if data['features'].dim() == 4 else NGF
+        return kind(data['points'],
+                    data['features'],
+                    data['complexes'],
+                    data['fflevels'],
+                    data['jittering'],
+                    data['normals'],
+                    mlp=data['model'],
+                    architecture=data.get('architecture'))
+
+
+class TexturedNGF(NGF):
+    """Neural geometry field whose features are bilinear lookups into per-patch texel grids"""
+    def __init__(self,
+                 points: torch.Tensor,
+                 textures: torch.Tensor,
+                 complexes: torch.Tensor,
+                 fflevels: int,
+                 jittering: bool,
+                 normals: bool,
+                 mlp=None,
+                 architecture: dict = None) -> None:
+        assert textures.dim() == 4 and textures.shape[0] == complexes.shape[0]
+        super().__init__(points, textures, complexes, fflevels, jittering, normals, mlp, architecture)
+        logging.info(f'     Texture size: {textures.shape[1]} x {textures.shape[2]}')
+
+    def eval(self, *uvs):
+        lp = NGF.interpolate(self.points, self.complexes, *uvs)
+        lf = texture_fetch(self.features, *uvs)
+        lin = positional_encoding(lp, [lf], self.fflevels)
+        return lp + self.mlp(lin)
+
+    @staticmethod
+    def from_base(path: str, normalizer: Callable, channels: int, resolution: int, config: dict = None) -> TexturedNGF:
+        ngf = NGF.from_base(path, normalizer, channels, config)
+
+        textures = torch.zeros((ngf.complexes.shape[0], resolution, resolution, channels), device=ngf.points.device)
+        textures.requires_grad = True
+
+        return TexturedNGF(ngf.points, textures, ngf.complexes, ngf.fflevels, ngf.jittering, ngf.normals,
+                           architecture=ngf.architecture)
@@ -26,56 +26,74 @@ COLOR_WHEEL = [
         np.array([0.880, 0.320, 0.530])
 ]
 
+def boundary_ring(rate):
+    # Boundary samples of a patch in order around it, without repeated corners
+    j = np.arange(rate)
+    return np.concatenate([
+        j,
+        j[1:] * rate + rate - 1,
+        (rate - 1) * rate + j[::-1][1:],
+        j[::-1][1:-1] * rate,
+    ])
+
+def patch_geometry(ngf, rate):
+    # Every patch as one mesh, with face colors by patch and one curve network of boundaries
+    with torch.no_grad():
+        V = ngf.eval(*ngf.sample_uniform(rate))
+
+    count = ngf.complexes.shape[0]
+    F = ngfutil.triangulate_shorted(V, count, rate)
+    V = V.cpu().numpy()
+
+    patch = np.repeat(np.arange(count), (rate - 1) ** 2)
+    colors = np.array(COLOR_WHEEL)[patch % len(COLOR_WHEEL)]
+
+    ring = boundary_ring(rate)
+    length = ring.shape[0]
+
+    nodes = (ring[None] + rate * rate * np.arange(count)[:, None]).reshape(-1)
+    local = np.stack([ np.arange(length), (np.arange(length) + 1) % length ], axis=-1)
+    edges = (local[None] + length * np.arange(count)[:, None, None]).reshape(-1, 2)
+
+    return {
+        'vertices': V,
+        'triangles': F.cpu().numpy(),
+        'quads': quadify(count, rate),
+        'colors': colors,
+        'nodes': V[nodes],
+        'edges': edges,
+    }
+
+def register_patches(name, geometry):
+    p = ps.register_surface_mesh(name, geometry['vertices'], geometry['quads'])
+    p.set_material('wax')
+    p.add_color_quantity('patch', geometry['colors'], defined_on='faces', enabled=True)
+
+    c = ps.register_curve_network(name + '-boundaries', geometry['nodes'], geometry['edges'])
+    c.set_color([0, 0, 0])
+    c.set_radius(0.0025)
+
+    return p
+
 def preview_single(ngf, refs):
     mode = list(refs.keys())[0] if (len(refs) > 0) else 'ngf'
+
+    # Evaluations are kept per rate, so that revisiting a rate only redraws
+    cache = {}
+    def geometry(rate):
+        if rate not in cache:
+            cache[rate] = patch_geometry(ngf, rate)
+        return cache[rate]
+
     def draw(rate, patches):
         ps.remove_all_structures()
 
         if ngf is not None and mode == 'ngf':
-            sample = ngf.sample_uniform(rate)
-            V = ngf.eval(*sample).detach()
-
+            g = geometry(rate)
             if patches:
-                complex_count = ngf.complexes.shape[0]
-                V = V.reshape(complex_count, -1, 3).cpu()
-                Q = quadify(1, rate)
-                for i, patch in enumerate(V):
-                    p = ps.register_surface_mesh('patch-%d' % i, patch, Q)
-                    p.set_material('wax')
-                    # p.set_smooth_shade(True)
-
-                    color = COLOR_WHEEL[i % len(COLOR_WHEEL)]
-                    p.set_color(color)
-
-                    # Get boundary vertices in order
-                    boundary = []
-
-                    for j in range(rate):
-                        boundary.append(patch[j])
-
-                    for j in range(rate):
-                        boundary.append(patch[j * rate + rate - 1])
-
-                    for j in range(rate - 1, -1, -1):
-                        boundary.append(patch[(rate - 1) * rate + j])
-
-                    for j in range(rate - 1, -1, -1):
-                        boundary.append(patch[j * rate])
-
-                    indices = []
-                    for j in range(len(boundary)):
-                        nj = (j + 1) % len(boundary)
-                        indices.append((j, nj))
-
-                    boundary = torch.stack(boundary, dim=0).numpy()
-                    indices = np.array(indices)
-
-                    c = ps.register_curve_network('boundary-%d' % i, boundary, indices)
-                    c.set_color([0, 0, 0])
-                    c.set_radius(0.0025)
+                register_patches('patches', g)
             else:
-                F = ngfutil.triangulate_shorted(V, ngf.complexes.shape[0], rate)
-                m = ps.register_surface_mesh('ngf', V.cpu().numpy(), F.cpu().numpy())
+                m = ps.register_surface_mesh('ngf', g['vertices'], g['triangles'])
                 m.set_color([0.5, 0.5, 1.0])
                 m.set_material('wax')
 
@@ -135,29 +153,61 @@ def preview_single(ngf, refs):
     ps.show()
 
 def density_metrics(V, F):
-    adj = [ [] for i in range(len(V)) ]
-    for f in F:
-        for i in range(3):
-            a, b = f[i], f[(i + 1) % 3]
-            adj[a].append(b)
-            adj[b].append(a)
-
-    min_distances = [ 0 for i in range(len(adj)) ]
-    for i in range(len(adj)):
-        vs = V[adj[i]]
-        if len(vs) == 0:
-            continue
-        Vi = V[i]
-        md = np.min(np.linalg.norm(Vi - vs, axis=-1))
-        min_distances[i] = md
-
-    return np.array(min_distances)
+    # Edge length statistics per vertex and area statistics per face, on the device of the inputs
+    V = torch.as_tensor(V)
+    F = torch.as_tensor(F, device=V.device).long()
+    count = V.shape[0]
+
+    # Unique undirected edges
+    E = F[:, [ 0, 1, 1, 2, 2, 0 ]].reshape(-1, 2)
+    E = torch.sort(E, dim=-1)[0]
+    keys = torch.unique(E[:, 0] * count + E[:, 1])
+    a, b = keys // count, keys % count
+
+    lengths = (V[a] - V[b]).norm(dim=-1)
+    index = torch.cat([ a, b ])
+    values = torch.cat([ lengths, lengths ])
+
+    # Isolated vertices are left at zero
+    def segment(reduce):
+        out = torch.zeros(count, dtype=lengths.dtype, device=V.device)
+        return out.scatter_reduce(0, index, values, reduce, include_self=False)
+
+    v0, v1, v2 = V[F[:, 0]], V[F[:, 1]], V[F[:, 2]]
+    areas = 0.5 * torch.cross(v1 - v0, v2 - v0, dim=-1).norm(dim=-1)
+
+    return {
+        'min': segment('amin'),
+        'mean': segment('mean'),
+        'max': segment('amax'),
+        'area': areas,
+        'area_stats': {
+            'min': areas.min().item(),
+            'mean': areas.mean().item(),
+            'max': areas.max().item(),
+            'std': areas.std().item(),
+        },
+    }
 
 def preview_many(many, refs):
     current = list(refs.keys())[0] if (len(refs) > 0) else None
     if current is None:
         list(many.keys())[0]
 
+    cache = {}
+    def evaluate(f, ngf, rate):
+        if (f, rate) not in cache:
+            uvs = ngf.sample_uniform(rate)
+            base = ngf.base(rate)
+            cmap = make_cmap(ngf.complexes, ngf.points.detach(), base, rate)
+            remap = ngfutil.generate_remapper(ngf.complexes.cpu(), cmap, base.shape[0], rate)
+            V = ngf.eval(*uvs).detach()
+            indices = ngfutil.triangulate_shorted(V, ngf.complexes.shape[0], rate)
+            F = remap.remap_device(indices)
+            cache[(f, rate)] = V.cpu().numpy(), F.cpu().numpy()
+
+        return cache[(f, rate)]
+
     def draw(rate):
         ps.remove_all_structures()
         ps.set_ground_plane_mode('shadow_only')
@@ -174,19 +224,12 @@ def preview_many(many, refs):
             if current != f:
                 continue
 
-            uvs = ngf.sample_uniform(rate)
-            base = ngf.base(rate)
-            cmap = make_cmap(ngf.complexes, ngf.points.detach(), base, rate)
-            remap = ngfutil.generate_remapper(ngf.complexes.cpu(), cmap, base.shape[0], rate)
-            V = ngf.eval(*uvs).detach()
-            indices = ngfutil.triangulate_shorted(V, ngf.complexes.shape[0], rate)
-            F = remap.remap_device(indices)
-            V, F = V.cpu().numpy(), F.cpu().numpy()
+            V, F = evaluate(f, ngf, rate)
             m = ps.register_surface_mesh(f, V, F)
             # m.set_smooth_shade(True)
             m.set_color([0.5, 0.5, 1.0])
             m.set_material('wax')
-            # D = density_metrics(V, F)
+            # D = density_metrics(V, F)['min'].numpy()
             # print('Distance metrics', np.sum(D), np.var(D))
             # D = 1/(0.1 + D)
             # m.add_scalar_quantity('area', D, defined_on='vertices', cmap='jet', enabled=True)
@@ -231,57 +274,23 @@ def preview_many(many, refs):
 
 def preview_lods(lods):
     current = list(lods.keys())[0]
-    def draw(rate, patches):
-        ps.remove_all_structures()
-
-        for name, ngf in lods.items():
-            if current != name:
-                continue
-
-            V = ngf.eval(rate).detach().cpu()
 
-            complex_count = ngf.complexes.shape[0]
-            V = V.reshape(complex_count, -1, 3)
+    cache = {}
+    def geometry(name, rate):
+        if (name, rate) not in cache:
+            cache[(name, rate)] = patch_geometry(lods[name], rate)
+        return cache[(name, rate)]
 
-            # Q = quadify(1, rate)
-            for i, patch in enumerate(V):
-
-                p = ps.register_surface_mesh('patch-%d' % i, patch, Q)
-                p.set_material('wax')
-                # p.set_smooth_shade(True)
-
-                if patches:
-                    color = COLOR_WHEEL[i % len(COLOR_WHEEL)]
-                    p.set_color(color)
-
-                    # Get boundary vertices in order
-                    boundary = []
-
-                    for j in range(rate):
-                        boundary.append(patch[j])
-
-                    for j in range(rate):
-                        boundary.append(patch[j * rate + rate - 1])
-
-                    for j in range(rate - 1, -1, -1):
-                        boundary.append(patch[(rate - 1) * rate + j])
-
-                    for j in range(rate - 1, -1, -1):
-                        boundary.append(patch[j * rate])
-
-                    indices = []
-                    for j in range(len(boundary)):
-                        nj = (j + 1) % len(boundary)
-                        indices.append((j, nj))
-
-                    boundary = torch.stack(boundary, dim=0).numpy()
-                    indices = np.array(indices)
+    def draw(rate, patches):
+        ps.remove_all_structures()
 
-                    c = ps.register_curve_network('boundary-%d' % i, boundary, indices)
-                    c.set_color([0, 0, 0])
-                    c.set_radius(0.0025)
-                else:
-                    p.set_color([0.6, 0.5, 0.9])
+        g = geometry(current, rate)
+        if patches:
+            register_patches(current, g)
+        else:
+            p = ps.register_surface_mesh(current, g['vertices'], g['quads'])
+            p.set_material('wax')
+            p.set_color([0.6, 0.5, 0.9])
 
     ps.init()
 
@@ -2,14 +2,19 @@ import os
 import torch
 import logging
 import numpy as np
-import nvdiffrast.torch as dr
+import torchrast
+
+try:
+    import nvdiffrast.torch as dr
+except ImportError:
+    dr = None
 
 
 class SphericalHarmonics:
     def __init__(self, envmap):
         h, w = envmap.shape[:2]
-        theta = (torch.linspace(0, np.pi, h, device='cuda')).repeat(w, 1).t()
-        phi = (torch.linspace(3*np.pi, np.pi, w, device='cuda')).repeat(h, 1)
+        theta = (torch.linspace(0, np.pi, h, device=envmap.device)).repeat(w, 1).t()
+        phi = (torch.linspace(3*np.pi, np.pi, w, device=envmap.device)).repeat(h, 1)
 
         sin_theta = torch.sin(theta)
         x = sin_theta * torch.cos(phi)
@@ -67,7 +72,7 @@ class Renderer:
     ENVIRONMENT = os.path.join(os.path.dirname(__file__), os.path.pardir, 'resources', 'environment.hdr')
 
     @staticmethod
-    def projection(fov: float, ar: float, near: float, far: float) -> torch.Tensor:
+    def projection(fov: float, ar: float, near: float, far: float, device: str = 'cuda') -> torch.Tensor:
         fov_rad = np.deg2rad(fov)
         proj_mat = np.array([
             [-1.0 / np.tan(fov_rad / 2.0), 0, 0, 0],
@@ -76,61 +81,83 @@ class Renderer:
             [0, 0, 1, 0]
         ])
 
-        return torch.tensor(proj_mat, device='cuda', dtype=torch.float32)
+        return torch.tensor(proj_mat, device=device, dtype=torch.float32)
 
     def __init__(self,
                  width: int = 256,
                  height: int = 256,
                  fov: float = 45.0,
                  near:float = 0.1,
-                 far: float = 1000.0) -> None:
+                 far: float = 1000.0,
+                 backend: str = 'cuda',
+                 device: str = None) -> None:
+        assert backend in [ 'cuda', 'torch' ]
+
+        # The torch backend runs wherever its inputs are (e.g. on CPU only machines)
+        if backend == 'cuda':
+            assert dr is not None, 'nvdiffrast is required for the cuda backend'
+            self.dr = dr
+            self.device = device or 'cuda'
+            self.ctx = dr.RasterizeCudaContext()
+        else:
+            self.dr = torchrast
+            self.device = device or 'cpu'
+            self.ctx = torchrast.RasterizeTorchContext(self.device)
+
+        self.backend = backend
         self.res = (height, width)
-        self.proj = Renderer.projection(fov, width/height, near, far)
-        self.ctx = dr.RasterizeCudaContext()
+        self.proj = Renderer.projection(fov, width/height, near, far, self.device)
 
         import imageio
         environment = imageio.v2.imread(Renderer.ENVIRONMENT, format='HDR')
-        environment = torch.tensor(environment, dtype=torch.float32, device='cuda')
-        alpha = torch.ones((*environment.shape[:2], 1), dtype=torch.float32, device='cuda')
+        environment = torch.tensor(environment, dtype=torch.float32, device=self.device)
+        alpha = torch.ones((*environment.shape[:2], 1), dtype=torch.float32, device=self.device)
         environment = torch.cat((environment, alpha), dim=-1)
         self.sh = SphericalHarmonics(environment)
 
-    def render(self, v: torch.Tensor, n: torch.Tensor, f: torch.Tensor, views: torch.Tensor) -> torch.Tensor:
+    def render(self,
+               v: torch.Tensor,
+               n: torch.Tensor,
+               f: torch.Tensor,
+               views: torch.Tensor,
+               resolution: int = None,
+               layers: int = 3) -> torch.Tensor:
+        res = self.res if resolution is None else (resolution, resolution)
+
         mvps = self.proj @ views
         v_hom = torch.nn.functional.pad(v, (0, 1), 'constant', 1.0)
         v_ndc = torch.matmul(v_hom, mvps.transpose(1, 2))
 
-        layers = []
-        with dr.DepthPeeler(self.ctx, v_ndc, f, self.res) as peeler:
-            for i in range(3):
-                rast, rast_db = peeler.rasterize_next_layer()
-                normals = dr.interpolate(n, rast, f)[0]
-                normals = dr.antialias(normals, rast, v_ndc, f)
+        # Normals and positions share a single interpolation and antialiasing pass
+        attributes = torch.cat((n, v), dim=-1).contiguous()
 
-                vertices = dr.interpolate(v, rast, f)[0]
-                vertices = dr.antialias(vertices, rast, v_ndc, f)
-
-                layers += [normals, vertices]
+        images = []
+        with self.dr.DepthPeeler(self.ctx, v_ndc, f, res) as peeler:
+            for i in range(layers):
+                rast, rast_db = peeler.rasterize_next_layer()
+                image = self.dr.interpolate(attributes, rast, f)[0]
+                image = self.dr.antialias(image, rast, v_ndc, f)
+                images.append(image)
 
-        return torch.concat(layers, dim=-1)
+        return torch.concat(images, dim=-1)
 
     def shaded(self, v, n, f, view_mats) -> torch.Tensor:
         mvps = self.proj @ view_mats
         v_hom = torch.nn.functional.pad(v, (0, 1), 'constant', 1.0)
         v_ndc = torch.matmul(v_hom, mvps.transpose(1, 2))
-        rast = dr.rasterize(self.ctx, v_ndc, f, self.res)[0]
-        n = dr.interpolate(n, rast, f)[0]
+        rast = self.dr.rasterize(self.ctx, v_ndc, f, self.res)[0]
+        n = self.dr.interpolate(n, rast, f)[0]
         color = self.sh.eval(n).contiguous().abs()
         assert not color.isnan().any()
         assert not (color < 0).any()
         color = (color/1e3).pow(1/2.2)
         assert not color.isnan().any()
-        return dr.antialias(color, rast, v_ndc, f)
+        return self.dr.antialias(color, rast, v_ndc, f)
 
     @torch.no_grad()
     def interpolate(self, v, a, f, view_mats) -> torch.Tensor:
         mvps = self.proj @ view_mats
         v_hom = torch.nn.functional.pad(v, (0, 1), 'constant', 1.0)
         v_ndc = torch.matmul(v_hom, mvps.transpose(1, 2))
-        rast = dr.rasterize(self.ctx, v_ndc, f, self.res)[0]
-        return dr.interpolate(a, rast, f)[0]
+        rast = self.dr.rasterize(self.ctx, v_ndc, f, self.res)[0]
+        return self.dr.interpolate(a, rast, f)[0]
@@ -0,0 +1,340 @@
+import os
+import time
+import sqlite3
+import logging
+import argparse
+import traceback
+import contextlib
+import multiprocessing
+
+from typing import Optional
+from multiprocessing.connection import wait
+
+
+class JobQueue:
+    # Each job moves through these stages in order
+    STAGES = ['quadrangulate', 'train', 'export']
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with self.transaction() as db:
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+                    mesh      TEXT NOT NULL,
+                    lod       INTEGER NOT NULL,
+                    features  INTEGER NOT NULL,
+                    batch     INTEGER NOT NULL,
+                    status    TEXT NOT NULL DEFAULT 'pending',
+                    stage     TEXT NOT NULL DEFAULT 'quadrangulate',
+                    attempts  INTEGER NOT NULL DEFAULT 0,
+                    retries   INTEGER NOT NULL DEFAULT 2,
+                    worker    TEXT,
+                    error     TEXT,
+                    output    TEXT,
+                    created   REAL NOT NULL,
+                    updated   REAL NOT NULL
+                )
+            ''')
+
+    @contextlib.contextmanager
+    def transaction(self):
+        # Short-lived connections so that every worker process can share the file
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        db.execute('PRAGMA journal_mode=WAL')
+
+        try:
+            db.execute('BEGIN IMMEDIATE')
+            yield db
+            db.execute('COMMIT')
+        except BaseException:
+            if db.in_transaction:
+                db.execute('ROLLBACK')
+            raise
+        finally:
+            db.close()
+
+    def submit(self, mesh: str, lod: int, features: int, batch: int, retries: int = 2) -> int:
+        now = time.time()
+        with self.transaction() as db:
+            cursor = db.execute('''
+                INSERT INTO jobs (mesh, lod, features, batch, retries, created, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (os.path.abspath(mesh), lod, features, batch, retries, now, now))
+
+            return cursor.lastrowid
+
+    def claim(self, worker: str, stages: list[str] = STAGES) -> Optional[dict]:
+        # Jobs further along (e.g. already partitioned) are preferred
+        with self.transaction() as db:
+            row = db.execute(f'''
+                SELECT * FROM jobs WHERE status = 'pending' AND stage IN ({', '.join('?' * len(stages))})
+                ORDER BY stage = 'quadrangulate', id LIMIT 1
+            ''', stages).fetchone()
+
+            if row is None:
+                return None
+
+            db.execute('''
+                UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, updated = ?
+                WHERE id = ?
+            ''', (worker, time.time(), row['id']))
+
+            # Attempts include this claim
+            job = dict(row)
+            job['attempts'] += 1
+            return job
+
+    def advance(self, id: int, stage: str) -> None:
+        assert stage in JobQueue.STAGES
+        with self.transaction() as db:
+            db.execute('UPDATE jobs SET stage = ?, updated = ? WHERE id = ?', (stage, time.time(), id))
+
+    def handoff(self, id: int, stage: str) -> None:
+        # Returns the job to the queue for another kind of worker
+        assert stage in JobQueue.STAGES
+        with self.transaction() as db:
+            db.execute('''
+                UPDATE jobs SET status = 'pending', stage = ?, attempts = attempts - 1, updated = ?
+                WHERE id = ?
+            ''', (stage, time.time(), id))
+
+    def complete(self, id: int, output: str) -> None:
+        with self.transaction() as db:
+            db.execute('''
+                UPDATE jobs SET status = 'done', error = NULL, output = ?, updated = ?
+                WHERE id = ?
+            ''', (output, time.time(), id))
+
+    def fail(self, id: int, error: str) -> None:
+        # Requeue the job until its retries are exhausted
+        with self.transaction() as db:
+            db.execute('''
+                UPDATE jobs SET status = CASE WHEN attempts > retries THEN 'failed' ELSE 'pending' END,
+                                error = ?, updated = ?
+                WHERE id = ?
+            ''', (error, time.time(), id))
+
+    def release(self, worker: str, error: str) -> None:
+        # Jobs held by a worker which died without reporting back
+        with self.transaction() as db:
+            rows = db.execute('''
+                SELECT id FROM jobs WHERE status = 'running' AND worker = ?
+            ''', (worker,)).fetchall()
+
+        for row in rows:
+            self.fail(row['id'], error)
+
+    def recover(self) -> None:
+        # Jobs left running by a previous (interrupted) service
+        with self.transaction() as db:
+            db.execute('''
+                UPDATE jobs SET status = 'pending', updated = ? WHERE status = 'running'
+            ''', (time.time(),))
+
+    def pending(self) -> int:
+        with self.transaction() as db:
+            return db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'pending'").fetchone()[0]
+
+    def partitioning(self) -> int:
+        with self.transaction() as db:
+            return db.execute('''
+                SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running') AND stage = 'quadrangulate'
+            ''').fetchone()[0]
+
+    def jobs(self) -> list[dict]:
+        with self.transaction() as db:
+            return [ dict(row) for row in db.execute('SELECT * FROM jobs ORDER BY id') ]
+
+
+def process(queue: JobQueue, job: dict) -> str:
+    from train import Trainer
+    from util import Exporter
+
+    mesh, lod, features = job['mesh'], job['lod'], job['features']
+    exporter = Exporter(mesh, lod, features)
+
+    # Stages completed by a previous attempt are not repeated
+    if job['stage'] == 'quadrangulate':
+        if not Trainer.quadrangulate(mesh, lod, exporter.partitioned()):
+            raise RuntimeError(f'Failed to quadrangulate {mesh}')
+
+        queue.advance(job['id'], 'train')
+
+    # Retried jobs continue from their last checkpoint
+    trainer = Trainer(mesh, lod, features, job['batch'], partition=False, resume=job['attempts'] > 1)
+    trainer.run()
+
+    queue.advance(job['id'], 'export')
+    trainer.export()
+
+    return os.path.abspath(exporter.metadata())
+
+
+def partition(path: str, name: str) -> None:
+    # Partitioning is CPU only, and runs ahead of the training workers
+    os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+    from train import Trainer
+    from util import Exporter
+
+    logging.basicConfig(format=f'%(asctime)s {name:>12} %(levelname)-8s %(message)s',
+                        level=logging.INFO,
+                        datefmt='%H:%M:%S')
+
+    queue = JobQueue(path)
+    while (job := queue.claim(name, ['quadrangulate'])) is not None:
+        logging.info(f'Partitioning job {job["id"]} ({job["mesh"]})')
+
+        try:
+            exporter = Exporter(job['mesh'], job['lod'], job['features'])
+            if not Trainer.quadrangulate(job['mesh'], job['lod'], exporter.partitioned()):
+                raise RuntimeError(f'Failed to quadrangulate {job["mesh"]}')
+
+            queue.handoff(job['id'], 'train')
+        except Exception:
+            logging.error(f'Job {job["id"]} failed (attempt {job["attempts"]})')
+            queue.fail(job['id'], traceback.format_exc())
+
+
+def work(path: str, name: str, device: int, threads: int, stages: list[str]) -> None:
+    # Restrict the worker to its own device before CUDA is initialized
+    os.environ['CUDA_VISIBLE_DEVICES'] = str(device)
+
+    import torch
+    import matplotlib
+
+    matplotlib.use('Agg')
+    torch.set_num_threads(threads)
+
+    logging.basicConfig(format=f'%(asctime)s {name:>12} %(levelname)-8s %(message)s',
+                        level=logging.INFO,
+                        datefmt='%H:%M:%S')
+
+    queue = JobQueue(path)
+    while True:
+        job = queue.claim(name, stages)
+        if job is None:
+            # Wait for partitioners to hand over their remaining jobs
+            if 'quadrangulate' not in stages and queue.partitioning() > 0:
+                time.sleep(5)
+                continue
+
+            break
+
+        logging.info(f'Claimed job {job["id"]} ({job["mesh"]}) at stage {job["stage"]}')
+
+        try:
+            output = process(queue, job)
+            queue.complete(job['id'], output)
+            logging.info(f'Completed job {job["id"]}')
+        except Exception:
+            logging.error(f'Job {job["id"]} failed (attempt {job["attempts"]})')
+            queue.fail(job['id'], traceback.format_exc())
+        finally:
+            torch.cuda.empty_cache()
+
+    logging.info('No pending jobs remaining')
+
+
+def serve(path: str, devices: list[int], per_device: int, threads: int, partitioners: int) -> None:
+    queue = JobQueue(path)
+    queue.recover()
+
+    ctx = multiprocessing.get_context('spawn')
+
+    # Training workers only partition themselves if no one else does
+    stages = JobQueue.STAGES if partitioners == 0 else ['train', 'export']
+
+    budgets = {}
+    for device in devices:
+        for k in range(per_device):
+            budgets[f'gpu{device}-w{k}'] = (work, (device, threads, stages))
+
+    for k in range(partitioners):
+        budgets[f'cpu-p{k}'] = (partition, ())
+
+    def spawn(name):
+        target, args = budgets[name]
+        proc = ctx.Process(target=target, args=(path, name, *args), name=name)
+        proc.start()
+        return proc
+
+    logging.info(f'Launching {len(devices) * per_device} workers ({threads} threads each) on devices {devices}')
+    logging.info(f'Launching {partitioners} partitioners')
+
+    workers = { name: spawn(name) for name in budgets }
+    while workers:
+        finished = wait([ proc.sentinel for proc in workers.values() ])
+        for name, proc in list(workers.items()):
+            if proc.sentinel not in finished:
+                continue
+
+            proc.join()
+            del workers[name]
+
+            if proc.exitcode == 0:
+                continue
+
+            # Crashed workers (e.g. out of memory) are replaced while work remains
+            logging.error(f'Worker {name} exited with code {proc.exitcode}')
+            queue.release(name, f'Worker {name} exited with code {proc.exitcode}')
+            if queue.pending() > 0:
+                workers[name] = spawn(name)
+
+    logging.info('Finished processing the queue')
+
+
+def status(path: str) -> None:
+    queue = JobQueue(path)
+
+    print(f'{"ID":>4}  {"STATUS":<8}  {"STAGE":<14}  {"TRIES":>5}  MESH')
+    for job in queue.jobs():
+        print(f'{job["id"]:>4}  {job["status"]:<8}  {job["stage"]:<14}  {job["attempts"]:>5}  {job["mesh"]}')
+
+        if job['status'] == 'failed' and job['error']:
+            print('      ' + job['error'].strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s %(levelname)-8s %(message)s',
+                        level=logging.INFO,
+                        datefmt='%H:%M:%S')
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--queue', type=str, default=os.path.join('results', 'queue.db'), help='Job queue database')
+
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    submit_parser = subparsers.add_parser('submit', help='Queue meshes for training')
+    submit_parser.add_argument('meshes', type=str, nargs='+', help='Target meshes')
+    submit_parser.add_argument('--lod', type=int, default=2000, help='Number of patches to partition')
+    submit_parser.add_argument('--features', type=int, default=20, help='Feature vector size')
+    submit_parser.add_argument('--batch', type=int, default=10, help='Batch size for training')
+    submit_parser.add_argument('--retries', type=int, default=2, help='Retries before a job is marked as failed')
+
+    run_parser = subparsers.add_parser('run', help='Process the queue with a pool of workers')
+    run_parser.add_argument('--devices', type=int, nargs='+', default=[0], help='CUDA devices to train on')
+    run_parser.add_argument('--workers-per-device', type=int, default=1, help='Concurrent workers per device')
+    run_parser.add_argument('--threads', type=int, default=None, help='CPU threads per worker')
+    run_parser.add_argument('--partitioners', type=int, default=0, help='CPU processes quadrangulating ahead of training')
+
+    subparsers.add_parser('status', help='List jobs in the queue')
+
+    args = parser.parse_args()
+
+    if args.command == 'submit':
+        queue = JobQueue(args.queue)
+        for mesh in args.meshes:
+            assert os.path.exists(mesh), f'Could not find mesh {mesh}'
+            id = queue.submit(mesh, args.lod, args.features, args.batch, args.retries)
+            logging.info(f'Submitted job {id} for {mesh}')
+    elif args.command == 'run':
+        workers = len(args.devices) * args.workers_per_device
+        threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+        serve(args.queue, args.devices, args.workers_per_device, threads, args.partitioners)
+    elif args.command == 'status':
+        status(args.queue)
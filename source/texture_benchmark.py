@@ -0,0 +1,160 @@
+import sys
+import json
+import torch
+import logging
+import argparse
+
+from ngf import NGF, TexturedNGF
+from util import texture_fetch, texture_fetch_torch
+from benchmark import SHAPES, measure
+
+
+def check(device: str) -> dict:
+    # Kernel against the autograd reference, including non-square grids and uvs on the patch borders
+    torch.manual_seed(0)
+
+    textures = torch.randn(16, 5, 3, 7, device=device, requires_grad=True)
+    U = torch.rand(16, 64, device=device)
+    V = torch.rand(16, 64, device=device)
+    U[:, :4], V[:, 4:8] = 0.0, 1.0
+
+    weights = torch.randn(16 * 64, 7, device=device)
+
+    fetched = texture_fetch(textures, U, V)
+    d_kernel, = torch.autograd.grad((fetched * weights).sum(), textures)
+
+    reference = texture_fetch_torch(textures, U, V)
+    d_reference, = torch.autograd.grad((reference * weights).sum(), textures)
+
+    return {
+        'forward': (fetched - reference).abs().max().item(),
+        'backward': (d_kernel - d_reference).abs().max().item(),
+    }
+
+
+def displaced(base: torch.Tensor, amplitude: float, frequency: float) -> torch.Tensor:
+    # Radial bumps over the base surface, finer than any of the base patches
+    bumps = torch.sin(frequency * base).prod(dim=-1, keepdim=True)
+    return base + amplitude * bumps * base / base.norm(dim=-1, keepdim=True)
+
+
+def variants(points: torch.Tensor, complexes: torch.Tensor, features: int, resolutions: list[int], device: str) -> dict:
+    # Texture channels are chosen so that every variant stores (about) as many feature bytes as the per-vertex one
+    budget = points.shape[0] * features
+
+    fields = {}
+
+    vf = torch.zeros(points.shape[0], features, device=device, requires_grad=True)
+    fields[f'vertex f{features}'] = NGF(points.clone().requires_grad_(True), vf, complexes, 8, False, True)
+
+    for r in resolutions:
+        channels = max(1, round(budget / (complexes.shape[0] * r * r)))
+        textures = torch.zeros(complexes.shape[0], r, r, channels, device=device, requires_grad=True)
+        fields[f'texture r{r} c{channels}'] = TexturedNGF(points.clone().requires_grad_(True), textures, complexes, 8, False, True)
+
+    return fields
+
+
+def fit(ngf: NGF, targets: dict, rate: int, eval_rate: int, iterations: int) -> dict:
+    opt = torch.optim.Adam(ngf.parameters(), 1e-3)
+
+    uvs = ngf.sample_uniform(rate)
+    for _ in range(iterations):
+        loss = (ngf.eval(*uvs) - targets[rate]).square().mean()
+
+        opt.zero_grad()
+        loss.backward()
+        opt.step()
+
+    # Quality is measured between the training samples as well
+    with torch.no_grad():
+        error = (ngf.eval(*ngf.sample_uniform(eval_rate)) - targets[eval_rate]).square().mean()
+
+    return {
+        'train': loss.item(),
+        'error': error.item(),
+    }
+
+
+def run(args) -> dict:
+    results = []
+    for shape in args.shapes:
+        torch.manual_seed(0)
+
+        points, complexes = SHAPES[shape](args.patches)
+        points, complexes = points.to(args.device), complexes.to(args.device)
+
+        for features in args.features:
+            fields = variants(points, complexes, features, args.resolutions, args.device)
+
+            # Targets come from the initial base surface, as the fitted points move
+            any_ngf = next(iter(fields.values()))
+            targets = {}
+            for rate in [ args.rate, args.eval_rate ]:
+                with torch.no_grad():
+                    targets[rate] = displaced(any_ngf.base(rate), args.amplitude, args.frequency)
+
+            for name, ngf in fields.items():
+                torch.manual_seed(0)
+                uvs = ngf.sample_uniform(args.rate)
+
+                def forward():
+                    with torch.no_grad():
+                        ngf.eval(*uvs)
+
+                def backward():
+                    ngf.eval(*uvs).square().mean().backward()
+
+                timing = measure(forward, args.device, args.repeats, args.warmup)
+                timing_backward = measure(backward, args.device, args.repeats, args.warmup)
+
+                result = {
+                    'variant': name,
+                    'shape': shape,
+                    'patches': complexes.shape[0],
+                    'bytes': 4 * ngf.features.numel(),
+                    'forward': timing['median'],
+                    'backward': timing_backward['median'],
+                    'samples/s': uvs[0].numel() / (timing['median'] / 1000),
+                    **fit(ngf, targets, args.rate, args.eval_rate, args.iterations),
+                }
+
+                print(f'{shape:<8} {name:<20} {result["bytes"]:10d} B {result["forward"]:8.3f} ms '
+                      f'{result["backward"]:8.3f} ms {result["samples/s"]:12.3e}/s error {result["error"]:.3e}')
+
+                results.append(result)
+
+    return {
+        'device': args.device,
+        'torch': torch.__version__,
+        'check': check(args.device),
+        'results': results,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--device', type=str, default='cuda' if torch.cuda.is_available() else 'cpu', help='Device to benchmark on')
+    parser.add_argument('--shapes', type=str, nargs='+', default=list(SHAPES.keys()), choices=list(SHAPES.keys()), help='Synthetic base meshes')
+    parser.add_argument('--patches', type=int, default=400, help='Approximate patch count')
+    parser.add_argument('--features', type=int, nargs='+', default=[20], help='Per-vertex feature sizes setting the byte budgets')
+    parser.add_argument('--resolutions', type=int, nargs='+', default=[2, 3, 4], help='Texel grid resolutions per patch')
+    parser.add_argument('--rate', type=int, default=8, help='Training sampling rate')
+    parser.add_argument('--eval-rate', type=int, default=15, help='Sampling rate for measuring the fitted error')
+    parser.add_argument('--iterations', type=int, default=1000, help='Fitting iterations')
+    parser.add_argument('--amplitude', type=float, default=0.05, help='Amplitude of the target displacement')
+    parser.add_argument('--frequency', type=float, default=12.0, help='Frequency of the target displacement')
+    parser.add_argument('--repeats', type=int, default=10, help='Timed repetitions')
+    parser.add_argument('--warmup', type=int, default=2, help='Untimed repetitions')
+    parser.add_argument('--output', type=str, default=None, help='JSON file for the results')
+
+    args = parser.parse_args(sys.argv[1:])
+
+    logging.basicConfig(level=logging.WARNING)
+
+    results = run(args)
+    print(f'kernel vs reference: forward {results["check"]["forward"]:.2e}, backward {results["check"]["backward"]:.2e}')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
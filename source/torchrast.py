@@ -0,0 +1,201 @@
+import torch
+
+from typing import Tuple
+
+# A vectorized triangle rasterizer in plain PyTorch, mirroring the subset of the
+# nvdiffrast.torch interface used by the Renderer. Rasterization outputs follow
+# nvdiffrast conventions: (u, v, z/w, triangle + 1) per pixel, zero where empty,
+# with the first image row at y = -1 in normalized device coordinates.
+#
+# Only the forward pass of rasterization is supported; gradients still flow
+# through interpolated attributes, but antialiasing is the identity.
+
+
+class RasterizeTorchContext:
+    def __init__(self, device: str = 'cpu', budget: int = 1 << 22):
+        # Budget bounds the number of (triangle, pixel) pairs processed at once
+        self.device = torch.device(device)
+        self.budget = budget
+
+
+def screen_space(pos: torch.Tensor, tri: torch.Tensor, resolution: Tuple[int, int]):
+    H, W = resolution
+    if pos.dim() == 2:
+        pos = pos.unsqueeze(0)
+
+    B, T = pos.shape[0], tri.shape[0]
+
+    corners = pos[:, tri.long()].reshape(B * T, 3, 4)
+    w = corners[..., 3]
+
+    # Triangles crossing the camera plane are discarded rather than clipped
+    valid = (w > 0).all(dim=-1)
+    w = torch.where(w > 0, w, torch.ones_like(w))
+
+    x = (corners[..., 0] / w * 0.5 + 0.5) * W
+    y = (corners[..., 1] / w * 0.5 + 0.5) * H
+    z = corners[..., 2] / w
+
+    area = (x[:, 1] - x[:, 0]) * (y[:, 2] - y[:, 0]) - (x[:, 2] - x[:, 0]) * (y[:, 1] - y[:, 0])
+    valid &= area != 0
+
+    # Bounding boxes of pixel centers, clamped to the viewport
+    xmin = (x.min(dim=-1)[0] - 0.5).ceil().clamp(min=0).long()
+    xmax = (x.max(dim=-1)[0] - 0.5).floor().clamp(max=W - 1).long()
+    ymin = (y.min(dim=-1)[0] - 0.5).ceil().clamp(min=0).long()
+    ymax = (y.max(dim=-1)[0] - 0.5).floor().clamp(max=H - 1).long()
+
+    width = (xmax - xmin + 1).clamp(min=0)
+    height = (ymax - ymin + 1).clamp(min=0)
+    counts = torch.where(valid, width * height, torch.zeros_like(width))
+
+    return x, y, z, w, area, xmin, ymin, width, counts
+
+
+def rasterize_layer(ctx: RasterizeTorchContext,
+                    pos: torch.Tensor,
+                    tri: torch.Tensor,
+                    resolution: Tuple[int, int],
+                    previous: torch.Tensor = None) -> Tuple[torch.Tensor, torch.Tensor]:
+    # Nearest fragment per pixel, behind the previous layer's depth if given
+    H, W = resolution
+    B = pos.shape[0] if pos.dim() == 3 else 1
+    T = tri.shape[0]
+
+    x, y, z, w, area, xmin, ymin, width, counts = screen_space(pos, tri, resolution)
+
+    pixels = B * H * W
+    depth = torch.full((pixels,), float('inf'), device=pos.device)
+    rast = torch.zeros((pixels, 4), device=pos.device)
+
+    # Chunks of consecutive triangles within the pair budget
+    offsets = torch.cumsum(counts, dim=0)
+    total = offsets[-1].item() if offsets.numel() > 0 else 0
+    bounds = torch.arange(ctx.budget, total + ctx.budget, ctx.budget, device=pos.device)
+    splits = torch.searchsorted(offsets, bounds, right=True).tolist()
+
+    start = 0
+    for end in splits + [ B * T ]:
+        end = max(end, start + 1)
+        if start >= B * T:
+            break
+
+        index = torch.arange(start, min(end, B * T), device=pos.device)
+        start = end
+
+        n = counts[index]
+        if n.sum() == 0:
+            continue
+
+        # Enumerate every (triangle, pixel center) pair in the bounding boxes
+        t = torch.repeat_interleave(index, n)
+        local = torch.arange(t.shape[0], device=pos.device) - torch.repeat_interleave(torch.cumsum(n, 0) - n, n)
+        px = xmin[t] + local % width[t]
+        py = ymin[t] + local // width[t]
+
+        qx = px.float() + 0.5
+        qy = py.float() + 0.5
+
+        tx, ty = x[t], y[t]
+        l0 = ((tx[:, 1] - qx) * (ty[:, 2] - qy) - (tx[:, 2] - qx) * (ty[:, 1] - qy)) / area[t]
+        l1 = ((tx[:, 2] - qx) * (ty[:, 0] - qy) - (tx[:, 0] - qx) * (ty[:, 2] - qy)) / area[t]
+        l2 = 1 - l0 - l1
+
+        fz = l0 * z[t, 0] + l1 * z[t, 1] + l2 * z[t, 2]
+
+        inside = (l0 >= 0) & (l1 >= 0) & (l2 >= 0) & (fz >= -1) & (fz <= 1)
+        if previous is not None:
+            inside &= fz > previous[(t // T) * H * W + py * W + px]
+
+        if not inside.any():
+            continue
+
+        t, px, py, fz = t[inside], px[inside], py[inside], fz[inside]
+        l0, l1, l2 = l0[inside], l1[inside], l2[inside]
+        pixel = (t // T) * H * W + py * W + px
+
+        # Nearest fragment within the chunk, ties broken by triangle index
+        nearest = torch.full((pixels,), float('inf'), device=pos.device)
+        nearest.scatter_reduce_(0, pixel, fz, 'amin')
+
+        front = fz == nearest[pixel]
+        winner = torch.full((pixels,), B * T, device=pos.device, dtype=torch.long)
+        winner.scatter_reduce_(0, pixel[front], t[front], 'amin')
+
+        selected = front & (t == winner[pixel])
+        pixel, t, fz = pixel[selected], t[selected], fz[selected]
+        l0, l1, l2 = l0[selected], l1[selected], l2[selected]
+
+        # Perspective correct barycentrics
+        b0 = l0 / w[t, 0]
+        b1 = l1 / w[t, 1]
+        b2 = l2 / w[t, 2]
+        norm = b0 + b1 + b2
+
+        replace = fz < depth[pixel]
+        pixel = pixel[replace]
+
+        depth[pixel] = fz[replace]
+        rast[pixel] = torch.stack([
+            (b0 / norm)[replace],
+            (b1 / norm)[replace],
+            fz[replace],
+            (t[replace] % T + 1).float()
+        ], dim=-1)
+
+    return rast.reshape(B, H, W, 4), depth
+
+
+def rasterize(ctx: RasterizeTorchContext, pos: torch.Tensor, tri: torch.Tensor, resolution: Tuple[int, int]):
+    with torch.no_grad():
+        rast, _ = rasterize_layer(ctx, pos, tri, resolution)
+
+    return rast, None
+
+
+def interpolate(attr: torch.Tensor, rast: torch.Tensor, tri: torch.Tensor):
+    B, H, W, _ = rast.shape
+
+    ids = rast[..., 3].long() - 1
+    covered = (ids >= 0).unsqueeze(-1)
+
+    corners = tri.long()[ids.clamp(min=0)]
+    u, v = rast[..., 0:1], rast[..., 1:2]
+
+    if attr.dim() == 2:
+        a = attr[corners]
+    else:
+        batch = torch.arange(B, device=attr.device).view(B, 1, 1, 1)
+        a = attr[batch, corners]
+
+    out = u * a[..., 0, :] + v * a[..., 1, :] + (1 - u - v) * a[..., 2, :]
+    out = torch.where(covered, out, torch.zeros_like(out))
+
+    return out, None
+
+
+def antialias(color: torch.Tensor, rast: torch.Tensor, pos: torch.Tensor, tri: torch.Tensor):
+    # Silhouette antialiasing is not implemented
+    return color
+
+
+class DepthPeeler:
+    def __init__(self, ctx: RasterizeTorchContext, pos: torch.Tensor, tri: torch.Tensor, resolution: Tuple[int, int]):
+        self.ctx = ctx
+        self.pos = pos.detach()
+        self.tri = tri
+        self.resolution = resolution
+        self.depth = None
+
+    def __enter__(self):
+        self.depth = None
+        return self
+
+    def __exit__(self, *args):
+        self.depth = None
+
+    @torch.no_grad()
+    def rasterize_next_layer(self):
+        # Pixels without further layers keep an infinite depth, and stay empty
+        rast, self.depth = rasterize_layer(self.ctx, self.pos, self.tri, self.resolution, self.depth)
+        return rast, None
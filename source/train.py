@@ -4,53 +4,121 @@ import tqdm
 import torch
 import logging
 import ngfutil
+import meshio
 import argparse
-import pymeshlab
 import trimesh
-import multiprocessing
+
+from typing import Optional
 
 from util import *
-from ngf import NGF
+from ngf import NGF, TexturedNGF, BACKENDS, resolve_architecture, parse_architecture
 from render import Renderer
+from benchmark import measure
 
 
 class Trainer:
+    # Fraction of the memory budget planned for, leaving room for allocator fragmentation
+    MEMORY_HEADROOM = 0.9
+
+    # Render resolution and depth peeling layers for each rate (coarse to fine)
+    SCHEDULE = {
+        4:  (128, 1),
+        8:  (192, 2),
+        12: (256, 3),
+        16: (256, 3),
+    }
+
     @staticmethod
     def quadrangulate_surface(mesh: str, count: int, destination: str) -> None:
-        ms = pymeshlab.MeshSet()
-        ms.load_new_mesh(mesh)
-        ms.meshing_decimation_quadric_edge_collapse(targetfacenum=count, qualitythr=1.0)
-        ms.meshing_repair_non_manifold_edges()
-        ms.meshing_tri_to_quad_by_smart_triangle_pairing()
-        ms.save_current_mesh(destination)
+        v, f, _ = read_triangles(mesh)
+        v, f = ngfutil.deduplicate(torch.from_numpy(v), torch.from_numpy(f))
+        logging.info(f'Loaded mesh with {f.shape[0]} faces for quadrangulation')
+
+        v, f = ngfutil.decimate(v, f, count)
+        logging.info(f'Decimated mesh to {f.shape[0]} faces')
+
+        quads, triangles = ngfutil.quadrangulate(v, f)
+        logging.info(f'Paired {quads.shape[0]} quadrilaterals, {triangles.shape[0]} triangles remaining')
+
+        cells = [ ('quad', quads.numpy()) ]
+        if triangles.shape[0] > 0:
+            cells.append(('triangle', triangles.numpy()))
+
+        # Renamed once complete so that interrupted runs never leave a cached partition
+        temporary = destination[:-4] + f'.{os.getpid()}.obj'
+        meshio.Mesh(v.numpy(), cells).write(temporary)
+        os.replace(temporary, destination)
         logging.info(f'Quadrangulated mesh into {destination}')
 
-    def __init__(self, mesh: str, lod: int, features: int, batch: int):
+    @staticmethod
+    def quadrangulate(mesh: str, lod: int, destination: str) -> bool:
+        if os.path.exists(destination):
+            logging.info(f'Using cached quadrangulation {destination}')
+            return True
+
+        try:
+            Trainer.quadrangulate_surface(mesh, 2 * lod, destination)
+        except Exception as e:
+            logging.error(f'Quadrangulation failed: {e}')
+            return False
+
+        return True
+
+    def __init__(self,
+                 mesh: str,
+                 lod: int,
+                 features: int,
+                 batch: int,
+                 partition: bool = True,
+                 resume: bool = False,
+                 interval: int = 25,
+                 profile: bool = False,
+                 trace_steps: int = 5,
+                 memory_budget: float = None,
+                 architecture: dict = None):
         # Properties
         self.path = os.path.abspath(mesh)
+        self.lod = lod
+        self.feature_size = features
         self.cameras = 200
         self.batch = batch
+        self.batches = {}
+        self.memory = {}
+        self.memory_budget = None if memory_budget is None else int(memory_budget * 2**30)
+        self.iterations = 100
         self.losses = {}
+        self.distilled = []
 
         logging.info('Launching training process with configuration:')
         logging.info(f'    Reference mesh: {self.path}')
         logging.info(f'    Camera count:   {self.cameras}')
-        logging.info(f'    Batch size:     {self.batch}')
+        logging.info(f'    Batch size:     {self.batch if memory_budget is None else f"automatic ({memory_budget} GB)"}')
 
-        self.exporter = Exporter(mesh, lod, features)
+        self.architecture = resolve_architecture(architecture)
+        logging.info(f'    Network:        {self.architecture}')
 
-        self.target, normalizer = load_mesh(mesh)
-        logging.info(f'Loaded reference mesh {mesh}')
+        self.exporter = Exporter(mesh, lod, features, Trainer.network_name(self.architecture))
+
+        # Checkpoints are named after the mesh file, so they record what they were trained on
+        self.source = {
+            'digest': Exporter.digest(mesh),
+            'lod': lod,
+            'features': features,
+        }
 
-        qargs = (mesh, 2 * lod, self.exporter.partitioned())
-        proc = multiprocessing.Process(target=Trainer.quadrangulate_surface, args=qargs)
-        proc.start()
+        self.interval = interval
+        self.profiler = PhaseProfiler(profile, trace_steps)
+        self.checkpointer = Checkpointer(self.exporter.checkpoint())
+        self.state = self.checkpointer.load() if resume else None
+        if resume and self.state is None:
+            logging.info('No checkpoint found, starting from scratch')
 
-        # Wait for minute before termimating
-        proc.join(60)
-        if proc.is_alive():
-            logging.error('Quadrangulation running overtime')
-            proc.terminate()
+        # Large scans stay on the host, with a coarse proxy for placing cameras
+        self.target, self.proxy, normalizer = load_reference(mesh)
+        logging.info(f'Loaded reference mesh {mesh}')
+
+        # Partitioning may have been done ahead of time (e.g. by a batch worker)
+        if partition and not Trainer.quadrangulate(mesh, lod, self.exporter.partitioned()):
             exit()
 
         self.renderer = Renderer()
@@ -59,40 +127,212 @@ class Trainer:
         self.views = None
         self.reference_views = None
 
-        self.ngf = NGF.from_base(self.exporter.partitioned(), normalizer, features)
+        self.ngf = NGF.from_base(self.exporter.partitioned(), normalizer, features, { 'architecture': self.architecture })
+        if self.state is not None:
+            self.restore()
+        else:
+            self.project()
 
-    def precompute_reference_views(self):
-        vertices = self.target.vertices
-        vertices = vertices[self.target.faces].reshape(-1, 3)
-        faces = torch.arange(vertices.shape[0])
-        faces = faces.int().cuda().reshape(-1, 3)
-        normals = vertex_normals(vertices, faces)
+    @staticmethod
+    def architecture_name(architecture: dict) -> str:
+        return f'{architecture["backend"]}-h{architecture["hidden"]}-d{architecture["depth"]}'
+
+    @staticmethod
+    def network_name(architecture: dict):
+        # Suffix for result names, none for the default network
+        if architecture == resolve_architecture():
+            return None
+
+        return Trainer.architecture_name(architecture)
+
+    def checkpoint(self, optimizer: torch.optim.Optimizer, rate: int, iteration: int, rate_losses: dict[str, list[float]]) -> None:
+        self.checkpointer.save({
+            'points': self.ngf.points,
+            'features': self.ngf.features,
+            'complexes': self.ngf.complexes,
+            'model': self.ngf.mlp.state_dict(),
+            'architecture': self.architecture,
+            'source': self.source,
+            'optimizer': optimizer.state_dict(),
+            'rate': rate,
+            'iteration': iteration,
+            'losses': self.losses,
+            'rate_losses': rate_losses,
+            'views': self.views,
+            'rng': torch.get_rng_state(),
+            'cuda_rng': torch.cuda.get_rng_state(),
+        })
+
+    def project(self) -> None:
+        # Snap the patch corners onto the full resolution reference surface
+        tree = ngfutil.bvh(self.target.vertices, self.target.faces)
+        distances, _, points = tree.closest(self.ngf.points.detach().cpu())
+
+        with torch.no_grad():
+            self.ngf.points.data = points.to(self.ngf.points.device)
+
+        logging.info(f'Projected patch corners onto the reference (mean offset {distances.mean().item():.2e})')
+
+    def restore(self) -> None:
+        if self.state.get('source') != self.source:
+            raise ValueError(f'Checkpoint {self.exporter.checkpoint()} was not trained on this mesh, patch count and feature size')
+
+        saved = resolve_architecture(self.state.get('architecture'))
+        if saved != self.architecture:
+            raise ValueError(f'Checkpoint network {saved} does not match the requested {self.architecture}')
+
+        with torch.no_grad():
+            self.ngf.points.data = self.state['points'].cuda()
+            self.ngf.features.data = self.state['features'].cuda()
+            self.ngf.complexes = self.state['complexes'].cuda()
+            self.ngf.mlp.load_state_dict(self.state['model'])
+
+        logging.info(f'Resuming from rate {self.state["rate"]} at iteration {self.state["iteration"]}')
+
+    def precompute_reference_views(self, resolution: int, layers: int):
+        # Moved to the device only for as long as the references are rendered
+        vertices = self.target.vertices.cuda()
+        faces = self.target.faces.long().cuda()
+        vertices, normals, faces = separate(vertices, faces)
 
         cache = []
         for view in tqdm.tqdm(self.views, ncols=50, leave=False):
-            reference_view = self.renderer.render(vertices, normals, faces, view.unsqueeze(0))
+            reference_view = self.renderer.render(vertices, normals, faces, view.unsqueeze(0), resolution, layers)
             cache.append(reference_view)
 
-        return list(torch.cat(cache).split(self.batch))
-
-    def optimize_resolution(self, optimizer: torch.optim.Optimizer, rate: int) -> dict[str, list[float]]:
-        import numpy as np
+        del vertices, normals, faces
+        torch.cuda.empty_cache()
 
-        losses = {
-            'render': [],
-            'laplacian': []
-        }
+        return torch.cat(cache)
 
+    def prepare(self, rate: int):
+        # Connectivity of the sampled surface at a rate
         base = self.ngf.base(rate).detach()
         cmap = make_cmap(self.ngf.complexes, self.ngf.points.detach(), base, rate)
         remap = ngfutil.generate_remapper(self.ngf.complexes.cpu(), cmap, base.shape[0], rate)
         quads = torch.from_numpy(quadify(self.ngf.complexes.shape[0], rate)).int()
         graph = ngfutil.Graph(remap.remap(quads), base.shape[0])
 
-        batched_views = list(self.views.split(self.batch))
+        return base, quads, remap, graph
+
+    def step_losses(self, rate: int, uvs, uniform_uvs, remap, graph, batch_views: torch.Tensor, ref_views: torch.Tensor):
+        profiler = self.profiler
+
+        with profiler.phase('eval'):
+            vertices = self.ngf.eval(*uvs)
+            uniform_vertices = self.ngf.eval(*uniform_uvs)
+
+        with profiler.phase('triangulate'):
+            faces = ngfutil.triangulate_shorted(vertices, self.ngf.complexes.shape[0], rate)
+
+        with profiler.phase('remap'):
+            faces = remap.remap_device(faces)
+
+        with profiler.phase('separate'):
+            vertices, normals, faces = separate(vertices, faces)
+
+        with profiler.phase('smooth'):
+            smoothed_vertices = graph.smooth(uniform_vertices, 1.0)
+            smoothed_vertices = remap.scatter_device(smoothed_vertices)
+            laplacian_loss = (uniform_vertices - smoothed_vertices).abs().mean()
+
+        with profiler.phase('render'):
+            batch_source_views = self.renderer.render(vertices, normals, faces, batch_views, *Trainer.SCHEDULE[rate])
+
+        with profiler.phase('loss'):
+            render_loss = (ref_views.cuda() - batch_source_views).abs().mean()
+
+        return render_loss, laplacian_loss
+
+    def measure_peak(self, rate: int, batch: int, remap, graph) -> int:
+        # Peak bytes of one training step on a batch of views, leaving the field untouched
+        resolution, layers = Trainer.SCHEDULE[rate]
+        views = self.views[:batch]
+        references = torch.zeros((batch, resolution, resolution, 6 * layers), device='cuda')
+
+        torch.cuda.synchronize()
+        torch.cuda.empty_cache()
+        torch.cuda.reset_peak_memory_stats()
+
+        # Uniform samples have the same footprint as jittered ones, without drawing random numbers
+        uvs = self.ngf.sample_uniform(rate)
+
+        render_loss, laplacian_loss = self.step_losses(rate, uvs, uvs, remap, graph, views, references)
+        (render_loss + laplacian_loss).backward()
+
+        torch.cuda.synchronize()
+        peak = torch.cuda.max_memory_allocated()
+
+        for parameter in self.ngf.parameters():
+            parameter.grad = None
+
+        del references, render_loss, laplacian_loss
+        torch.cuda.empty_cache()
+
+        return peak
+
+    def estimate_memory(self, rate: int) -> dict:
+        # Peaks are affine in the batch size, so two dry runs determine the model
+        resolution, layers = Trainer.SCHEDULE[rate]
+
+        _, _, remap, graph = self.prepare(rate)
+        p1 = self.measure_peak(rate, 1, remap, graph)
+        p2 = self.measure_peak(rate, min(2, self.views.shape[0]), remap, graph)
+
+        # Reference views still resident from the previous rate are already part of the peaks
+        per_view = max(p2 - p1, 1)
+        cache = 0
+        if self.reference_views is None:
+            cache = self.views.shape[0] * resolution * resolution * 6 * layers * 4
+
+        return {
+            'fixed': p1 - per_view + cache,
+            'per_view': per_view,
+            'cache': cache,
+        }
+
+    def select_batch(self, rate: int) -> int:
+        if self.memory_budget is None:
+            return self.batch
+
+        self.profiler.begin('estimate')
+
+        model = self.estimate_memory(rate)
+        budget = Trainer.MEMORY_HEADROOM * self.memory_budget
+        batch = int((budget - model['fixed']) // model['per_view'])
+        if batch < 1:
+            logging.warning(f'A single view at rate {rate} exceeds the memory budget by {(model["fixed"] + model["per_view"] - budget)/2**30:.2f} GB')
+
+        batch = max(1, min(batch, self.views.shape[0]))
+        peak = model['fixed'] + batch * model['per_view']
+
+        self.memory[rate] = { **model, 'batch': batch, 'predicted': peak }
+        logging.info(f'Rate {rate}: {model["fixed"]/2**30:.2f} GB fixed ({model["cache"]/2**30:.2f} GB of references), '
+                     f'{model["per_view"]/2**20:.1f} MB per view, batch {batch} predicted at {peak/2**30:.2f} GB')
+
+        return batch
+
+    def optimize_resolution(self, optimizer: torch.optim.Optimizer, rate: int, start: int = 0, losses: dict = None) -> dict[str, list[float]]:
+        import numpy as np
+
+        losses = losses or {
+            'render': [],
+            'laplacian': []
+        }
+
+        profiler = self.profiler
+
+        with profiler.phase('setup'):
+            base, quads, remap, graph = self.prepare(rate)
+
+        batch = self.batches[rate]
+        batched_views = list(self.views.split(batch))
+        reference_views = list(self.reference_views.split(batch))
         length = average_edge_length(base, quads)
 
-        for _ in tqdm.trange(100, ncols=50, leave=False):
+        torch.cuda.reset_peak_memory_stats()
+
+        for iteration in tqdm.trange(start, self.iterations, ncols=50, leave=False):
             batch_losses = {
                 'render': [],
                 'laplacian': []
@@ -101,27 +341,16 @@ class Trainer:
             uvs = self.ngf.sampler(rate)
             uniform_uvs = self.ngf.sample_uniform(rate)
 
-            for batch_views, ref_views in zip(batched_views, self.reference_views):
-                vertices = self.ngf.eval(*uvs)
-                uniform_vertices = self.ngf.eval(*uniform_uvs)
-
-                faces = ngfutil.triangulate_shorted(vertices, self.ngf.complexes.shape[0], rate)
-                faces = remap.remap_device(faces)
-
-                vertices, normals, faces = separate(vertices, faces)
-
-                smoothed_vertices = graph.smooth(uniform_vertices, 1.0)
-                smoothed_vertices = remap.scatter_device(smoothed_vertices)
-                laplacian_loss = (uniform_vertices - smoothed_vertices).abs().mean()
-
-                batch_source_views = self.renderer.render(vertices, normals, faces, batch_views)
-
-                render_loss = (ref_views.cuda() - batch_source_views).abs().mean()
+            for batch_views, ref_views in zip(batched_views, reference_views):
+                render_loss, laplacian_loss = self.step_losses(rate, uvs, uniform_uvs, remap, graph, batch_views, ref_views)
                 loss = render_loss + laplacian_loss
 
-                optimizer.zero_grad()
-                loss.backward()
-                optimizer.step()
+                with profiler.phase('backward'):
+                    optimizer.zero_grad()
+                    loss.backward()
+
+                with profiler.phase('step'):
+                    optimizer.step()
 
                 batch_losses['render'].append(render_loss.item())
                 batch_losses['laplacian'].append(laplacian_loss.item())
@@ -129,7 +358,15 @@ class Trainer:
             losses['render'].append(np.mean(batch_losses['render']))
             losses['laplacian'].append(np.mean(batch_losses['laplacian']))
 
-        logging.info(f'Optimized neural geometry field at resolution ({rate} x {rate})')
+            if (iteration + 1) % self.interval == 0 or iteration + 1 == self.iterations:
+                with profiler.phase('checkpoint'):
+                    self.checkpoint(optimizer, rate, iteration + 1, losses)
+
+            profiler.step()
+
+        self.memory.setdefault(rate, { 'batch': batch })['peak'] = torch.cuda.max_memory_allocated()
+        logging.info(f'Optimized neural geometry field at resolution ({rate} x {rate}) '
+                     f'with batch {batch}, peak memory {self.memory[rate]["peak"]/2**30:.2f} GB')
 
         return losses
 
@@ -139,31 +376,210 @@ class Trainer:
             'laplacian': []
         }
 
-        self.views = arrange_views(self.target, self.cameras)[0]
-        logging.info(f'Generated {self.cameras} views for reference mesh')
-
-        self.reference_views = self.precompute_reference_views()
-        logging.info('Cached reference views')
+        if self.state is not None:
+            self.losses = self.state['losses']
+            self.views = self.state['views'].cuda()
+            logging.info(f'Restored {self.views.shape[0]} views for reference mesh')
+        else:
+            self.views = arrange_views(self.proxy, self.cameras, occlusion=True)[0]
+            logging.info(f'Generated {self.cameras} views for reference mesh')
 
-        for rate in [4, 8, 12, 16]:
+        schedule = None
+        for rate in Trainer.SCHEDULE:
             opt = torch.optim.Adam(self.ngf.parameters(), 1e-3)
-            rate_losses = self.optimize_resolution(opt, rate)
+
+            start, rate_losses = 0, None
+            if self.state is not None:
+                # Rates completed before the checkpoint are skipped
+                if rate < self.state['rate']:
+                    continue
+
+                opt.load_state_dict(self.state['optimizer'])
+                start, rate_losses = self.state['iteration'], self.state['rate_losses']
+
+                torch.set_rng_state(self.state['rng'])
+                torch.cuda.set_rng_state(self.state['cuda_rng'])
+                self.state = None
+
+            # References are only re-rendered when the schedule moves on
+            rerender = Trainer.SCHEDULE[rate] != schedule
+            if rerender:
+                schedule = Trainer.SCHEDULE[rate]
+                self.reference_views = None
+                torch.cuda.empty_cache()
+
+            self.batches[rate] = self.select_batch(rate)
+            self.profiler.begin(rate, self.exporter.trace(rate))
+
+            if rerender:
+                with self.profiler.phase('reference'):
+                    self.reference_views = self.precompute_reference_views(*schedule)
+
+                logging.info(f'Cached reference views at resolution {schedule[0]} with {schedule[1]} layers')
+
+            rate_losses = self.optimize_resolution(opt, rate, start, rate_losses)
             self.losses['render'] += rate_losses['render']
             self.losses['laplacian'] += rate_losses['laplacian']
             # self.display(rate)
 
+        self.checkpointer.close()
         logging.info('Finished training neural geometry field')
 
+        for rate, memory in self.memory.items():
+            predicted = f'{memory["predicted"]/2**30:.2f} GB' if 'predicted' in memory else 'n/a'
+            logging.info(f'    Rate {rate:2d}: batch {memory["batch"]:3d}, predicted {predicted}, measured {memory.get("peak", 0)/2**30:.2f} GB')
+
+        if self.profiler.enabled:
+            self.profiler.export(self.exporter.profile())
+            logging.info('Time spent per phase and rate:\n' + self.profiler.table())
+            logging.info(f'Exported phase timings to {self.exporter.profile()}')
+
+    @staticmethod
+    def time_eval(ngf: NGF, uvs, repeats: int = 20, warmup: int = 2) -> float:
+        # Median milliseconds of an inference pass over the given samples
+        def forward():
+            with torch.no_grad():
+                ngf.eval(*uvs)
+
+        return measure(forward, ngf.points.device.type, repeats, warmup)['median']
+
+    def render_error(self, ngf: NGF, rate: int) -> float:
+        # Mean render loss against all cached reference views, without jittering
+        _, _, remap, graph = self.prepare(rate)
+        uvs = ngf.sample_uniform(rate)
+
+        teacher, self.ngf = self.ngf, ngf
+        try:
+            losses = []
+            with torch.no_grad():
+                for views, references in zip(self.views.split(self.batches[rate]), self.reference_views.split(self.batches[rate])):
+                    losses.append(self.step_losses(rate, uvs, uvs, remap, graph, views, references)[0].item())
+        finally:
+            self.ngf = teacher
+
+        return sum(losses) / len(losses)
+
+    def distill(self, architecture: dict, steps: int = 2000, samples: int = 256, finetune: int = 10, rate: int = None) -> dict:
+        # Fits a smaller network to the trained field's displacements at dense random uvs,
+        # then briefly fine-tunes it against the reference views of the final rate
+        architecture = resolve_architecture(architecture)
+        name = Trainer.architecture_name(architecture)
+        rate = rate or list(Trainer.SCHEDULE)[-1]
+        logging.info(f'Distilling neural geometry field into {name}')
+
+        teacher = self.ngf
+        student = type(teacher)(teacher.points.detach().clone().requires_grad_(True),
+                                teacher.features.detach().clone().requires_grad_(True),
+                                teacher.complexes,
+                                teacher.fflevels,
+                                teacher.jittering,
+                                teacher.normals,
+                                architecture=architecture)
+
+        # Displacements are matched with the corners and features fixed, so only the network is fit
+        opt = torch.optim.Adam(student.mlp.parameters(), 1e-3)
+        scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(opt, steps)
+
+        shape = (teacher.complexes.shape[0], samples)
+        for _ in tqdm.trange(steps, ncols=50, leave=False):
+            U = torch.rand(shape, device=teacher.points.device)
+            V = torch.rand(shape, device=teacher.points.device)
+
+            with torch.no_grad():
+                target = teacher.eval(U, V)
+
+            loss = (student.eval(U, V) - target).square().mean()
+
+            opt.zero_grad()
+            loss.backward()
+            opt.step()
+            scheduler.step()
+
+        logging.info(f'Matched displacements with mean squared error {loss.item():.3e}')
+
+        # Fine-tuning uses the references still cached from the final rate
+        if finetune > 0:
+            opt = torch.optim.Adam(student.parameters(), 1e-4)
+
+            _, _, remap, graph = self.prepare(rate)
+            batch = self.batches[rate]
+
+            self.ngf = student
+            try:
+                for _ in tqdm.trange(finetune, ncols=50, leave=False):
+                    uvs = student.sampler(rate)
+                    uniform_uvs = student.sample_uniform(rate)
+                    for views, references in zip(self.views.split(batch), self.reference_views.split(batch)):
+                        render_loss, laplacian_loss = self.step_losses(rate, uvs, uniform_uvs, remap, graph, views, references)
+
+                        opt.zero_grad()
+                        (render_loss + laplacian_loss).backward()
+                        opt.step()
+            finally:
+                self.ngf = teacher
+
+        # Geometric error at matching uvs, relative to the extent of the base surface
+        uvs = teacher.sample_uniform(rate)
+        with torch.no_grad():
+            reference = teacher.eval(*uvs)
+            distances = (student.eval(*uvs) - reference).norm(dim=-1)
+            extent = (reference.max(dim=0)[0] - reference.min(dim=0)[0]).norm().item()
+
+        teacher_time = Trainer.time_eval(teacher, uvs)
+        student_time = Trainer.time_eval(student, uvs)
+
+        report = {
+            'network': architecture,
+            'parameters': sum(p.numel() for p in student.mlp.parameters()),
+            'teacher_parameters': sum(p.numel() for p in teacher.mlp.parameters()),
+            'eval_ms': student_time,
+            'teacher_eval_ms': teacher_time,
+            'speedup': teacher_time / student_time,
+            'mean_error': distances.mean().item() / extent,
+            'max_error': distances.max().item() / extent,
+            'render_error': self.render_error(student, rate),
+            'teacher_render_error': self.render_error(teacher, rate),
+        }
+
+        # Exported next to the trained field, with the teacher's and the student's networks in the name
+        teacher_name = Trainer.network_name(self.architecture)
+        suffix = '-'.join(n for n in [ teacher_name, 'distilled', name ] if n is not None)
+        exporter = Exporter(self.path, self.lod, self.feature_size, suffix)
+        student.save(exporter.pytorch())
+
+        report['torched'] = os.path.abspath(exporter.pytorch())
+        report['binaries'] = Trainer.write_binary(student, exporter.binary())
+        self.distilled.append(report)
+
+        logging.info(f'Distilled {name}: {report["parameters"]} parameters (from {report["teacher_parameters"]}), '
+                     f'{report["speedup"]:.2f}x faster, error {report["mean_error"]:.2e} mean / {report["max_error"]:.2e} max, '
+                     f'render loss {report["render_error"]:.3e} (teacher {report["teacher_render_error"]:.3e})')
+
+        return report
+
+    @staticmethod
+    def write_binary(ngf: NGF, path: str) -> Optional[str]:
+        # The binary format only has a layout for per-vertex features
+        if isinstance(ngf, TexturedNGF):
+            logging.warning(f'Skipping binary export to {path}, textured neural geometry fields have no binary format')
+            return None
+
+        with open(path, 'wb') as file:
+            file.write(ngf.stream())
+
+        logging.info('Exporting neural geometry field as binary')
+
+        return os.path.abspath(path)
+
     def export(self) -> None:
+        import matplotlib.pyplot as plt
+
         # Final export
         self.ngf.save(self.exporter.pytorch())
 
         logging.info('Exporting neural geometry field as PyTorch (PT)')
 
-        with open(self.exporter.binary(), 'wb') as file:
-            file.write(self.ngf.stream())
-
-        logging.info('Exporting neural geometry field as binary')
+        binaries = Trainer.write_binary(self.ngf, self.exporter.binary())
 
         # Plot results
         _, axs = plt.subplots(1, 2, layout='constrained')
@@ -177,6 +593,7 @@ class Trainer:
         axs[1].set_yscale('log')
 
         plt.savefig(self.exporter.plot())
+        plt.close()
 
         logging.info('Loss history exported')
 
@@ -195,14 +612,21 @@ class Trainer:
         # Write the metadate
         meta = {
             'reference': self.path,
+            'partitioned': os.path.abspath(self.exporter.partitioned()),
             'torched': os.path.abspath(self.exporter.pytorch()),
-            'binaries': os.path.abspath(self.exporter.binary()),
-            'stl': os.path.abspath(self.exporter.mesh())
+            'binaries': binaries,
+            'stl': os.path.abspath(self.exporter.mesh()),
+            'architecture': self.architecture,
+            'memory': self.memory,
+            'distilled': self.distilled,
         }
 
         with open(self.exporter.metadata(), 'w') as file:
             json.dump(meta, file)
 
+        # Exported runs are complete, so nothing is left to resume
+        self.checkpointer.remove()
+
     def display(self, rate=16):
         import polyscope as ps
 
@@ -235,16 +659,35 @@ if __name__ == '__main__':
     parser.add_argument('--lod', type=int, default=2000, help='Number of patches to partition')
     parser.add_argument('--features', type=int, default=20, help='Feature vector size')
     parser.add_argument('--display', type=bool, default=True, help='Display the result after training')
+    parser.add_argument('--network', type=str, default='mlp', choices=list(BACKENDS.keys()), help='Network backend')
+    parser.add_argument('--hidden', type=int, default=None, help='Hidden layer width (defaults to the backend\'s)')
+    parser.add_argument('--depth', type=int, default=None, help='Number of linear layers (defaults to the backend\'s)')
+    parser.add_argument('--distill', type=str, nargs='*', default=[], help='Smaller networks (backend[:hidden[:depth]]) to distill the trained field into')
+    parser.add_argument('--distill-steps', type=int, default=2000, help='Displacement matching steps for each distilled network')
+    parser.add_argument('--distill-finetune', type=int, default=10, help='Fine-tuning passes over the reference views for each distilled network')
     parser.add_argument('--batch', type=int, default=10, help='Batch size for training')
+    parser.add_argument('--memory-budget', type=float, default=None, help='GPU memory budget in GB; selects the largest batch that fits at each rate')
     parser.add_argument('--fixed-seed', action='store_true', default=False, help='Fixed random seed (for debugging)')
+    parser.add_argument('--resume', action='store_true', default=False, help='Resume training from the last checkpoint')
+    parser.add_argument('--checkpoint-interval', type=int, default=25, help='Iterations between checkpoints')
+    parser.add_argument('--profile', action='store_true', default=False, help='Time each training phase per rate')
+    parser.add_argument('--trace-steps', type=int, default=5, help='Iterations per rate recorded in Chrome traces when profiling')
 
     args = parser.parse_args()
 
     if args.fixed_seed:
         torch.manual_seed(0)
 
-    trainer = Trainer(args.mesh, args.lod, args.features, args.batch)
+    trainer = Trainer(args.mesh, args.lod, args.features, args.batch,
+                      resume=args.resume, interval=args.checkpoint_interval,
+                      profile=args.profile, trace_steps=args.trace_steps,
+                      memory_budget=args.memory_budget,
+                      architecture={ 'backend': args.network, 'hidden': args.hidden, 'depth': args.depth })
     trainer.run()
+
+    for spec in args.distill:
+        trainer.distill(parse_architecture(spec), steps=args.distill_steps, finetune=args.distill_finetune)
+
     trainer.export()
 
     if args.display:
@@ -1,7 +1,12 @@
+from .checkpoint import *
+from .distance import *
 from .exporter import *
 from .geometry import *
 from .mesh import *
 from .miscellaneous import *
 # from .plot import *
+from .profiler import *
+from .results import *
 from .siren import *
+from .stream import *
 from .texture import *
@@ -0,0 +1,67 @@
+import os
+import queue
+import torch
+import logging
+import threading
+
+
+def snapshot(data):
+    # Detached host copies, so that training may continue while they are written
+    if isinstance(data, torch.Tensor):
+        return data.detach().to('cpu', copy=True)
+    if isinstance(data, dict):
+        return { k: snapshot(v) for k, v in data.items() }
+    if isinstance(data, (list, tuple)):
+        return type(data)(snapshot(v) for v in data)
+    return data
+
+
+class Checkpointer:
+    def __init__(self, path: str):
+        self.path = path
+        self.pending = queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self.write, daemon=True)
+        self.thread.start()
+
+    def write(self):
+        while True:
+            state = self.pending.get()
+            if state is None:
+                self.pending.task_done()
+                break
+
+            # Write then rename, so that a crash never leaves a partial checkpoint
+            try:
+                temporary = self.path + '.tmp'
+                torch.save(state, temporary)
+                os.replace(temporary, self.path)
+            except Exception as e:
+                logging.error(f'Failed to write checkpoint {self.path}: {e}')
+            finally:
+                self.pending.task_done()
+
+    def save(self, state: dict) -> None:
+        # Blocks only if the previous checkpoint is still being written
+        self.pending.put(snapshot(state))
+
+    def wait(self) -> None:
+        self.pending.join()
+
+    def close(self) -> None:
+        self.wait()
+        self.pending.put(None)
+        self.thread.join()
+
+    def remove(self) -> None:
+        # Finished runs drop their checkpoint, so that later runs start over
+        self.wait()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+            logging.info(f'Removed checkpoint {self.path}')
+
+    def load(self) -> dict:
+        if not os.path.exists(self.path):
+            return None
+
+        logging.info(f'Loading checkpoint {self.path}')
+        return torch.load(self.path, map_location='cpu')
@@ -0,0 +1,196 @@
+import torch
+import ngfutil
+
+from typing import Tuple
+
+from .mesh import Mesh
+
+
+def sample_surface(vertices: torch.Tensor, faces: torch.Tensor, count: int) -> Tuple[torch.Tensor, torch.Tensor]:
+    # Area weighted samples, so that the result does not depend on the tessellation
+    faces = faces.long()
+    v0 = vertices[faces[:, 0]]
+    v1 = vertices[faces[:, 1]]
+    v2 = vertices[faces[:, 2]]
+
+    areas = torch.cross(v1 - v0, v2 - v0, dim=-1).norm(dim=-1)
+    cdf = torch.cumsum(areas.double(), dim=0)
+    cdf = cdf / cdf[-1]
+
+    # Inverse transform sampling (torch.multinomial is limited to 2^24 categories)
+    u = torch.rand(count, device=vertices.device, dtype=torch.float64)
+    index = torch.searchsorted(cdf, u).clamp(max=faces.shape[0] - 1)
+
+    r0 = torch.rand(count, device=vertices.device).sqrt().unsqueeze(-1)
+    r1 = torch.rand(count, device=vertices.device).unsqueeze(-1)
+
+    points = (1 - r0) * v0[index] + r0 * (1 - r1) * v1[index] + r0 * r1 * v2[index]
+
+    return points, index
+
+
+def sample_mesh(mesh: Mesh, count: int) -> torch.Tensor:
+    return sample_surface(mesh.vertices, mesh.faces, count)[0]
+
+
+class PointGrid:
+    # Nearest neighbor queries over a uniform grid of sorted points
+    def __init__(self, points: torch.Tensor, density: float = 2.0, chunk: int = 1 << 16):
+        self.points = points
+        self.chunk = chunk
+
+        with torch.no_grad():
+            self.lower = points.min(dim=0)[0]
+            extent = (points.max(dim=0)[0] - self.lower).max().clamp(min=1e-12).item()
+
+            # Roughly `density` points per occupied cell for surface samples
+            resolution = int((points.shape[0] / density) ** 0.5)
+            self.resolution = max(1, min(resolution, 2048))
+            self.cell = extent / self.resolution * (1 + 1e-6)
+
+            keys = self.key(self.coordinates(points))
+            keys, self.order = torch.sort(keys)
+
+            self.keys, counts = torch.unique_consecutive(keys, return_counts=True)
+            self.counts = counts
+            self.starts = torch.cumsum(counts, dim=0) - counts
+
+    def coordinates(self, x: torch.Tensor) -> torch.Tensor:
+        c = ((x - self.lower) / self.cell).floor().long()
+        return c.clamp(0, self.resolution - 1)
+
+    def key(self, c: torch.Tensor) -> torch.Tensor:
+        r = self.resolution
+        return (c[..., 0] * r + c[..., 1]) * r + c[..., 2]
+
+    @staticmethod
+    def shell(k: int, device) -> torch.Tensor:
+        r = torch.arange(-k, k + 1, device=device)
+        offsets = torch.stack(torch.meshgrid(r, r, r, indexing='ij'), dim=-1).reshape(-1, 3)
+        return offsets[offsets.abs().max(dim=-1)[0] == k]
+
+    def candidates(self, queries: torch.Tensor, cells: torch.Tensor, offsets: torch.Tensor):
+        # Every (query, point) pair in the given cell offsets around each query's cell
+        neighbors = cells.unsqueeze(1) + offsets.unsqueeze(0)
+        inside = ((neighbors >= 0) & (neighbors < self.resolution)).all(dim=-1)
+
+        query = torch.arange(queries.shape[0], device=queries.device).unsqueeze(1).expand_as(inside)
+        query, neighbors = query[inside], neighbors[inside]
+
+        keys = self.key(neighbors)
+        slot = torch.searchsorted(self.keys, keys).clamp(max=self.keys.shape[0] - 1)
+        found = self.keys[slot] == keys
+
+        query, slot = query[found], slot[found]
+        counts = self.counts[slot]
+
+        query = torch.repeat_interleave(query, counts)
+        local = torch.arange(query.shape[0], device=queries.device) - torch.repeat_interleave(torch.cumsum(counts, 0) - counts, counts)
+        point = self.order[torch.repeat_interleave(self.starts[slot], counts) + local]
+
+        return query, point
+
+    @torch.no_grad()
+    def nearest_indices(self, queries: torch.Tensor) -> torch.Tensor:
+        indices = torch.empty(queries.shape[0], dtype=torch.long, device=queries.device)
+        for start in range(0, queries.shape[0], self.chunk):
+            indices[start : start + self.chunk] = self.nearest_chunk(queries[start : start + self.chunk])
+
+        return indices
+
+    def nearest_chunk(self, queries: torch.Tensor) -> torch.Tensor:
+        n = queries.shape[0]
+        device = queries.device
+
+        best = torch.full((n,), float('inf'), device=device)
+        index = torch.zeros(n, dtype=torch.long, device=device)
+        cells = self.coordinates(queries)
+
+        # Rings of cells are searched until the nearest point is provably found
+        pending = torch.arange(n, device=device)
+        for k in range(0, 4):
+            if pending.numel() == 0:
+                break
+
+            query, point = self.candidates(queries[pending], cells[pending], PointGrid.shell(k, device))
+            if query.numel() > 0:
+                d = (queries[pending][query] - self.points[point]).square().sum(dim=-1)
+
+                closest = torch.full((pending.shape[0],), float('inf'), device=device)
+                closest.scatter_reduce_(0, query, d, 'amin')
+
+                winner = torch.full((pending.shape[0],), -1, dtype=torch.long, device=device)
+                tie = d == closest[query]
+                winner.scatter_reduce_(0, query[tie], point[tie], 'amax')
+
+                improved = closest < best[pending]
+                best[pending[improved]] = closest[improved]
+                index[pending[improved]] = winner[improved]
+
+            # Points beyond ring k are at least k cells away
+            bound = (k * self.cell) ** 2
+            pending = pending[best[pending] > bound]
+
+        # Remaining queries (far away or in sparse regions) are brute forced
+        rows = max(1, (1 << 24) // self.points.shape[0])
+        for start in range(0, pending.shape[0], rows):
+            subset = pending[start : start + rows]
+            d = torch.cdist(queries[subset], self.points)
+            index[subset] = d.argmin(dim=-1)
+
+        return index
+
+    def nearest(self, queries: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        # Distances are differentiable with respect to the queries
+        indices = self.nearest_indices(queries.detach())
+        distances = (queries - self.points[indices]).norm(dim=-1)
+        return distances, indices
+
+
+def chamfer_distance(a: torch.Tensor, b: torch.Tensor) -> torch.Tensor:
+    # Symmetric mean squared nearest neighbor distance between point sets
+    ia = PointGrid(b.detach()).nearest_indices(a.detach())
+    ib = PointGrid(a.detach()).nearest_indices(b.detach())
+
+    da = (a - b[ia]).square().sum(dim=-1)
+    db = (b - a[ib]).square().sum(dim=-1)
+
+    return da.mean() + db.mean()
+
+
+def surface_distances(points: torch.Tensor, mesh: Mesh) -> torch.Tensor:
+    # Exact point to surface distances through a triangle BVH
+    tree = ngfutil.bvh(mesh.vertices.cpu(), mesh.faces.int().cpu())
+    return tree.closest(points.cpu())[0].to(points.device)
+
+
+@torch.no_grad()
+def surface_metrics(source: Mesh, target: Mesh, samples: int = 1_000_000, percentiles=(50, 90, 99), exact: bool = True) -> dict:
+    a = sample_mesh(source, samples)
+    b = sample_mesh(target, samples)
+
+    # Samples are measured against the other surface, or only its samples if not exact
+    if exact:
+        da = surface_distances(a, target)
+        db = surface_distances(b, source)
+    else:
+        da, _ = PointGrid(b).nearest(a)
+        db, _ = PointGrid(a).nearest(b)
+
+    distances = torch.cat([ da, db ])
+    quantiles = torch.tensor([ p / 100 for p in percentiles ], device=distances.device)
+
+    # Quantile is limited in input size, so the percentiles come from a subsample
+    subset = distances[torch.randperm(distances.shape[0], device=distances.device)[:1 << 24]]
+    values = torch.quantile(subset, quantiles)
+
+    metrics = {
+        'chamfer': (da.square().mean() + db.square().mean()).item(),
+        'chamfer-l1': 0.5 * (da.mean() + db.mean()).item(),
+        'hausdorff': max(da.max().item(), db.max().item()),
+    }
+
+    for p, v in zip(percentiles, values.tolist()):
+        metrics[f'p{p}'] = v
+
+    return metrics
@@ -1,4 +1,5 @@
 import os
+import hashlib
 
 
 class Exporter:
@@ -9,6 +10,8 @@ class Exporter:
     loss = os.path.join('results', 'loss')
     stl = os.path.join('results', 'stl')
     meta = os.path.join('results', 'meta')
+    checkpoints = os.path.join('results', 'checkpoints')
+    profiles = os.path.join('results', 'profiles')
 
     @staticmethod
     def dirfill():
@@ -19,16 +22,45 @@ class Exporter:
         os.makedirs(Exporter.loss, exist_ok=True)
         os.makedirs(Exporter.stl, exist_ok=True)
         os.makedirs(Exporter.meta, exist_ok=True)
+        os.makedirs(Exporter.checkpoints, exist_ok=True)
+        os.makedirs(Exporter.profiles, exist_ok=True)
 
-    def __init__(self, mesh: str, lod: int, features: int):
+    # Content digests keyed by path, modification time and size, so that each mesh is read once
+    digests = {}
+
+    @staticmethod
+    def digest(path: str) -> str:
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        if key in Exporter.digests:
+            return Exporter.digests[key]
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as file:
+            while chunk := file.read(1 << 24):
+                sha.update(chunk)
+
+        Exporter.digests[key] = sha.hexdigest()
+        return Exporter.digests[key]
+
+    def __init__(self, mesh: str, lod: int, features: int, network: str = None):
         Exporter.dirfill()
 
         self.prefix = os.path.basename(mesh)
         self.prefix = self.prefix.split('.')[0]
         self.basename = self.prefix + f'-lod{lod}-f{features}'
 
+        # Results of the default network keep their original names
+        if network is not None:
+            self.basename += f'-{network}'
+
+        self.source = mesh
+        self.lod = lod
+
     def partitioned(self):
-        return os.path.join(Exporter.quadrangulated, self.basename + '.obj')
+        # Partitions only depend on the mesh contents and the patch count
+        partition = Exporter.digest(self.source)[:16] + f'-lod{self.lod}'
+        return os.path.join(Exporter.quadrangulated, partition + '.obj')
 
     def pytorch(self):
         return os.path.join(Exporter.torched, self.basename + '.pt')
@@ -44,3 +76,12 @@ class Exporter:
 
     def metadata(self):
         return os.path.join(Exporter.meta, self.basename + '.json')
+
+    def checkpoint(self):
+        return os.path.join(Exporter.checkpoints, self.basename + '.pt')
+
+    def profile(self):
+        return os.path.join(Exporter.profiles, self.basename + '.json')
+
+    def trace(self, rate: int):
+        return os.path.join(Exporter.profiles, self.basename + f'-r{rate}-trace.json')
@@ -1,4 +1,5 @@
 import torch
+import ngfutil
 
 from typing import Tuple
 
@@ -71,6 +72,37 @@ def separate(vertices: torch.Tensor, faces: torch.Tensor) -> Tuple[torch.Tensor]
     vertices = vertices.reshape(-1, 3)
     normals = normals.reshape(-1, 3)
 
-    faces = torch.arange(vertices.shape[0], device='cuda', dtype=torch.int32).reshape(-1, 3)
+    faces = torch.arange(vertices.shape[0], device=vertices.device, dtype=torch.int32).reshape(-1, 3)
 
     return vertices, normals, faces
+
+
+def deduplicate_torch(vertices: torch.Tensor, faces: torch.Tensor, epsilon: float = 0.0) -> Tuple[torch.Tensor, torch.Tensor]:
+    # Same welding as ngfutil.deduplicate, on any device: only referenced vertices are kept,
+    # numbered by first appearance, and positions are compared exactly or on a grid of the epsilon
+    corners = vertices[faces.reshape(-1).long()].float()
+    if epsilon > 0:
+        keys = torch.floor(corners.double() / epsilon + 0.5).long()
+    else:
+        # Adding zero turns -0 into +0, which are equal but not bitwise equal
+        keys = (corners + 0.0).contiguous().view(torch.int32)
+
+    _, inverse = torch.unique(keys, dim=0, return_inverse=True)
+
+    count = int(inverse.max().item()) + 1 if inverse.numel() > 0 else 0
+    indices = torch.arange(inverse.shape[0], device=inverse.device)
+    first = torch.full((count,), inverse.shape[0], device=inverse.device).scatter_reduce_(0, inverse, indices, 'amin')
+
+    order = torch.argsort(first)
+    rank = torch.empty_like(order)
+    rank[order] = torch.arange(count, device=order.device)
+
+    return corners[first[order]], rank[inverse].reshape(-1, 3).int()
+
+
+def deduplicate(vertices: torch.Tensor, faces: torch.Tensor, epsilon: float = 0.0) -> Tuple[torch.Tensor, torch.Tensor]:
+    # The parallel sort of the extension on the host, torch.unique elsewhere
+    if vertices.is_cpu and faces.is_cpu:
+        return ngfutil.deduplicate(vertices.float().contiguous(), faces.int().contiguous(), epsilon)
+
+    return deduplicate_torch(vertices, faces, epsilon)
@@ -1,11 +1,13 @@
 import meshio
 import os
+import logging
 import subprocess
+import numpy as np
 import torch
 import ngfutil
 
 from dataclasses import dataclass
-from typing import Tuple, Callable
+from typing import Tuple, Callable, Optional
 
 from .geometry import compute_vertex_normals, compute_face_normals
 
@@ -28,16 +30,16 @@ def mesh_from(V, F) -> Mesh:
 
 
 # TODO: load triangle mesh
-def load_mesh(path, normalizer=None) -> Tuple[Mesh, Callable[[torch.Tensor], torch.Tensor]]:
+def load_mesh(path, normalizer=None, device='cuda') -> Tuple[Mesh, Callable[[torch.Tensor], torch.Tensor]]:
     mesh = meshio.read(path)
 
-    v = torch.from_numpy(mesh.points[:, :3]).float().cuda()
+    v = torch.from_numpy(mesh.points[:, :3]).float().to(device)
 
     f = None
     if 'triangle' in mesh.cells_dict:
-        f = torch.from_numpy(mesh.cells_dict['triangle']).int().cuda()
+        f = torch.from_numpy(mesh.cells_dict['triangle']).int().to(device)
     else:
-        f = torch.from_numpy(mesh.cells_dict['quad']).int().cuda()
+        f = torch.from_numpy(mesh.cells_dict['quad']).int().to(device)
 
     if normalizer is None:
         min, max = v.min(), v.max()
@@ -55,3 +57,112 @@ def load_mesh(path, normalizer=None) -> Tuple[Mesh, Callable[[torch.Tensor], tor
     else:
         optg = ngfutil.geometry(v.cpu(), f.cpu())
         return Mesh(v, f, vn, os.path.abspath(path), optg), normalizer
+
+
+def read_binary_stl(path: str, chunk: int = 1 << 20) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    # Memory mapped so that only one chunk of records is read at a time
+    size = os.path.getsize(path)
+    if size < 84:
+        return None
+
+    count = int(np.fromfile(path, dtype=np.uint32, count=1, offset=80)[0])
+    if size != 84 + 50 * count or count == 0:
+        return None
+
+    record = np.dtype([ ('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2') ])
+    records = np.memmap(path, dtype=record, mode='r', offset=84, shape=(count,))
+
+    vertices = np.empty((3 * count, 3), dtype=np.float32)
+    bounds = np.array([ [ np.inf ] * 3, [ -np.inf ] * 3 ], dtype=np.float32)
+    for start in range(0, count, chunk):
+        block = records['vertices'][start : start + chunk].reshape(-1, 3)
+        vertices[3 * start : 3 * start + block.shape[0]] = block
+        bounds[0] = np.minimum(bounds[0], block.min(axis=0))
+        bounds[1] = np.maximum(bounds[1], block.max(axis=0))
+
+    # Triangle soup; the proxy and the renderer do not need shared vertices
+    faces = np.arange(3 * count, dtype=np.int32).reshape(-1, 3)
+
+    return vertices, faces, bounds
+
+
+def read_triangles(path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    result = None
+    if path.lower().endswith('.stl'):
+        result = read_binary_stl(path)
+
+    if result is None:
+        mesh = meshio.read(path)
+        vertices = np.ascontiguousarray(mesh.points[:, :3], dtype=np.float32)
+        faces = np.ascontiguousarray(mesh.cells_dict['triangle'], dtype=np.int32)
+        bounds = np.stack([ vertices.min(axis=0), vertices.max(axis=0) ])
+        result = vertices, faces, bounds
+
+    return result
+
+
+def cluster_vertices(vertices: torch.Tensor, faces: torch.Tensor, resolution: int, chunk: int = 1 << 20) -> Tuple[torch.Tensor, torch.Tensor]:
+    # Vertex clustering on a uniform grid over the (normalized) bounding box
+    lower = vertices.min(dim=0)[0]
+    extent = (vertices.max(dim=0)[0] - lower).max().clamp(min=1e-12)
+
+    def cells(v):
+        q = ((v - lower) / extent * (resolution - 1)).round().long()
+        return (q[:, 0] * resolution + q[:, 1]) * resolution + q[:, 2]
+
+    keys, sums, counts, triangles = [], [], [], []
+    for start in range(0, faces.shape[0], chunk):
+        corners = vertices[faces[start : start + chunk].reshape(-1).long()]
+        k = cells(corners).reshape(-1, 3)
+
+        # Triangles collapsing into fewer than three cells are discarded
+        valid = (k[:, 0] != k[:, 1]) & (k[:, 1] != k[:, 2]) & (k[:, 2] != k[:, 0])
+        triangles.append(torch.unique(k[valid], dim=0))
+
+        unique, inverse = torch.unique(k.reshape(-1), return_inverse=True)
+        total = torch.zeros((unique.shape[0], 3)).index_add_(0, inverse, corners)
+        keys.append(unique)
+        sums.append(total)
+        counts.append(torch.bincount(inverse, minlength=unique.shape[0]))
+
+    keys = torch.cat(keys)
+    unique, inverse = torch.unique(keys, return_inverse=True)
+
+    positions = torch.zeros((unique.shape[0], 3)).index_add_(0, inverse, torch.cat(sums))
+    weights = torch.zeros(unique.shape[0]).index_add_(0, inverse, torch.cat(counts).float())
+    positions /= weights.unsqueeze(-1)
+
+    triangles = torch.unique(torch.cat(triangles), dim=0)
+    triangles = torch.searchsorted(unique, triangles).int()
+
+    return positions, triangles
+
+
+def load_reference(path: str, proxy: int = 256) -> Tuple[Mesh, Mesh, Callable[[torch.Tensor], torch.Tensor]]:
+    # Full resolution mesh stays on the host; only the proxy is moved to the device
+    vertices, faces, bounds = read_triangles(path)
+    logging.info(f'Streamed {faces.shape[0]} triangles from {path}')
+
+    lower, upper = torch.from_numpy(bounds[0]), torch.from_numpy(bounds[1])
+    scale = (upper.max() - lower.min()).abs().item() / 2
+    center = (lower + upper) / 2
+
+    normalizer = (lambda x: (x - center.to(x.device)) / scale)
+
+    v = torch.from_numpy(vertices)
+    v -= center
+    v /= scale
+
+    f = torch.from_numpy(faces)
+
+    full = Mesh(v, f, None, os.path.abspath(path), None)
+
+    pv, pf = cluster_vertices(v, f, proxy)
+    pv, pf = pv.cuda(), pf.cuda()
+    logging.info(f'Constructed proxy mesh with {pf.shape[0]} triangles for view placement')
+
+    fn = compute_face_normals(pv, pf)
+    vn = compute_vertex_normals(pv, pf, fn)
+    optg = ngfutil.geometry(pv.cpu(), pf.cpu())
+
+    return full, Mesh(pv, pf, vn, os.path.abspath(path), optg), normalizer
@@ -5,54 +5,76 @@ import numpy as np
 from .mesh import Mesh
 
 
-def uniform_laplacian(Q: torch.Tensor, N: int, lambda_: float = 10.0) -> torch.Tensor:
-    import itertools
+def face_pairs(Q: torch.Tensor) -> torch.Tensor:
+    # Every pair of corners of each face in both directions (diagonals included for quads)
+    Q = Q.long()
+    i, j = torch.triu_indices(Q.shape[1], Q.shape[1], 1, device=Q.device)
+    pairs = torch.stack([ Q[:, i], Q[:, j] ], dim=-1).reshape(-1, 2)
+    return torch.cat([ pairs, pairs.flip(-1) ])
 
-    graph = [[] for _ in range(N)]
-    for q in Q:
-        l = q.cpu().numpy().tolist()
-        for p in itertools.combinations(l, 2):
-            graph[p[0]].append(p[1])
-            graph[p[1]].append(p[0])
 
-    # print(graph)
+def sparse_csr(rows: torch.Tensor, cols: torch.Tensor, values: torch.Tensor, N: int) -> torch.Tensor:
+    # Duplicate entries are summed, as when coalescing COO triplets
+    keys, inverse = torch.unique(rows * N + cols, return_inverse=True)
+    summed = torch.zeros(keys.shape[0], dtype=values.dtype, device=values.device).index_add_(0, inverse, values)
 
-    values = []
-    ix, iy = [], []
-    for i, g in enumerate(graph):
-        values.append(lambda_ - len(g))
-        ix.append(i)
-        iy.append(i)
+    crow = torch.zeros(N + 1, dtype=torch.long, device=values.device)
+    crow[1:] = torch.cumsum(torch.bincount(keys // N, minlength=N), dim=0)
 
-        for k in g:
-            values.append(1)
-            ix.append(i)
-            iy.append(k)
+    return torch.sparse_csr_tensor(crow, keys % N, summed, size=(N, N))
 
-    return torch.sparse_coo_tensor([ix, iy], values, size=(N, N)).cuda()
 
+def uniform_laplacian(Q: torch.Tensor, N: int, lambda_: float = 10.0, device: str = 'cuda') -> torch.Tensor:
+    pairs = face_pairs(Q.to(device))
+    degree = torch.bincount(pairs[:, 0], minlength=N)
 
-def uniform_smooth_laplacian(Q: torch.Tensor, N: int, lambda_: float = 10.0) -> torch.Tensor:
-    import itertools
+    diagonal = torch.arange(N, device=device)
+    rows = torch.cat([ pairs[:, 0], diagonal ])
+    cols = torch.cat([ pairs[:, 1], diagonal ])
+    values = torch.cat([ torch.ones(pairs.shape[0], device=device), lambda_ - degree.float() ])
 
-    graph = [[] for _ in range(N)]
-    for q in Q:
-        l = q.cpu().numpy().tolist()
-        for p in itertools.combinations(l, 2):
-            graph[p[0]].append(p[1])
-            graph[p[1]].append(p[0])
+    return sparse_csr(rows, cols, values, N)
 
-    # print(graph)
 
-    values = []
-    ix, iy = [], []
-    for i, g in enumerate(graph):
-        for k in g:
-            values.append(1/len(g))
-            ix.append(i)
-            iy.append(k)
+def uniform_smooth_laplacian(Q: torch.Tensor, N: int, lambda_: float = 10.0, device: str = 'cuda') -> torch.Tensor:
+    pairs = face_pairs(Q.to(device))
+    degree = torch.bincount(pairs[:, 0], minlength=N)
+    values = 1.0 / degree[pairs[:, 0]].float()
 
-    return torch.sparse_coo_tensor([ix, iy], values, size=(N, N)).cuda()
+    return sparse_csr(pairs[:, 0], pairs[:, 1], values, N)
+
+
+class ImplicitSmoother:
+    # Implicit Laplacian smoothing, solving (I + step L) x = v with a factorization computed once
+    def __init__(self, Q: torch.Tensor, N: int, step: float = 1.0):
+        import scipy.sparse
+        import scipy.sparse.linalg
+
+        pairs = face_pairs(Q.cpu()).numpy()
+        adjacency = scipy.sparse.coo_matrix((np.ones(pairs.shape[0]), (pairs[:, 0], pairs[:, 1])), shape=(N, N)).tocsr()
+        degree = np.asarray(adjacency.sum(axis=1)).reshape(-1)
+
+        L = scipy.sparse.diags(degree) - adjacency
+        self.factorization = scipy.sparse.linalg.splu((scipy.sparse.identity(N) + step * L).tocsc())
+
+    def solve(self, V: torch.Tensor) -> torch.Tensor:
+        x = self.factorization.solve(V.detach().cpu().double().numpy())
+        return torch.from_numpy(x).to(V.device, V.dtype)
+
+    def __call__(self, V: torch.Tensor) -> torch.Tensor:
+        return ImplicitSolve.apply(V, self)
+
+
+class ImplicitSolve(torch.autograd.Function):
+    # The system is symmetric, so gradients go through the same solve
+    @staticmethod
+    def forward(ctx, V, smoother):
+        ctx.smoother = smoother
+        return smoother.solve(V)
+
+    @staticmethod
+    def backward(ctx, grad):
+        return ctx.smoother.solve(grad), None
 
 
 def indices(sample_rate):
@@ -105,17 +127,15 @@ def shorted_indices(V, C, sample_rate=16):
 
 
 def quadify(count, sample_rate=16):
-    quads = []
-    for c in range(count):
-        offset = c * sample_rate * sample_rate
-        for i in range(sample_rate - 1):
-            for j in range(sample_rate - 1):
-                a = offset + i * sample_rate + j
-                c = offset + (i + 1) * sample_rate + j
-                b, d = a + 1, c + 1
-                quads.append([a, b, d, c])
+    # Grid quads of every patch, offset by the patch's block of samples
+    r = sample_rate
+    i, j = np.meshgrid(np.arange(r - 1), np.arange(r - 1), indexing='ij')
+    a = (i * r + j).reshape(-1)
 
-    return np.array(quads)
+    quad = np.stack([ a, a + 1, a + r + 1, a + r ], axis=-1)
+    offsets = (np.arange(count) * r * r).reshape(-1, 1, 1)
+
+    return (quad[None] + offsets).reshape(-1, 4)
 
 
 def make_cmap(complexes, points, LP, sample_rate):
@@ -170,80 +190,90 @@ def triangle_areas(v, f):
     return 0.5 * torch.norm(torch.cross(v01, v02, dim=-1), dim=1)
 
 
-def lookat(eye, center, up):
-    normalize = lambda x: x / torch.norm(x)
+def lookat(eyes: torch.Tensor, centers: torch.Tensor, ups: torch.Tensor = None) -> torch.Tensor:
+    # Batched view matrices for eyes/centers of shape (N, 3)
+    looks = centers - eyes
+    looks = looks / looks.norm(dim=-1, keepdim=True)
+
+    # Fall back to other up vectors where the look direction is degenerate
+    if ups is None:
+        ups = torch.tensor([ 0, 1, 0 ], dtype=torch.float32, device=eyes.device).expand_as(eyes)
 
-    f = normalize(eye - center)
-    u = normalize(up)
-    s = normalize(torch.cross(f, u, dim=-1))
-    u = torch.cross(s, f, dim=-1)
+    for fallback in [ [ 1, 0, 0 ], [ 0, 0, 1 ] ]:
+        fallback = torch.tensor(fallback, dtype=torch.float32, device=eyes.device)
+        parallel = (looks * ups).sum(dim=-1, keepdim=True).abs() > 1.0 - 1e-6
+        ups = torch.where(parallel, fallback, ups)
 
-    dot_f = torch.dot(f, eye)
-    dot_u = torch.dot(u, eye)
-    dot_s = torch.dot(s, eye)
+    rights = torch.cross(looks, ups, dim=-1)
+    rights = rights / rights.norm(dim=-1, keepdim=True)
 
-    return torch.tensor([
-        [s[0], u[0], -f[0], -dot_s],
-        [s[1], u[1], -f[1], -dot_u],
-        [s[2], u[2], -f[2], dot_f],
-        [0, 0, 0, 1]
-    ], dtype=torch.float32, device='cuda')
+    ups = torch.cross(looks, rights, dim=-1)
+    ups = ups / ups.norm(dim=-1, keepdim=True)
 
+    # Inverse of the camera frame [ right, up, look | eye ], i.e. [ R^T | -R^T eye ]
+    R = torch.stack([ rights, ups, looks ], dim=1)
+    t = -(R @ eyes.unsqueeze(-1))
 
-def arrange_views(simplified: Mesh, cameras: int, radius: float = 1.0):
+    views = torch.zeros((eyes.shape[0], 4, 4), dtype=torch.float32, device=eyes.device)
+    views[:, :3, :3] = R
+    views[:, :3, 3:] = t
+    views[:, 3, 3] = 1
+
+    return views
+
+
+def arrange_views(simplified: Mesh, cameras: int, radius: float = 1.0, occlusion: bool = False, near: float = 0.1):
     seeds = list(torch.randint(0, simplified.faces.shape[0], (cameras,)).numpy())
-    clusters = ngfutil.cluster_geometry(simplified.optg, seeds, 3, 'uniform')
-
-    views = []
-    eyes = []
-    fwds = []
-    for cluster in clusters:
-        faces = simplified.faces[cluster]
-
-        v0 = simplified.vertices[faces[:, 0]]
-        v1 = simplified.vertices[faces[:, 1]]
-        v2 = simplified.vertices[faces[:, 2]]
-        centroid = (v0 + v1 + v2) / 3.0
-        centroid = centroid.mean(dim=0)
-
-        normal = torch.cross(v1 - v0, v2 - v0, dim=-1)
-        normal = normal.mean(dim=0)
-        normal = normal / torch.norm(normal)
-
-        eye = centroid + radius * normal
-        up = torch.tensor([0, 1, 0], dtype=torch.float32, device='cuda')
-        look = -normal
-
-        if torch.dot(look, up).abs().item() > 1.0 - 1e-6:
-            up = torch.tensor([1, 0, 0], dtype=torch.float32, device='cuda')
-        if torch.dot(look, up).abs().item() > 1.0 - 1e-6:
-            up = torch.tensor([0, 0, 1], dtype=torch.float32, device='cuda')
-
-        right = torch.cross(look, up, dim=-1)
-        right /= right.norm()
-
-        up = torch.cross(look, right, dim=-1)
-        up /= up.norm()
-
-        look /= look.norm()
-
-        view = torch.tensor([
-            [ right[0], up[0], look[0], eye[0] ],
-            [ right[1], up[1], look[1], eye[1] ],
-            [ right[2], up[2], look[2], eye[2] ],
-            [ 0, 0, 0, 1 ]
-        ], dtype=torch.float32, device='cuda').inverse()
-
-        views.append(view)
-        eyes.append(eye)
-        fwds.append(look)
-
-    # import polyscope as ps
-    # ps.init()
-    # v = torch.stack(eyes)
-    # f = torch.stack(fwds)
-    # ps.register_surface_mesh('ref', simplified.vertices.cpu().numpy(), simplified.faces.cpu().numpy())
-    # ps.register_point_cloud('eyes', v.cpu()).add_vector_quantity('looks', f.cpu())
-    # ps.show()
-
-    return torch.stack(views), torch.stack(eyes)
+    labels, _, _ = ngfutil.cluster_geometry(simplified.optg, seeds, 3, 'uniform')
+
+    # Per cluster centroids and normals as segment sums over the face labels
+    labels = labels.to(simplified.faces.device).long()
+    valid = labels >= 0
+
+    faces = simplified.faces[valid].long()
+    labels = labels[valid]
+
+    v0 = simplified.vertices[faces[:, 0]]
+    v1 = simplified.vertices[faces[:, 1]]
+    v2 = simplified.vertices[faces[:, 2]]
+
+    centroids = torch.zeros((len(seeds), 3), device=faces.device).index_add_(0, labels, (v0 + v1 + v2) / 3.0)
+    normals = torch.zeros((len(seeds), 3), device=faces.device).index_add_(0, labels, torch.cross(v1 - v0, v2 - v0, dim=-1))
+    counts = torch.bincount(labels, minlength=len(seeds))
+
+    centroids = centroids / counts.clamp(min=1).unsqueeze(-1)
+    normals = normals / normals.norm(dim=-1, keepdim=True).clamp(min=1e-12)
+
+    # Height of each chart above its centroid along its normal, as convex charts bulge over it
+    corners = torch.stack([ v0, v1, v2 ], dim=1) - centroids[labels].unsqueeze(1)
+    offsets = (corners * normals[labels].unsqueeze(1)).sum(dim=-1).amax(dim=1)
+    heights = torch.zeros(len(seeds), device=faces.device).scatter_reduce_(0, labels, offsets, 'amax')
+
+    # Charts emptied by repeated seeds are dropped
+    nonempty = counts > 0
+    centroids = centroids[nonempty]
+    normals = normals[nonempty]
+    heights = heights[nonempty]
+
+    # Cameras stay beyond the near plane as seen from the top of their chart
+    margin = 1e-3 * radius
+    closest = heights + near + margin
+    distances = torch.full((centroids.shape[0],), radius, device=centroids.device)
+
+    # Pull cameras in front of any geometry between them and their cluster; rays start above
+    # the chart so that they do not hit the chart itself, and occluders too close are ignored
+    if occlusion:
+        tree = ngfutil.bvh(simplified.optg)
+        starts = heights + margin
+        origins = centroids + starts.unsqueeze(-1) * normals
+        hits = tree.intersect(origins.cpu(), normals.cpu(), radius)[0].to(centroids.device)
+
+        pulled = starts + 0.5 * hits
+        distances = torch.where(pulled >= closest, torch.minimum(distances, pulled), distances)
+
+    distances = torch.maximum(distances, closest)
+
+    eyes = centroids + distances.unsqueeze(-1) * normals
+    views = lookat(eyes, centroids)
+
+    return views, eyes
@@ -0,0 +1,104 @@
+import json
+import time
+import torch
+import logging
+import contextlib
+import torch.profiler
+
+
+class PhaseProfiler:
+    # Named wall-clock ranges aggregated per group (e.g. rate), mirrored as profiler ranges
+    def __init__(self, enabled: bool = False, trace_steps: int = 0):
+        self.enabled = enabled
+        self.trace_steps = trace_steps
+        self.group = None
+        self.totals = {}
+        self.counts = {}
+
+        self.tracer = None
+        self.trace_path = None
+        self.steps = 0
+
+    def synchronize(self) -> None:
+        # Asynchronous kernels would otherwise be attributed to later phases
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        with torch.profiler.record_function(name):
+            self.synchronize()
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.synchronize()
+                elapsed = time.perf_counter() - start
+
+                key = (self.group, name)
+                self.totals[key] = self.totals.get(key, 0.0) + elapsed
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def begin(self, group, trace_path: str = None) -> None:
+        # Traces cover only the first steps of a group, as full runs produce huge files
+        self.finish()
+        self.group = group
+
+        if self.enabled and trace_path is not None and self.trace_steps > 0:
+            activities = [ torch.profiler.ProfilerActivity.CPU ]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+
+            self.tracer = torch.profiler.profile(activities=activities, record_shapes=True)
+            self.tracer.__enter__()
+            self.trace_path = trace_path
+            self.steps = 0
+
+    def step(self) -> None:
+        if self.tracer is None:
+            return
+
+        self.steps += 1
+        if self.steps >= self.trace_steps:
+            self.finish()
+
+    def finish(self) -> None:
+        if self.tracer is None:
+            return
+
+        self.tracer.__exit__(None, None, None)
+        self.tracer.export_chrome_trace(self.trace_path)
+        logging.info(f'Exported Chrome trace to {self.trace_path}')
+
+        self.tracer = None
+        self.trace_path = None
+
+    def summary(self) -> dict:
+        groups = {}
+        for (group, name), total in self.totals.items():
+            groups.setdefault(str(group), {})[name] = {
+                'total': total,
+                'calls': self.counts[(group, name)],
+                'mean': total / self.counts[(group, name)],
+            }
+
+        return groups
+
+    def table(self) -> str:
+        lines = [ f'{"group":>8} {"phase":<20} {"calls":>8} {"total (s)":>10} {"mean (ms)":>10} {"share":>7}' ]
+        for group, phases in self.summary().items():
+            overall = sum(p['total'] for p in phases.values())
+            for name, p in sorted(phases.items(), key=lambda kv: -kv[1]['total']):
+                lines.append(f'{group:>8} {name:<20} {p["calls"]:8d} {p["total"]:10.3f} '
+                             f'{1000 * p["mean"]:10.3f} {100 * p["total"] / max(overall, 1e-12):6.1f}%')
+
+        return '\n'.join(lines)
+
+    def export(self, path: str) -> None:
+        self.finish()
+        with open(path, 'w') as file:
+            json.dump(self.summary(), file, indent=4)
@@ -0,0 +1,237 @@
+import os
+import json
+import sqlite3
+import hashlib
+import contextlib
+import numpy as np
+import torch
+
+from typing import Any
+
+
+class ResultStore:
+    # Scalar metrics live in SQLite, arrays and images in memory mapped .npy blobs
+    def __init__(self, directory: str):
+        self.directory = os.path.abspath(directory)
+        self.blobs = os.path.join(self.directory, 'blobs')
+        self.path = os.path.join(self.directory, 'results.db')
+        self.connection = None
+
+        os.makedirs(self.blobs, exist_ok=True)
+
+        with self.transaction() as db:
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS results (
+                    experiment TEXT NOT NULL,
+                    path       TEXT NOT NULL,
+                    kind       TEXT NOT NULL,
+                    value,
+                    PRIMARY KEY (experiment, path)
+                )
+            ''')
+
+    @contextlib.contextmanager
+    def transaction(self):
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')
+
+        try:
+            db.execute('BEGIN IMMEDIATE')
+            yield db
+            db.execute('COMMIT')
+        except BaseException:
+            if db.in_transaction:
+                db.execute('ROLLBACK')
+            raise
+        finally:
+            db.close()
+
+    def read(self, query: str, parameters: tuple = ()) -> list:
+        # One connection is kept for the many small lookups of lazy views
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+
+        return self.connection.execute(query, parameters).fetchall()
+
+    @staticmethod
+    def encode(path: list) -> str:
+        return json.dumps(path, separators=(',', ':'))
+
+    @staticmethod
+    def scalar(x: Any) -> bool:
+        return x is None or isinstance(x, (bool, int, float, str, np.generic))
+
+    @staticmethod
+    def flatten(data: Any, path: list = []):
+        # List positions are wrapped as [i] so that they are distinct from integer keys
+        if isinstance(data, dict) and data:
+            for k, v in data.items():
+                k = k.item() if isinstance(k, np.generic) else k
+                assert isinstance(k, (str, int)), f'unsupported key {k!r}'
+                yield from ResultStore.flatten(v, path + [ k ])
+        elif isinstance(data, (list, tuple)) and not all(ResultStore.scalar(x) for x in data):
+            for i, v in enumerate(data):
+                yield from ResultStore.flatten(v, path + [ [ i ] ])
+        else:
+            yield path, data
+
+    def pack(self, experiment: str, key: str, leaf: Any) -> tuple:
+        if isinstance(leaf, (torch.Tensor, np.ndarray)):
+            kind = 'tensor' if isinstance(leaf, torch.Tensor) else 'array'
+            array = leaf.detach().cpu().numpy() if kind == 'tensor' else leaf
+
+            name = hashlib.sha1(f'{experiment}\0{key}'.encode()).hexdigest() + '.npy'
+            np.save(os.path.join(self.blobs, name), np.ascontiguousarray(array))
+            return kind, name
+
+        if isinstance(leaf, np.generic):
+            leaf = leaf.item()
+
+        if leaf is None:
+            return 'none', None
+        if isinstance(leaf, (bool, int, float, str)):
+            return 'scalar', leaf
+        if isinstance(leaf, (list, tuple, dict)):
+            return 'json', json.dumps(leaf, default=lambda x: x.item())
+
+        raise TypeError(f'cannot store {type(leaf).__name__} at {key}')
+
+    def unpack(self, kind: str, value: Any) -> Any:
+        if kind in [ 'tensor', 'array' ]:
+            # Copy-on-write mappings page images in only when they are read
+            array = np.load(os.path.join(self.blobs, value), mmap_mode='c')
+            return torch.from_numpy(array) if kind == 'tensor' else array
+        if kind == 'json':
+            return json.loads(value)
+
+        return value
+
+    def save(self, experiment: str, data: dict) -> None:
+        self.remove(experiment)
+
+        rows = []
+        for path, leaf in ResultStore.flatten(data):
+            key = ResultStore.encode(path)
+            rows.append((experiment, key, *self.pack(experiment, key, leaf)))
+
+        with self.transaction() as db:
+            db.executemany('INSERT INTO results VALUES (?, ?, ?, ?)', rows)
+
+    def remove(self, experiment: str) -> None:
+        with self.transaction() as db:
+            blobs = db.execute('''
+                SELECT value FROM results WHERE experiment = ? AND kind IN ('tensor', 'array')
+            ''', (experiment,)).fetchall()
+
+            db.execute('DELETE FROM results WHERE experiment = ?', (experiment,))
+
+        for (name,) in blobs:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.blobs, name))
+
+    def experiments(self) -> list[str]:
+        return [ row[0] for row in self.read('SELECT DISTINCT experiment FROM results ORDER BY experiment') ]
+
+    def view(self, experiment: str) -> 'ResultView':
+        if not self.read('SELECT 1 FROM results WHERE experiment = ? LIMIT 1', (experiment,)):
+            raise KeyError(experiment)
+
+        return ResultView(self, experiment, [])
+
+    def load(self, experiment: str) -> Any:
+        return self.view(experiment).materialize()
+
+
+class ResultView:
+    # Nested dictionary (or list) over part of an experiment, queried as it is accessed
+    def __init__(self, store: ResultStore, experiment: str, prefix: list):
+        self.store = store
+        self.experiment = experiment
+        self.prefix = prefix
+        self.components = None
+
+    def children(self) -> list:
+        if self.components is None:
+            start = ResultStore.encode(self.prefix)[:-1] + (',' if self.prefix else '')
+            rows = self.store.read('''
+                SELECT path FROM results WHERE experiment = ? AND substr(path, 1, ?) = ? ORDER BY rowid
+            ''', (self.experiment, len(start), start))
+
+            depth = len(self.prefix)
+            components = {}
+            for (path,) in rows:
+                path = json.loads(path)
+                if len(path) <= depth:
+                    continue
+
+                component = path[depth]
+                components.setdefault(ResultStore.encode(component), component)
+
+            self.components = list(components.values())
+
+        return self.components
+
+    def sequence(self) -> bool:
+        children = self.children()
+        return len(children) > 0 and isinstance(children[0], list)
+
+    def __getitem__(self, key: Any) -> Any:
+        if self.sequence():
+            if not isinstance(key, int):
+                raise TypeError('list views are indexed by integers')
+            if key < 0:
+                key += len(self)
+            component = [ key ]
+        else:
+            component = key
+
+        path = self.prefix + [ component ]
+        row = self.store.read('''
+            SELECT kind, value FROM results WHERE experiment = ? AND path = ?
+        ''', (self.experiment, ResultStore.encode(path)))
+
+        if row:
+            return self.store.unpack(*row[0])
+
+        view = ResultView(self.store, self.experiment, path)
+        if not view.children():
+            raise (IndexError if self.sequence() else KeyError)(key)
+
+        return view
+
+    def __len__(self) -> int:
+        return len(self.children())
+
+    def __iter__(self):
+        if self.sequence():
+            return (self[c[0]] for c in self.children())
+
+        return iter(self.children())
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self.keys()
+
+    def keys(self) -> list:
+        return [ c[0] if isinstance(c, list) else c for c in self.children() ]
+
+    def values(self) -> list:
+        return [ self[k] for k in self.keys() ]
+
+    def items(self) -> list:
+        return [ (k, self[k]) for k in self.keys() ]
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except (KeyError, IndexError):
+            return default
+
+    def materialize(self) -> Any:
+        values = [ v.materialize() if isinstance(v, ResultView) else v for v in self.values() ]
+        if self.sequence():
+            return values
+
+        return dict(zip(self.keys(), values))
+
+    def __repr__(self) -> str:
+        return f'ResultView({self.experiment!r}, {self.prefix!r}, keys={self.keys()!r})'
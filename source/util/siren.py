@@ -2,6 +2,8 @@ import torch
 import torch.nn as nn
 import numpy as np
 
+from .stream import stream_linear
+
 
 class SirenLayer(nn.Module):
     def __init__(self, in_features, out_features, bias=True, is_first=False, omega_0=120):
@@ -24,29 +26,25 @@ class SirenLayer(nn.Module):
 
 
 class SIREN(nn.Module):
-    def __init__(self, ffin: int):
+    # Frequency of the sines in every layer, also written to binary headers
+    omega = 30
+
+    def __init__(self, ffin: int, hidden: int = 64, depth: int = 4):
         super().__init__()
-        self.layers = SIREN.generate_layers(ffin, 64, 2, 3)
+        self.layers = SIREN.generate_layers(ffin, hidden, depth - 2, 3,
+                                            first_omega_0=SIREN.omega,
+                                            hidden_omega_0=SIREN.omega)
         self.layers = nn.Sequential(*self.layers)
 
     def forward(self, x):
         return self.layers(x)
 
-    def stream(self):
-        weights = [s.linear.weight.data.cpu() for s in self.layers if isinstance(s, SirenLayer)]
-        biases = [s.linear.bias.data.cpu() for s in self.layers if isinstance(s, SirenLayer)]
-
-        bytestream = b''
-        for w in weights:
-            bytestream += w.shape[0].to_bytes(4, 'little')
-            bytestream += w.shape[1].to_bytes(4, 'little')
-            bytestream += w.numpy().astype('float32').tobytes()
-
-        for b in biases:
-            bytestream += b.shape[0].to_bytes(4, 'little')
-            bytestream += b.numpy().astype('float32').tobytes()
+    def linears(self) -> list[nn.Linear]:
+        # The outermost layer is a plain linear layer
+        return [s.linear if isinstance(s, SirenLayer) else s for s in self.layers]
 
-        return bytestream
+    def stream(self):
+        return stream_linear(self.linears())
 
     @staticmethod
     def generate_layers(isize: int,
@@ -0,0 +1,19 @@
+import torch.nn as nn
+
+
+# Layout of network weights in the binary format read by the rasterizer
+def stream_linear(linears: list[nn.Linear]) -> bytes:
+    # All weight matrices (with their shapes) followed by all bias vectors
+    bytestream = b''
+    for layer in linears:
+        w = layer.weight.data.cpu()
+        bytestream += w.shape[0].to_bytes(4, 'little')
+        bytestream += w.shape[1].to_bytes(4, 'little')
+        bytestream += w.numpy().astype('float32').tobytes()
+
+    for layer in linears:
+        b = layer.bias.data.cpu()
+        bytestream += b.shape[0].to_bytes(4, 'little')
+        bytestream += b.numpy().astype('float32').tobytes()
+
+    return bytestream
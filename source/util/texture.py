@@ -4,34 +4,54 @@ import ngfutil
 
 
 class NGFTextureFetchFunction(torch.autograd.Function):
+    # Bilinear lookups of per-patch textures (complexes, res x, res y, channels) at uvs (complexes, samples)
     @staticmethod
-    def forward(map, u, v, complexes, resx, resy, rate):
-        return ngfutil.ngf_texture_fetch_forward(map, u, v, complexes, resx, resy, rate)
+    def forward(map, u, v):
+        return ngfutil.ngf_texture_fetch_forward(map, u, v)
 
     @staticmethod
     def setup_context(ctx, inputs, outputs):
-        map, u, v, complexes, resx, resy, rate = inputs
+        map, u, v = inputs
         ctx.mark_non_differentiable(u)
         ctx.mark_non_differentiable(v)
         ctx.save_for_backward(u, v)
-        ctx.rest = [complexes, resx, resy, rate]
+        ctx.resolution = (map.shape[1], map.shape[2])
 
     @staticmethod
-    def backward(ctx, d_color):
+    def backward(ctx, d_result):
         u, v = ctx.saved_tensors
-        # print('dCOLOR', d_color)
-        d_map = ngfutil.ngf_texture_fetch_backward(d_color, u, v, *ctx.rest)
-        # print('dMAP', d_map)
-        return d_map, None, None, None, None, None, None
+        d_map = ngfutil.ngf_texture_fetch_backward(d_result, u, v, *ctx.resolution)
+        return d_map, None, None
 
 
-class NGFTextureFetch(nn.Module):
-    def __init__(self, complexes, resx, resy, rate):
-        super().__init__()
-        self.complexes = complexes
-        self.resx = resx
-        self.resy = resy
-        self.rate = rate
+def texture_fetch(map: torch.Tensor, u: torch.Tensor, v: torch.Tensor) -> torch.Tensor:
+    return NGFTextureFetchFunction.apply(map, u, v)
+
 
+class NGFTextureFetch(nn.Module):
     def forward(self, map, u, v):
-        return NGFTextureFetchFunction.apply(map, u, v, self.complexes, self.resx, self.resy, self.rate)
+        return texture_fetch(map, u, v)
+
+
+def texture_fetch_torch(map: torch.Tensor, u: torch.Tensor, v: torch.Tensor) -> torch.Tensor:
+    # Reference implementation with the same clamping, differentiable through autograd
+    P, resx, resy, C = map.shape
+
+    def axis(t, res):
+        t = t.clamp(0, 1) * (res - 1)
+        i0 = t.floor().long().clamp(max=max(res - 2, 0))
+        i1 = (i0 + 1).clamp(max=res - 1)
+        return i0, i1, (t - i0).unsqueeze(-1)
+
+    x0, x1, fx = axis(u, resx)
+    y0, y1, fy = axis(v, resy)
+
+    texels = map.reshape(P, resx * resy, C)
+
+    def lookup(x, y):
+        return torch.gather(texels, 1, (x * resy + y).unsqueeze(-1).expand(-1, -1, C))
+
+    result = lookup(x0, y0) * (1 - fx) * (1 - fy) + lookup(x1, y0) * fx * (1 - fy) \
+        + lookup(x0, y1) * (1 - fx) * fy + lookup(x1, y1) * fx * fy
+
+    return result.reshape(-1, C)